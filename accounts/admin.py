@@ -1,12 +1,13 @@
 from django.contrib import admin
-from .models import Account, UserProfile
+from .models import Account, UserDataVersion, UserProfile
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
     list_display = ['name', 'user', 'account_type', 'balance', 'currency', 'is_active', 'created_at']
     list_filter = ['account_type', 'currency', 'is_active', 'created_at']
     search_fields = ['name', 'user__username', 'user__email']
-    readonly_fields = ['created_at', 'updated_at']
+    # Balances are maintained by the ledger; edit transactions instead
+    readonly_fields = ['balance', 'created_at', 'updated_at']
     
     fieldsets = (
         (None, {
@@ -30,3 +31,9 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ['default_currency', 'timezone', 'created_at']
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(UserDataVersion)
+class UserDataVersionAdmin(admin.ModelAdmin):
+    list_display = ['user', 'version', 'updated_at']
+    search_fields = ['user__username']
+    readonly_fields = ['version', 'updated_at']
@@ -0,0 +1,36 @@
+"""
+Async variants of the read-heavy account endpoints for ASGI deployments
+"""
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from financial_tracker.async_api import api_response, async_api_view, run_concurrently
+from financial_tracker.cache import async_cached_response
+from transactions.fx import MissingExchangeRate, balance_groups, convert_balances, user_currency
+from .models import Account
+from .serializers import AccountSerializer
+
+@async_api_view
+@async_cached_response('async.accounts.summary')
+async def account_summary(request):
+    """Account summary with balances, account list and currency loaded concurrently"""
+    accounts = Account.objects.filter(user=request.user, is_active=True)
+    groups, listed, currency = await run_concurrently(
+        lambda: balance_groups(accounts),
+        lambda: AccountSerializer(accounts, many=True).data,
+        lambda: user_currency(request.user),
+    )
+    
+    try:
+        total_balance, account_types_summary = await sync_to_async(convert_balances)(
+            groups, currency, timezone.localdate()
+        )
+    except MissingExchangeRate as exc:
+        return api_response({'error': str(exc)}, status=400)
+    
+    return api_response({
+        'currency': currency,
+        'total_balance': total_balance,
+        'total_accounts': sum(summary['count'] for summary in account_types_summary.values()),
+        'account_types': account_types_summary,
+        'accounts': listed
+    })
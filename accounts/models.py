@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction as db_transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Account(models.Model):
     """Model for financial accounts (checking, savings, credit cards, etc.)"""
@@ -27,6 +29,31 @@ class Account(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.get_account_type_display()}) - {self.currency} {self.balance}"
+    
+    def save(self, *args, **kwargs):
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
+            UserDataVersion.bump([self.user_id])
+    
+    def delete(self, *args, **kwargs):
+        from transactions import ledger, recurring, rollups
+        from transactions.models import Transaction
+
+        with db_transaction.atomic():
+            # The account's transactions are deleted with it. Reverse them on transfer
+            # counterparts, then rebuild the rollups in a few grouped queries rather
+            # than applying a delta per deleted transaction
+            rows = Transaction.objects.filter(ledger.touches_account(self.pk)).values_list(*ledger.LEDGER_FIELDS)
+            changes = [(ledger.LedgerEntry(*row), None) for row in rows.iterator(chunk_size=2000)]
+            deltas = ledger.net_balance_deltas(changes)
+            deltas.pop(self.pk, None)
+            ledger.apply_balance_deltas(deltas)
+            ledger.invalidate_checkpoints(changes)
+            recurring.invalidate(changes)
+            result = super().delete(*args, **kwargs)
+            # Also bumps the user's data version
+            rollups.rebuild_rollups([self.user_id])
+        return result
 
 class UserProfile(models.Model):
     """Extended user profile for financial tracking"""
@@ -39,3 +66,65 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
+    
+    def save(self, *args, **kwargs):
+        # Summaries are reported in the default currency
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
+            UserDataVersion.bump([self.user_id])
+
+class UserDataVersion(models.Model):
+    """Counter bumped on every write to a user's accounts, transactions, categories or budgets
+
+    Cached responses are keyed on the version, so a single bump invalidates
+    all of them without having to find and delete individual entries.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+    
+    @classmethod
+    def current(cls, user_id):
+        """Return the user's data version, 0 if nothing has been written yet"""
+        version = cls.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+        return version or 0
+    
+    @classmethod
+    async def acurrent(cls, user_id):
+        version = await cls.objects.filter(user_id=user_id).values_list('version', flat=True).afirst()
+        return version or 0
+    
+    @classmethod
+    def state(cls, user_id):
+        """Return (version, updated_at); updated_at is None before the first write"""
+        return cls.objects.filter(user_id=user_id).values_list('version', 'updated_at').first() or (0, None)
+    
+    @classmethod
+    def bump(cls, user_ids):
+        """Increment the version of each user, creating the row on first write"""
+        now = timezone.now()
+        for user_id in sorted(set(user_ids)):
+            if cls.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=now):
+                continue
+            try:
+                with db_transaction.atomic():
+                    cls.objects.create(user_id=user_id, version=1, updated_at=now)
+            except IntegrityError:
+                # Created concurrently by another writer
+                cls.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=now)
+    
+    @classmethod
+    def bump_all(cls):
+        """Increment every user's version in one UPDATE, creating missing rows first"""
+        now = timezone.now()
+        missing = User.objects.filter(data_version__isnull=True).values_list('id', flat=True)
+        # Rows created concurrently are bumped by the UPDATE all the same
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, version=0, updated_at=now) for user_id in missing],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        cls.objects.update(version=F('version') + 1, updated_at=now)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from financial_tracker.fieldsets import ExpandableFieldsMixin
 from .models import Account, UserProfile
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,9 +17,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
         fields = ['user', 'default_currency', 'timezone', 'monthly_budget', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
-class AccountSerializer(serializers.ModelSerializer):
+class AccountSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     balance = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
-    user = UserSerializer(read_only=True)
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    
+    expandable_fields = {
+        'user': (UserSerializer, {}),
+    }
     
     class Meta:
         model = Account
@@ -29,6 +34,14 @@ class AccountSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
+    
+    def update(self, instance, validated_data):
+        """Save only the edited fields, so a stale balance never overwrites concurrent increments"""
+        validated_data.pop('balance', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 class AccountSummarySerializer(serializers.ModelSerializer):
     """Lightweight serializer for account summaries"""
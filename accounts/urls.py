@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import account_summary
 from .views import UserViewSet, UserProfileViewSet, AccountViewSet
 
 router = DefaultRouter()
@@ -8,5 +9,6 @@ router.register(r'profiles', UserProfileViewSet, basename='userprofile')
 router.register(r'accounts', AccountViewSet, basename='account')
 
 urlpatterns = [
+    path('api/accounts/summary/async/', account_summary, name='account-summary-async'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
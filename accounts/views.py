@@ -3,7 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.models import User
-from django.db.models import Sum, Q
+from django.utils import timezone
+from datetime import datetime, timedelta
+from financial_tracker.cache import cached_response
+from financial_tracker.conditional import ConditionalGetMixin
+from financial_tracker.fieldsets import SparseFieldsetMixin
+from transactions.checkpoints import balance_as_of, balance_history
+from transactions.filters import LAST_PERIOD_DAY
+from transactions.forecast import DEFAULT_HORIZON, MAX_HORIZON, forecast_accounts
+from transactions.fx import MissingExchangeRate, balance_groups, convert_balances, user_currency
 from .models import Account, UserProfile
 from .serializers import AccountSerializer, UserProfileSerializer, UserSerializer
 
@@ -32,42 +40,94 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for managing financial accounts"""
     serializer_class = AccountSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Account.objects.filter(user=self.request.user)
+        return self.optimize_queryset(Account.objects.filter(user=self.request.user))
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cached_response
     def summary(self, request):
-        """Get account summary with total balances"""
+        """Get account summary with total balances converted into the user's default currency"""
         accounts = self.get_queryset().filter(is_active=True)
+        currency = user_currency(request.user)
         
-        total_balance = accounts.aggregate(
-            total=Sum('balance')
-        )['total'] or 0
-        
-        account_types_summary = {}
-        for account in accounts:
-            account_type = account.account_type
-            if account_type not in account_types_summary:
-                account_types_summary[account_type] = {
-                    'count': 0,
-                    'total_balance': 0
-                }
-            account_types_summary[account_type]['count'] += 1
-            account_types_summary[account_type]['total_balance'] += float(account.balance)
+        try:
+            total_balance, account_types_summary = convert_balances(
+                balance_groups(accounts), currency, timezone.localdate()
+            )
+        except MissingExchangeRate as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
+            'currency': currency,
             'total_balance': total_balance,
-            'total_accounts': accounts.count(),
+            'total_accounts': sum(summary['count'] for summary in account_types_summary.values()),
             'account_types': account_types_summary,
-            'accounts': AccountSerializer(accounts, many=True).data
+            'accounts': self.get_serializer(accounts, many=True).data
+        })
+    
+    @action(detail=False, methods=['get'])
+    @cached_response
+    def forecast(self, request):
+        """Project daily balances of all active accounts from recurring and average cash flow"""
+        try:
+            days = int(request.query_params.get('days', DEFAULT_HORIZON))
+        except ValueError:
+            return Response({'error': 'days must be a whole number.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= MAX_HORIZON:
+            return Response({'error': f'days must be between 1 and {MAX_HORIZON}.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'days': days,
+            'accounts': forecast_accounts(request.user, days)
+        })
+    
+    @action(detail=True, methods=['get'])
+    def balance_history(self, request, pk=None):
+        """Get historical balances from monthly checkpoints"""
+        account = self.get_object()
+        
+        try:
+            if request.query_params.get('date'):
+                as_of = datetime.strptime(request.query_params.get('date'), '%Y-%m-%d').date()
+                if as_of > LAST_PERIOD_DAY:
+                    raise ValueError
+                return Response({
+                    'account_id': account.id,
+                    'currency': account.currency,
+                    'date': as_of,
+                    'balance': balance_as_of(account, as_of)
+                })
+            
+            # Default to the last twelve months
+            end_date = timezone.now().date()
+            start_date = end_date - timedelta(days=365)
+            if request.query_params.get('start_date'):
+                start_date = datetime.strptime(request.query_params.get('start_date'), '%Y-%m-%d').date()
+            if request.query_params.get('end_date'):
+                end_date = datetime.strptime(request.query_params.get('end_date'), '%Y-%m-%d').date()
+            if max(start_date, end_date) > LAST_PERIOD_DAY:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': f'Dates must be in YYYY-MM-DD format and on or before {LAST_PERIOD_DAY}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if start_date > end_date:
+            return Response({'error': 'start_date must be before end_date.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'account_id': account.id,
+            'currency': account.currency,
+            'balances': balance_history(account, start_date, end_date)
         })
     
     @action(detail=True, methods=['post'])
@@ -75,7 +135,8 @@ class AccountViewSet(viewsets.ModelViewSet):
         """Toggle account active status"""
         account = self.get_object()
         account.is_active = not account.is_active
-        account.save()
+        # Leave balance to the in-database increments that may have run since it was loaded
+        account.save(update_fields=['is_active', 'updated_at'])
         return Response({
             'message': f'Account {"activated" if account.is_active else "deactivated"} successfully',
             'is_active': account.is_active
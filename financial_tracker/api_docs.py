@@ -30,7 +30,10 @@ def api_documentation(request):
                         "update": "PUT /accounts/api/accounts/{id}/",
                         "delete": "DELETE /accounts/api/accounts/{id}/",
                         "summary": "GET /accounts/api/accounts/summary/",
-                        "toggle_active": "POST /accounts/api/accounts/{id}/toggle_active/"
+                        "summary_async": "GET /accounts/api/accounts/summary/async/",
+                        "forecast": "GET /accounts/api/accounts/forecast/?days={n}",
+                        "toggle_active": "POST /accounts/api/accounts/{id}/toggle_active/",
+                        "balance_history": "GET /accounts/api/accounts/{id}/balance_history/"
                     },
                     "users": {
                         "me": "GET /accounts/api/users/me/"
@@ -51,7 +54,13 @@ def api_documentation(request):
                         "update": "PUT /transactions/api/transactions/{id}/",
                         "delete": "DELETE /transactions/api/transactions/{id}/",
                         "summary": "GET /transactions/api/transactions/summary/",
-                        "by_category": "GET /transactions/api/transactions/by_category/"
+                        "summary_async": "GET /transactions/api/transactions/summary/async/",
+                        "by_category": "GET /transactions/api/transactions/by_category/",
+                        "analytics": "GET /transactions/api/transactions/analytics/",
+                        "recurring": "GET /transactions/api/transactions/recurring/",
+                        "search": "GET /transactions/api/transactions/search/?q={text}",
+                        "import": "POST /transactions/api/transactions/import/",
+                        "export": "GET /transactions/api/transactions/export/?output={csv|ndjson}"
                     },
                     "categories": {
                         "list": "GET /transactions/api/categories/",
@@ -68,18 +77,47 @@ def api_documentation(request):
                         "update": "PUT /transactions/api/budgets/{id}/",
                         "delete": "DELETE /transactions/api/budgets/{id}/",
                         "current": "GET /transactions/api/budgets/current/",
-                        "alerts": "GET /transactions/api/budgets/alerts/"
+                        "alerts": "GET /transactions/api/budgets/alerts/",
+                        "status_async": "GET /transactions/api/budgets/status/async/"
                     }
                 }
+            },
+            "jobs": {
+                "base_url": "/jobs/api/",
+                "endpoints": {
+                    "jobs": {
+                        "list": "GET /jobs/api/jobs/",
+                        "create": "POST /jobs/api/jobs/",
+                        "detail": "GET /jobs/api/jobs/{id}/",
+                        "download": "GET /jobs/api/jobs/{id}/download/"
+                    }
+                }
+            },
+            "operations": {
+                "cache_stats": "GET /api/cache-stats/ (staff only)",
+                "metrics": "GET /api/metrics/ (staff only, Prometheus text format)"
             }
         },
         "query_parameters": {
+            "all_resources": {
+                "expand": "Nest related objects instead of ids (comma-separated, e.g. 'account,category')",
+                "fields": "Only return the listed fields (comma-separated, read requests only)"
+            },
             "transactions": {
                 "type": "Filter by transaction type (income, expense, transfer)",
+                "type__in": "Filter by several transaction types (comma-separated)",
                 "account": "Filter by account ID",
+                "account__in": "Filter by several account IDs (comma-separated)",
                 "category": "Filter by category ID", 
+                "category__in": "Filter by several category IDs (comma-separated)",
+                "uncategorized": "Set to 'true' for transactions without a category",
                 "start_date": "Filter by start date (YYYY-MM-DD)",
-                "end_date": "Filter by end date (YYYY-MM-DD)"
+                "end_date": "Filter by end date (YYYY-MM-DD, inclusive)",
+                "amount_min": "Minimum amount",
+                "amount_max": "Maximum amount",
+                "ordering": "Order by date, amount or created_at (prefix with '-' for descending)",
+                "pagination": "Set to 'cursor' for keyset pagination (follow the 'next' link)",
+                "page_size": "Page size for cursor pagination (max 200)"
             }
         },
         "sample_requests": {
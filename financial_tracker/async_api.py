@@ -0,0 +1,52 @@
+"""
+Helpers for async read-only JSON endpoints served under ASGI
+
+Django's async ORM methods (``aaggregate``, ``afirst``, ...) still run their
+queries one after another on a single shared thread. Independent aggregates
+are therefore run with ``run_concurrently``, which gives each one its own
+worker thread and database connection while the event loop keeps serving
+other connections.
+"""
+import asyncio
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def _in_worker_thread(func):
+    def run():
+        try:
+            return func()
+        finally:
+            # Worker threads live outside the request cycle that normally closes connections
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def run_concurrently(*funcs):
+    """Run zero-argument blocking callables in parallel threads and return their results in order"""
+    return await asyncio.gather(*(_in_worker_thread(func)() for func in funcs))
+
+
+def api_response(data, status=200):
+    """JSON response rendered like DRF's, so sync and async variants of an endpoint match"""
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def async_api_view(view):
+    """Restrict an async view to authenticated GET requests and render validation errors as 400s"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return api_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return api_response({'detail': 'Authentication credentials were not provided.'}, status=403)
+        try:
+            return await view(request, *args, **kwargs)
+        except ValidationError as exc:
+            return api_response(exc.detail, status=400)
+    return wrapper
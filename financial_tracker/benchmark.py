@@ -0,0 +1,336 @@
+"""
+Benchmarking every API endpoint against seeded datasets
+
+Datasets are built with the synthetic load-test generator and measured
+through the Django test client as the first generated user. For each
+endpoint one request is traced for its SQL query count and peak Python
+memory, then ``repeat`` requests are timed for p50/p95 latency. The
+response cache is cleared before every request so cached endpoints are
+measured on their slow path; writes are rolled back so every repetition
+sees the same data. Query counts do not depend on the machine, so any
+increase over the baseline is a regression. Median latency and peak memory
+do, so they are only compared when a relative tolerance is given, for runs
+on the machine that recorded the baseline. Queries are counted on the
+request's own connection, so the aggregates async endpoints run on worker
+threads are not included.
+"""
+import json
+import math
+import multiprocessing
+import time
+import tracemalloc
+from collections import namedtuple
+from functools import partial
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, reset_queries, transaction as db_transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from accounts.models import Account, UserProfile
+from jobs.registry import enqueue
+from jobs.worker import claim_jobs, run_job
+from transactions.checkpoints import build_checkpoints
+from transactions.ledger import month_end
+from transactions.models import Budget, Category, Transaction
+from transactions.recurring import update_series
+from transactions.synthetic import SPENDING, generate_users
+from .cache import response_cache
+from .parallel import run_in_processes
+
+PREFIX = 'bench'
+SEED = 0
+YEARS = 2
+TX_PER_MONTH = 50
+# The current month is only generated up to today
+TRANSACTIONS_PER_USER = (YEARS * 12 - 1) * TX_PER_MONTH
+USERS_PER_TASK = 50
+
+# Latency and memory changes below these are noise however small the baseline
+MIN_LATENCY_SLACK_MS = 5.0
+MIN_MEMORY_SLACK_KIB = 64
+
+Endpoint = namedtuple('Endpoint', ['name', 'method', 'path', 'data', 'setup'], defaults=[None, None])
+
+
+def parse_size(value):
+    """Transaction count from '1000', '1k' or '1m'"""
+    text = str(value).strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    number = int(text[:-1] if multiplier > 1 else text)
+    if number < 1:
+        raise ValueError(f'Invalid dataset size: {value}')
+    return number * multiplier
+
+
+def viewset_actions(patterns=None):
+    """Names ('basename.action') of every routed viewset action"""
+    names = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            names |= viewset_actions(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and getattr(pattern.callback, 'actions', None):
+            basename = pattern.callback.initkwargs.get('basename')
+            names |= {f'{basename}.{action}' for action in pattern.callback.actions.values()}
+    return names
+
+
+def seed_dataset(size, workers):
+    """Generate benchmark users until the dataset holds at least ``size`` transactions"""
+    wanted = math.ceil(size / TRANSACTIONS_PER_USER)
+    existing = User.objects.filter(username__startswith=PREFIX).count()
+    if existing > wanted:
+        raise ValueError(f'The database already holds more than {size} transactions')
+    numbers = list(range(existing + 1, wanted + 1))
+    if not numbers:
+        return 0
+    # Workers started any other way than fork would connect to the regular database
+    if multiprocessing.get_start_method() != 'fork':
+        workers = 1
+    task = partial(generate_users, prefix=PREFIX, seed=SEED, accounts_per_user=3, years=YEARS,
+                   tx_per_month=TX_PER_MONTH)
+    shards = [numbers[start:start + USERS_PER_TASK] for start in range(0, len(numbers), USERS_PER_TASK)]
+    for shard, _, error in run_in_processes(task, shards, workers):
+        if error is not None:
+            raise error
+    return len(numbers)
+
+
+def prepare_fixtures(user):
+    """Objects the detail endpoints act on: budgets, checkpoints, recurring series and a finished export for ``user``"""
+    today = timezone.localdate()
+    update_series(user.pk)
+    build_checkpoints(Account.objects.filter(user=user).values_list('pk', flat=True))
+    if not Budget.objects.filter(user=user).exists():
+        for category in Category.objects.filter(user=user, name__in=list(SPENDING)):
+            Budget.objects.create(user=user, category=category, amount=300, period='monthly',
+                                  start_date=today.replace(day=1), end_date=month_end(today))
+    export = user.jobs.filter(kind='export_transactions', status='succeeded').first()
+    # Exports from an earlier run with a kept database went to another media directory
+    if export is None or not default_storage.exists(export.result['file']):
+        export = enqueue('export_transactions', user, {'output': 'csv', 'filters': {}})
+        claim_jobs('benchmark', 1)
+        run_job(export.pk)
+    return {
+        'user': user.pk,
+        'profile': UserProfile.objects.get(user=user).pk,
+        'account': Account.objects.filter(user=user, account_type='checking').values_list('pk', flat=True)[0],
+        'category': Category.objects.filter(user=user, name='Groceries').values_list('pk', flat=True)[0],
+        # Budgets are unique per category and period, and the fixtures leave this one free
+        'unbudgeted': Category.objects.filter(user=user, name='Housing').values_list('pk', flat=True)[0],
+        'transaction': Transaction.objects.filter(user=user).order_by('-date').values_list('pk', flat=True)[0],
+        'budget': Budget.objects.filter(user=user).order_by('pk').values_list('pk', flat=True)[0],
+        'job': export.pk,
+    }
+
+
+def statement():
+    return SimpleUploadedFile(
+        'statement.csv',
+        b'date,amount,description\n' + b''.join(
+            f'2024-01-{day:02d},-{day}.25,Benchmark row {day}\n'.encode() for day in range(1, 29)
+        ),
+        content_type='text/csv'
+    )
+
+
+def endpoints(ids):
+    """Every viewset action and async endpoint, with requests against the fixture ``ids``"""
+    today = timezone.localdate()
+    account = f"/accounts/api/accounts/{ids['account']}/"
+    category = f"/transactions/api/categories/{ids['category']}/"
+    transaction = f"/transactions/api/transactions/{ids['transaction']}/"
+    budget = f"/transactions/api/budgets/{ids['budget']}/"
+    profile = f"/accounts/api/profiles/{ids['profile']}/"
+    new_transaction = {
+        'account_id': ids['account'], 'category_id': ids['category'], 'transaction_type': 'expense',
+        'amount': '12.50', 'description': 'Benchmark', 'date': timezone.now().isoformat(),
+    }
+    new_budget = {
+        'category_id': ids['unbudgeted'], 'amount': '400.00', 'period': 'monthly',
+        'start_date': today.replace(day=1).isoformat(), 'end_date': month_end(today).isoformat(),
+    }
+    return [
+        Endpoint('user.list', 'GET', '/accounts/api/users/'),
+        Endpoint('user.retrieve', 'GET', f"/accounts/api/users/{ids['user']}/"),
+        Endpoint('user.me', 'GET', '/accounts/api/users/me/'),
+        Endpoint('userprofile.list', 'GET', '/accounts/api/profiles/'),
+        Endpoint('userprofile.create', 'POST', '/accounts/api/profiles/', {'default_currency': 'USD'},
+                 setup=lambda: UserProfile.objects.filter(user_id=ids['user']).delete()),
+        Endpoint('userprofile.retrieve', 'GET', profile),
+        Endpoint('userprofile.update', 'PUT', profile, {'default_currency': 'USD', 'timezone': 'UTC'}),
+        Endpoint('userprofile.partial_update', 'PATCH', profile, {'monthly_budget': '2500.00'}),
+        Endpoint('userprofile.destroy', 'DELETE', profile),
+        Endpoint('account.list', 'GET', '/accounts/api/accounts/'),
+        Endpoint('account.create', 'POST', '/accounts/api/accounts/', {'name': 'Benchmark', 'account_type': 'cash'}),
+        Endpoint('account.retrieve', 'GET', account),
+        Endpoint('account.update', 'PUT', account, {'name': 'Checking', 'account_type': 'checking'}),
+        Endpoint('account.partial_update', 'PATCH', account, {'description': 'Benchmark'}),
+        Endpoint('account.destroy', 'DELETE', account),
+        Endpoint('account.summary', 'GET', '/accounts/api/accounts/summary/'),
+        Endpoint('account.forecast', 'GET', '/accounts/api/accounts/forecast/'),
+        Endpoint('account.balance_history', 'GET', f'{account}balance_history/'),
+        Endpoint('account.toggle_active', 'POST', f'{account}toggle_active/', {}),
+        Endpoint('category.list', 'GET', '/transactions/api/categories/'),
+        Endpoint('category.create', 'POST', '/transactions/api/categories/', {'name': 'Benchmark'}),
+        Endpoint('category.retrieve', 'GET', category),
+        Endpoint('category.update', 'PUT', category, {'name': 'Groceries'}),
+        Endpoint('category.partial_update', 'PATCH', category, {'description': 'Benchmark'}),
+        Endpoint('category.destroy', 'DELETE', category),
+        Endpoint('category.popular', 'GET', '/transactions/api/categories/popular/'),
+        Endpoint('transaction.list', 'GET', '/transactions/api/transactions/'),
+        Endpoint('transaction.create', 'POST', '/transactions/api/transactions/', new_transaction),
+        Endpoint('transaction.retrieve', 'GET', transaction),
+        Endpoint('transaction.update', 'PUT', transaction, new_transaction),
+        Endpoint('transaction.partial_update', 'PATCH', transaction, {'description': 'Benchmark'}),
+        Endpoint('transaction.destroy', 'DELETE', transaction),
+        Endpoint('transaction.summary', 'GET', '/transactions/api/transactions/summary/'),
+        Endpoint('transaction.search', 'GET', '/transactions/api/transactions/search/?q=market'),
+        Endpoint('transaction.by_category', 'GET', '/transactions/api/transactions/by_category/?include=transactions'),
+        Endpoint('transaction.analytics', 'GET', '/transactions/api/transactions/analytics/'),
+        Endpoint('transaction.recurring', 'GET', '/transactions/api/transactions/recurring/'),
+        Endpoint('transaction.export', 'GET', '/transactions/api/transactions/export/'),
+        Endpoint('transaction.bulk_import', 'POST', '/transactions/api/transactions/import/',
+                 lambda: {'file': statement(), 'account_id': ids['account']}),
+        Endpoint('budget.list', 'GET', '/transactions/api/budgets/'),
+        Endpoint('budget.create', 'POST', '/transactions/api/budgets/', new_budget),
+        Endpoint('budget.retrieve', 'GET', budget),
+        Endpoint('budget.update', 'PUT', budget, new_budget),
+        Endpoint('budget.partial_update', 'PATCH', budget, {'amount': '350.00'}),
+        Endpoint('budget.destroy', 'DELETE', budget),
+        Endpoint('budget.current', 'GET', '/transactions/api/budgets/current/'),
+        Endpoint('budget.alerts', 'GET', '/transactions/api/budgets/alerts/'),
+        Endpoint('job.list', 'GET', '/jobs/api/jobs/'),
+        Endpoint('job.create', 'POST', '/jobs/api/jobs/', {'kind': 'rebuild_rollups'}),
+        Endpoint('job.retrieve', 'GET', f"/jobs/api/jobs/{ids['job']}/"),
+        Endpoint('job.download', 'GET', f"/jobs/api/jobs/{ids['job']}/download/"),
+        Endpoint('async.account_summary', 'GET', '/accounts/api/accounts/summary/async/'),
+        Endpoint('async.transaction_summary', 'GET', '/transactions/api/transactions/summary/async/'),
+        Endpoint('async.budget_status', 'GET', '/transactions/api/budgets/status/async/'),
+    ]
+
+
+def send(client, endpoint):
+    """Make one request, reading streamed bodies in full, and return its status code"""
+    response_cache().clear()
+    if endpoint.method == 'GET':
+        response = client.get(endpoint.path)
+    elif callable(endpoint.data):
+        response = client.post(endpoint.path, endpoint.data())
+    else:
+        response = client.generic(endpoint.method, endpoint.path, json.dumps(endpoint.data or {}),
+                                  content_type='application/json')
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    response.close()
+    return response.status_code
+
+
+def call(client, endpoint):
+    if endpoint.method == 'GET':
+        return send(client, endpoint)
+    # Writes are undone so every repetition starts from the same data
+    with db_transaction.atomic():
+        if endpoint.setup:
+            endpoint.setup()
+        status = send(client, endpoint)
+        db_transaction.set_rollback(True)
+    return status
+
+
+def measure(client, endpoint, repeat):
+    """Status, query count, peak memory and latency percentiles of one endpoint"""
+    # Warm up per-process state such as exchange rate lookups
+    call(client, endpoint)
+    # The query log is capped, and a full one makes every capture look empty
+    reset_queries()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            status = call(client, endpoint)
+        peak = tracemalloc.get_traced_memory()[1]
+        query_count = len(queries)
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call(client, endpoint)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'method': endpoint.method,
+        'path': endpoint.path,
+        'status': status,
+        'queries': query_count,
+        'peak_kib': round(peak / 1024, 1),
+        'p50_ms': round(float(np.percentile(timings, 50)), 2),
+        'p95_ms': round(float(np.percentile(timings, 95)), 2),
+    }
+
+
+def run_benchmarks(sizes, repeat, workers=1, progress=None):
+    """Seed each dataset size in turn, smallest first, and benchmark every endpoint on it; return the report"""
+    report = {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'repeat': repeat,
+        'sizes': {},
+    }
+    for label in sorted(sizes, key=parse_size):
+        seed_dataset(parse_size(label), workers)
+        user = User.objects.get(username=f'{PREFIX}1')
+        client = Client()
+        client.force_login(user)
+        results = {}
+        for endpoint in endpoints(prepare_fixtures(user)):
+            results[endpoint.name] = measure(client, endpoint, repeat)
+            if progress:
+                progress(label, endpoint.name, results[endpoint.name])
+        report['sizes'][str(label)] = {
+            'transactions': Transaction.objects.count(),
+            'user_transactions': Transaction.objects.filter(user=user).count(),
+            'endpoints': results,
+        }
+    return report
+
+
+def failures(report):
+    """Endpoints that did not answer with a success status"""
+    return [
+        f"{label} {name}: HTTP {result['status']}"
+        for label, size in report['sizes'].items()
+        for name, result in size['endpoints'].items()
+        if result['status'] >= 400
+    ]
+
+
+def regressions(report, baseline, tolerance=None):
+    """Describe every endpoint measured worse than the baseline for the same dataset size
+
+    Only query counts are compared unless ``tolerance``, the allowed relative
+    increase of median latency and peak memory, is given.
+    """
+    found = []
+    for label, size in report['sizes'].items():
+        expected = baseline.get('sizes', {}).get(label, {}).get('endpoints', {})
+        for name, result in size['endpoints'].items():
+            if name not in expected:
+                continue
+            before = expected[name]
+            if result['queries'] > before['queries']:
+                found.append(f"{label} {name}: {result['queries']} queries, baseline {before['queries']}")
+            if tolerance is None:
+                continue
+            # The median: a p95 of a few dozen timings is little more than their slowest outlier
+            if (result['p50_ms'] > before['p50_ms'] * (1 + tolerance)
+                    and result['p50_ms'] - before['p50_ms'] > MIN_LATENCY_SLACK_MS):
+                found.append(f"{label} {name}: p50 {result['p50_ms']}ms, baseline {before['p50_ms']}ms")
+            if (result['peak_kib'] > before['peak_kib'] * (1 + tolerance)
+                    and result['peak_kib'] - before['peak_kib'] > MIN_MEMORY_SLACK_KIB):
+                found.append(f"{label} {name}: peak {result['peak_kib']} KiB, baseline {before['peak_kib']} KiB")
+    return found
@@ -0,0 +1,122 @@
+"""
+Per-user versioned caching of computed API responses
+
+Responses are keyed on the user's ``UserDataVersion``, which every write to
+their accounts, transactions, categories or budgets increments. A write
+therefore invalidates all of the user's cached responses at once without
+deleting anything; superseded entries age out through the cache backend's
+``MAX_ENTRIES`` culling and ``TIMEOUT``. Point the ``responses`` cache at a
+database or file-based backend to share entries between processes.
+"""
+import hashlib
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from accounts.models import UserDataVersion
+
+RESPONSE_CACHE = 'responses'
+STATS_KEYS = {
+    'hits': 'response-cache:hits',
+    'misses': 'response-cache:misses',
+}
+
+
+def response_cache():
+    return caches[RESPONSE_CACHE]
+
+
+def normalized_params(request):
+    """Query parameters as sorted (name, value) pairs, independent of their order"""
+    # request.GET is the query string of both Django and DRF requests
+    return sorted(
+        (name, value) for name in request.GET for value in request.GET.getlist(name)
+    )
+
+
+def endpoint_key(request, endpoint, version):
+    """Key on the user, endpoint, query parameters, data version and local date"""
+    digest = hashlib.sha256(repr(normalized_params(request)).encode()).hexdigest()[:32]
+    user = request.user
+    # date_joined keeps keys distinct if a deleted user's id is ever reused;
+    # the date expires defaults such as "the current month" at midnight
+    return (
+        f'response:{user.pk}.{user.date_joined.timestamp()}:v{version}:'
+        f'{endpoint}:{timezone.localdate()}:{digest}'
+    )
+
+
+def cache_key(request, view, version):
+    return endpoint_key(request, f'{type(view).__name__}.{view.action}', version)
+
+
+def count(event):
+    """Increment a shared hit/miss counter"""
+    cache = response_cache()
+    key = STATS_KEYS[event]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_stats_data():
+    cache = response_cache()
+    stats = {event: cache.get(key, 0) for event, key in STATS_KEYS.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
+
+
+def cached_response(method):
+    """Cache a viewset action's successful response until the user's data changes"""
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        # Read the version before computing: a concurrent write can then only
+        # make the stored data newer than its key, never older
+        key = cache_key(request, view, UserDataVersion.current(request.user.pk))
+        cache = response_cache()
+        data = cache.get(key)
+        if data is not None:
+            count('hits')
+            return Response(data)
+
+        count('misses')
+        response = method(view, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+        return response
+    return wrapper
+
+
+def async_cached_response(endpoint):
+    """Cache an async JSON view's successful response body until the user's data changes"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            key = endpoint_key(request, endpoint, await UserDataVersion.acurrent(request.user.pk))
+            cache = response_cache()
+            content = await cache.aget(key)
+            if content is not None:
+                await sync_to_async(count)('hits')
+                return HttpResponse(content, content_type='application/json')
+
+            await sync_to_async(count)('misses')
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.content)
+            return response
+        return wrapper
+    return decorator
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """Response cache hit and miss counters"""
+    return Response(cache_stats_data())
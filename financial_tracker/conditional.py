@@ -0,0 +1,56 @@
+"""
+Conditional GET (ETag / Last-Modified) for per-user list and detail endpoints
+
+Validators are derived from the user's ``UserDataVersion`` rather than the
+response body, so a request whose ``If-None-Match`` still matches is answered
+with 304 after a single primary-key lookup, without running the list query
+or any serializer.
+"""
+import hashlib
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from accounts.models import UserDataVersion
+from accounts.serializers import UserSerializer
+from .cache import normalized_params
+
+
+class ConditionalGetMixin:
+    """ViewSet mixin adding strong ETags and Last-Modified to list and retrieve"""
+
+    def get_etag(self, request, version, **kwargs):
+        """Strong validator for one exact representation of the user's data"""
+        user = request.user
+        # Everything that changes the response bytes: who, which data version,
+        # which resource, which query parameters and which renderer. User edits
+        # do not bump the data version, so ?expand=user needs the user's own fields
+        source = repr((
+            user.pk, user.date_joined.timestamp(), version, type(self).__name__, self.action,
+            sorted(kwargs.items()), normalized_params(request), request.accepted_renderer.format,
+            [getattr(user, field) for field in UserSerializer.Meta.fields],
+        ))
+        return '"%s"' % hashlib.sha256(source.encode()).hexdigest()[:40]
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        version, updated_at = UserDataVersion.state(request.user.pk)
+        etag = self.get_etag(request, version, **kwargs)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        # Only the ETag decides 304s: Last-Modified has one-second resolution,
+        # so two writes in the same second would make If-Modified-Since stale
+        if updated_at is not None:
+            headers['Last-Modified'] = http_date(updated_at.timestamp())
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            for header, value in headers.items():
+                response[header] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,115 @@
+"""
+Sparse fieldsets (?fields=) and explicit expansion (?expand=) for the API
+
+Serializers return flat ids for related objects by default and only nest a
+related serializer when it is named in ``?expand=``. ``?fields=`` trims the
+response to the listed fields on read requests. The viewset mixin derives
+``select_related()`` and ``only()`` from the fields that will actually be
+rendered, so narrower responses also load fewer rows and columns.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer
+
+def parse_field_list(value):
+    """Split a comma-separated query parameter into names"""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class ExpandableFieldsMixin:
+    """Serializer mixin accepting ``fields`` and ``expand`` keyword arguments
+
+    ``expandable_fields`` maps a field name to ``(serializer_class, kwargs)``;
+    the flat field declared under the same name is swapped for the nested
+    serializer when expanded.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        expanded = [name for name in expand or [] if name in self.expandable_fields]
+        for name in expanded:
+            serializer_class, options = self.expandable_fields[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+
+        if fields:
+            keep = set(fields) | set(expanded)
+            for name in list(self.fields):
+                if name not in keep and not self.fields[name].write_only:
+                    self.fields.pop(name)
+
+
+def plan_queryset(serializer, model, prefix=''):
+    """Return (select_related paths, only() columns or None) for a serializer
+
+    Columns are None when a rendered field reads something other than a
+    model field (a property or method), since its dependencies are unknown.
+    """
+    related = []
+    columns = {prefix + model._meta.pk.name}
+    exact = True
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            exact = False
+            continue
+        name = field.source.split('.')[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            exact = False
+            continue
+
+        if not model_field.is_relation:
+            columns.add(prefix + name)
+        elif not model_field.concrete or model_field.many_to_many:
+            exact = False
+        elif isinstance(field, PrimaryKeyRelatedField) and '.' not in field.source:
+            columns.add(prefix + name)
+        else:
+            related.append(prefix + name)
+            nested_columns = None
+            if isinstance(field, BaseSerializer):
+                nested_related, nested_columns = plan_queryset(field, model_field.related_model, f'{prefix}{name}__')
+                related.extend(nested_related)
+            # Without an exact nested column list the whole related row is loaded
+            columns.update(nested_columns or [prefix + name])
+    return related, columns if exact else None
+
+
+class SparseFieldsetMixin:
+    """ViewSet mixin wiring ?fields= and ?expand= into serializers and querysets"""
+    # Read actions whose querysets may be trimmed with only(); writes need full rows
+    fieldset_actions = ('list', 'retrieve')
+
+    def get_fieldset_options(self):
+        params = self.request.query_params
+        options = {'expand': parse_field_list(params.get('expand'))}
+        if self.request.method in SAFE_METHODS:
+            options['fields'] = parse_field_list(params.get('fields'))
+        return options
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request is not None and issubclass(self.get_serializer_class(), ExpandableFieldsMixin):
+            for option, value in self.get_fieldset_options().items():
+                kwargs.setdefault(option, value)
+        return super().get_serializer(*args, **kwargs)
+
+    def optimize_queryset(self, queryset):
+        """Load only what the requested representation renders"""
+        serializer_class = self.get_serializer_class()
+        if self.action not in self.fieldset_actions or not issubclass(serializer_class, ExpandableFieldsMixin):
+            return queryset
+        related, columns = plan_queryset(serializer_class(**self.get_fieldset_options()), queryset.model)
+        if related:
+            queryset = queryset.select_related(*related)
+        if columns is not None:
+            queryset = queryset.only(*columns)
+        return queryset
@@ -0,0 +1,222 @@
+"""
+Per-endpoint request latency, SQL query count and database time
+
+``metrics_middleware`` times every request and, through a wrapper installed
+on each database connection, the queries it runs, including those run on
+worker threads by async endpoints (the per-request totals travel in a
+context variable, which ``sync_to_async`` copies into its threads). Totals
+are returned in a ``Server-Timing`` header and aggregated into per-endpoint
+histograms held in process memory, served in Prometheus text format by
+``/api/metrics/``. Each server process keeps its own histograms, so scrape
+every process.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RequestStats:
+    """Queries and database time of one request, added to from any thread"""
+
+    def __init__(self, request):
+        self.request = request
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0.0
+
+    def add_query(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.db_time += duration
+
+
+current_stats = ContextVar('request_stats', default=None)
+
+
+def current_endpoint():
+    """Endpoint of the request being handled, or '' outside requests"""
+    stats = current_stats.get()
+    return endpoint_name(stats.request) if stats is not None else ''
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper timing queries made on behalf of a request"""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(time.perf_counter() - started)
+
+
+def instrument(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Connections opened later, including those of worker threads
+connection_created.connect(instrument)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class MetricsRegistry:
+    """Thread-safe in-memory request counters and histograms per endpoint and method"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.requests = {}
+            self.latency = {}
+            self.db_time = {}
+            self.queries = {}
+
+    def observe(self, endpoint, method, status, duration, queries, db_time):
+        key = (endpoint, method)
+        with self.lock:
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.db_time.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(db_time)
+            self.queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(queries)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = [
+            '# HELP http_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self.lock:
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{{labels(endpoint, method)},status="{status}"}} {count}')
+            for name, description, histograms in [
+                ('http_request_duration_seconds', 'Request latency.', self.latency),
+                ('http_request_db_seconds', 'Time spent in SQL queries per request.', self.db_time),
+                ('http_request_queries', 'SQL queries per request.', self.queries),
+            ]:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (endpoint, method), histogram in sorted(histograms.items()):
+                    lines.extend(histogram.lines(name, labels(endpoint, method)))
+        return '\n'.join(lines) + '\n'
+
+
+def labels(endpoint, method):
+    return f'endpoint="{escape(endpoint)}",method="{method}"'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = MetricsRegistry()
+
+
+def endpoint_name(request):
+    """'ViewSet.action' for viewset routes, the view's dotted path otherwise"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view = match.func
+    actions = getattr(view, 'actions', None)
+    if actions:
+        return f"{view.cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+    view = getattr(view, 'cls', view)
+    return f'{view.__module__}.{view.__name__}'
+
+
+def start(request):
+    for connection in connections.all(initialized_only=True):
+        instrument(connection)
+    return time.perf_counter(), current_stats.set(RequestStats(request))
+
+
+def finish(request, response, started, token):
+    duration = time.perf_counter() - started
+    stats = current_stats.get()
+    current_stats.reset(token)
+    endpoint = endpoint_name(request)
+    REGISTRY.observe(endpoint, request.method, response.status_code, duration, stats.queries, stats.db_time)
+    response['Server-Timing'] = (
+        f'app;dur={duration * 1000:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+    )
+    threshold = settings.METRICS_SLOW_REQUEST_SECONDS
+    if threshold is not None and duration >= threshold:
+        logger.warning(
+            'Slow request: %s %s (%s) returned %s in %.3fs with %d queries taking %.3fs',
+            request.method, request.get_full_path(), endpoint, response.status_code,
+            duration, stats.queries, stats.db_time
+        )
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Record every request's latency, query count and database time"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started, token = start(request)
+            try:
+                response = await get_response(request)
+            except BaseException:
+                current_stats.reset(token)
+                raise
+            return finish(request, response, started, token)
+    else:
+        def middleware(request):
+            started, token = start(request)
+            try:
+                response = get_response(request)
+            except BaseException:
+                current_stats.reset(token)
+                raise
+            return finish(request, response, started, token)
+    return middleware
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Request metrics in Prometheus text format"""
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,42 @@
+"""
+Running independent per-user jobs in worker processes
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.db import connections
+
+
+def _init_worker():
+    # Spawned workers start from a fresh interpreter; forked ones are already set up
+    django.setup()
+
+
+def process_pool(workers):
+    """A process pool whose workers have Django set up and their own database connections"""
+    # Forked workers must open their own database connections
+    connections.close_all()
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+
+def run_in_processes(func, items, workers):
+    """Yield (item, result, error) for ``func(item)`` over items using up to ``workers`` processes
+
+    ``func`` must be a picklable module-level callable. With one worker (or a
+    single item) everything runs in the current process.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as exc:
+                yield item, None, exc
+        return
+
+    with process_pool(min(workers, len(items))) as pool:
+        futures = {pool.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as exc:
+                yield futures[future], None, exc
@@ -0,0 +1,65 @@
+"""
+Opt-in cProfile dumps of individual requests
+
+A request is profiled when a staff user adds ``?profile=1`` or, with
+``PROFILE_SAMPLE_RATE`` above zero, when it is picked at random. The view
+is called, and its response rendered, under cProfile on the thread that
+runs it, so sync views are profiled under WSGI and ASGI alike; async views
+are not, since awaiting hands their thread to other requests. Stats are
+written in pstats format to ``PROFILE_DIR/<endpoint>/``, where
+``python manage.py profile_summary`` aggregates them. Python allows one
+active profiler at a time, so concurrent requests are not profiled.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+import uuid
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+from .metrics import endpoint_name
+
+TRIGGER = 'profile'
+HEADER = 'X-Profile'
+
+_profiling = threading.Lock()
+
+
+def wants_profile(request):
+    if request.GET.get(TRIGGER) == '1' and request.user.is_staff:
+        return True
+    return random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def dump(profiler, endpoint):
+    """Write the stats to the endpoint's directory and return their path relative to PROFILE_DIR"""
+    name = os.path.join(endpoint, f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}.prof")
+    path = os.path.join(settings.PROFILE_DIR, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    profiler.dump_stats(path)
+    return name
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """Run sampled or staff-requested sync views under cProfile"""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(view_func) or not wants_profile(request):
+            return None
+        if not _profiling.acquire(blocking=False):
+            return None
+        try:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = view_func(request, *view_args, **view_kwargs)
+                if callable(getattr(response, 'render', None)):
+                    response.render()
+            finally:
+                profiler.disable()
+        finally:
+            _profiling.release()
+        response[HEADER] = dump(profiler, endpoint_name(request))
+        return response
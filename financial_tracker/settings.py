@@ -41,9 +41,13 @@ INSTALLED_APPS = [
     'corsheaders',
     'accounts',
     'transactions',
+    'jobs',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    # First, so request timings include the other middleware
+    'financial_tracker.metrics.metrics_middleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -52,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'financial_tracker.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'financial_tracker.urls'
@@ -81,10 +86,43 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction starts and wait for it instead
+        # of failing, so concurrent balance updates queue up rather than error
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # A file-backed test database lets concurrency tests use real locking
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Versioned API responses (see financial_tracker/cache.py). Entries are never
+    # deleted on write, so MAX_ENTRIES bounds the size. With several processes,
+    # use a shared backend such as django.core.cache.backends.db.DatabaseCache
+    # (run `python manage.py createcachetable`) or FileBasedCache.
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 3,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -121,6 +159,9 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded statements and export files of background jobs
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -138,6 +179,21 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Exchange rates are stored as units of each currency per one unit of this currency
+FX_BASE_CURRENCY = 'USD'
+# Memoised (currency, date, rates version) rate lookups per process
+FX_CACHE_SIZE = 4096
+
+# Log a warning for requests slower than this many seconds (None to disable)
+METRICS_SLOW_REQUEST_SECONDS = None
+
+# Save queries slower than this many seconds with their plan, e.g. 0.5 (None to disable)
+SLOW_QUERY_SECONDS = None
+
+# Fraction of requests run under cProfile (staff can also add ?profile=1)
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_DIR = BASE_DIR / 'profiles'
+
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 CORS_ALLOWED_ORIGINS = [
@@ -19,6 +19,8 @@ from django.urls import path, include
 from rest_framework import routers
 from django.http import JsonResponse
 from .api_docs import api_documentation
+from .cache import cache_stats
+from .metrics import metrics
 
 def api_root(request):
     """API root endpoint with information about available endpoints"""
@@ -29,6 +31,7 @@ def api_root(request):
         'endpoints': {
             'accounts': '/accounts/api/',
             'transactions': '/transactions/api/',
+            'jobs': '/jobs/api/',
             'admin': '/admin/',
             'auth': '/api-auth/',
         }
@@ -38,7 +41,10 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', api_root, name='api-root'),
     path('api/docs/', api_documentation, name='api-docs'),
+    path('api/cache-stats/', cache_stats, name='cache-stats'),
+    path('api/metrics/', metrics, name='metrics'),
     path('accounts/', include('accounts.urls')),
     path('transactions/', include('transactions.urls')),
+    path('jobs/', include('jobs.urls')),
     path('api-auth/', include('rest_framework.urls')),
 ]
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'user', 'status', 'attempts', 'progress_done', 'progress_total', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['kind', 'user__username']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'locked_by', 'locked_at']
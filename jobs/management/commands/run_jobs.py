@@ -0,0 +1,73 @@
+"""
+Management command to run queued background jobs
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from financial_tracker.parallel import process_pool
+from jobs.worker import claim_jobs, run_job, run_job_in_thread, worker_name
+
+class Command(BaseCommand):
+    help = 'Claim and run queued background jobs in a thread or process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of jobs to run at the same time (default: 4)'
+        )
+        parser.add_argument(
+            '--pool',
+            choices=['thread', 'process'],
+            default='thread',
+            help='Run jobs in threads or in worker processes (default: thread)'
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between checks for new jobs (default: 2)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no jobs are due instead of waiting for more'
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        if options['pool'] == 'process':
+            pool, func = process_pool(workers), run_job
+        else:
+            pool, func = ThreadPoolExecutor(max_workers=workers), run_job_in_thread
+        worker = worker_name()
+        running = {}
+        counts = {}
+
+        try:
+            with pool:
+                while True:
+                    claimed = claim_jobs(worker, workers - len(running)) if len(running) < workers else []
+                    for job_id in claimed:
+                        running[pool.submit(func, job_id)] = job_id
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+
+                    done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = running.pop(future)
+                        outcome = future.result()
+                        counts[outcome] = counts.get(outcome, 0) + 1
+                        self.stdout.write(f'Job {job_id}: {outcome}')
+        except KeyboardInterrupt:
+            # Leaving the pool's context waits for the running jobs
+            self.stdout.write('Stopping after the running jobs finish')
+
+        self.stdout.write(self.style.SUCCESS(
+            'Finished: ' + ', '.join(f'{count} {outcome}' for outcome, count in sorted(counts.items()))
+            if counts else 'Finished: no jobs were due'
+        ))
@@ -0,0 +1,32 @@
+"""
+Job handlers by kind
+
+Apps register handlers in their ``tasks`` module, which ``JobsConfig`` imports
+at startup in every process, including worker processes.
+"""
+from collections import namedtuple
+from .models import Job
+
+Task = namedtuple('Task', ['func', 'api'])
+
+TASKS = {}
+
+
+def task(kind, api=False):
+    """Register ``func(job)`` as the handler of a job kind
+
+    The handler returns a JSON-serialisable result, and may report progress
+    with ``job.set_progress``. ``api`` tasks can be queued directly through
+    the jobs endpoint.
+    """
+    def decorator(func):
+        TASKS[kind] = Task(func, api)
+        return func
+    return decorator
+
+
+def enqueue(kind, user=None, params=None, **options):
+    """Queue a job of a registered kind and return it"""
+    if kind not in TASKS:
+        raise LookupError(f'Unknown job kind: {kind}')
+    return Job.objects.create(kind=kind, user=user, params=params or {}, **options)
@@ -0,0 +1,25 @@
+from rest_framework import serializers
+from .models import Job
+from .registry import TASKS
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background job status and progress"""
+    progress = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'params', 'status', 'attempts', 'max_attempts', 'progress',
+                 'progress_done', 'progress_total', 'result', 'error', 'run_after',
+                 'created_at', 'started_at', 'finished_at']
+        read_only_fields = [field for field in fields if field not in ('kind', 'params')]
+    
+    def validate_kind(self, value):
+        if value not in TASKS or not TASKS[value].api:
+            kinds = sorted(kind for kind, task in TASKS.items() if task.api)
+            raise serializers.ValidationError(f"Select one of: {', '.join(kinds)}.")
+        return value
+    
+    def validate_params(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Expected an object.')
+        return value
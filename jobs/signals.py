@@ -0,0 +1,7 @@
+"""
+Signals sent by job workers
+"""
+from django.dispatch import Signal
+
+# Sent after every job run, like ``request_finished`` after every request; ``sender`` is the Job
+job_finished = Signal()
@@ -0,0 +1,156 @@
+import shutil
+import tempfile
+from io import StringIO
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from datetime import datetime, timedelta
+from decimal import Decimal
+from accounts.models import Account
+from transactions.models import Transaction
+from .models import Job
+from .registry import TASKS, enqueue, task
+from .worker import BACKOFF_SECONDS, LOCK_TIMEOUT, claim_jobs, run_job
+
+class JobWorkerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='worker', password='testpass123')
+        self.calls = []
+
+        @task('test_flaky')
+        def flaky(job):
+            self.calls.append(job.attempts)
+            if job.attempts < job.params['succeed_on']:
+                raise RuntimeError('temporary failure')
+            job.set_progress(10, 10)
+            return {'attempts': job.attempts}
+        self.addCleanup(TASKS.pop, 'test_flaky')
+
+    def test_failed_jobs_retry_with_backoff(self):
+        """Test a failing job is requeued with a growing delay and succeeds on a later attempt"""
+        job = enqueue('test_flaky', self.user, {'succeed_on': 2})
+
+        self.assertEqual(claim_jobs('w1', 5), [job.pk])
+        self.assertEqual(run_job(job.pk), 'queued')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertIn('temporary failure', job.error)
+        self.assertGreaterEqual(job.run_after, timezone.now() + timedelta(seconds=BACKOFF_SECONDS - 5))
+        self.assertEqual(claim_jobs('w1', 5), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(claim_jobs('w1', 5), [job.pk])
+        self.assertEqual(run_job(job.pk), 'succeeded')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress), ('succeeded', {'attempts': 2}, 100.0))
+        self.assertEqual(self.calls, [1, 2])
+
+    def test_jobs_fail_after_max_attempts(self):
+        """Test a job that keeps failing is marked failed once out of attempts"""
+        job = enqueue('test_flaky', self.user, {'succeed_on': 5}, max_attempts=1)
+        claim_jobs('w1', 5)
+        self.assertEqual(run_job(job.pk), 'failed')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claims_are_exclusive_and_stale_locks_are_reclaimed(self):
+        """Test a running job is not claimed twice until its worker's lock expires"""
+        job = enqueue('test_flaky', self.user, {'succeed_on': 1})
+        self.assertEqual(claim_jobs('w1', 5), [job.pk])
+        self.assertEqual(claim_jobs('w2', 5), [])
+
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - LOCK_TIMEOUT - timedelta(minutes=1))
+        self.assertEqual(claim_jobs('w2', 5), [job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.locked_by, job.attempts), ('w2', 2))
+
+class JobRunnerTest(TransactionTestCase):
+    # The worker runs jobs on pool threads, which only see committed data
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(username='jobowner', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def run_worker(self):
+        call_command('run_jobs', workers=1, once=True, stdout=StringIO())
+
+    def test_run_jobs_command(self):
+        """Test the worker command runs due jobs in a thread pool and exits with --once"""
+        for _ in range(3):
+            enqueue('rebuild_rollups', self.user)
+        out = StringIO()
+        call_command('run_jobs', workers=2, once=True, stdout=out)
+        self.assertIn('Finished: 3 succeeded', out.getvalue())
+        self.assertEqual(Job.objects.filter(status='succeeded').count(), 3)
+
+    def test_background_import(self):
+        """Test a background import is queued, run by the worker and reported on the job"""
+        upload = SimpleUploadedFile(
+            'statement.csv',
+            b'date,amount,description\n2024-01-05,-12.50,Coffee\n2024-01-06,1000,Salary\n',
+            content_type='text/csv'
+        )
+        response = self.client.post('/transactions/api/transactions/import/', {
+            'file': upload, 'account_id': self.account.id, 'background': True
+        }, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(Transaction.objects.count(), 0)
+
+        self.run_worker()
+
+        response = self.client.get(f"/jobs/api/jobs/{response.data['id']}/")
+        self.assertEqual(response.data['status'], 'succeeded')
+        self.assertEqual(response.data['result']['created'], 2)
+        self.assertEqual(response.data['progress_done'], 2)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('987.50'))
+
+    def test_background_export_download(self):
+        """Test a background export writes a file that can be downloaded from the job"""
+        for day in range(4):
+            Transaction.objects.create(
+                user=self.user,
+                account=self.account,
+                transaction_type='income' if day == 3 else 'expense',
+                amount=Decimal('5.00'),
+                description=f'Item {day}',
+                date=timezone.make_aware(datetime(2024, 1, day + 1, 12)),
+            )
+        response = self.client.get('/transactions/api/transactions/export/', {
+            'output': 'ndjson', 'background': 'true', 'type': 'expense'
+        })
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+
+        self.run_worker()
+
+        response = self.client.get(f'/jobs/api/jobs/{job_id}/')
+        self.assertEqual(response.data['result']['rows'], 3)
+        self.assertEqual(response.data['progress'], 100.0)
+        response = self.client.get(f'/jobs/api/jobs/{job_id}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+
+    def test_queue_api_jobs_and_isolation(self):
+        """Test only API-enabled kinds can be queued and jobs are visible to their owner only"""
+        response = self.client.post('/jobs/api/jobs/', {'kind': 'rebuild_rollups'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/jobs/api/jobs/', {'kind': 'import_statement'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        other = User.objects.create_user(username='someoneelse', password='testpass123')
+        job = enqueue('rebuild_rollups', other)
+        self.assertEqual(self.client.get(f'/jobs/api/jobs/{job.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/jobs/api/jobs/').data['count'], 1)
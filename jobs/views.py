@@ -0,0 +1,29 @@
+import os
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .models import Job
+from .serializers import JobSerializer
+
+class JobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """ViewSet for queueing background jobs and following their progress"""
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the file produced by a finished job"""
+        job = self.get_object()
+        name = (job.result or {}).get('file') if isinstance(job.result, dict) else None
+        if job.status != 'succeeded' or not name:
+            return Response({'error': 'This job has no file to download.'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(default_storage.open(name), as_attachment=True, filename=os.path.basename(name))
@@ -0,0 +1,104 @@
+"""
+Claiming and running queued jobs
+
+Workers claim jobs with a conditional UPDATE inside a transaction, using
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports it so
+concurrent workers skip each other's rows instead of waiting on them. Jobs
+whose worker died are reclaimed once their lock is older than
+``LOCK_TIMEOUT``. Failed jobs are retried with exponential backoff until
+they run out of attempts.
+"""
+import os
+import socket
+import traceback
+from datetime import timedelta
+from django.db import close_old_connections, connection, transaction as db_transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+from .registry import TASKS
+from .signals import job_finished
+
+LOCK_TIMEOUT = timedelta(minutes=30)
+BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backoff(attempts):
+    """Delay before retrying a job that has failed ``attempts`` times"""
+    return timedelta(seconds=min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempts - 1)))
+
+
+def stale(now):
+    return Q(status='running', locked_at__lt=now - LOCK_TIMEOUT)
+
+
+def claimable(now):
+    return Q(status='queued', run_after__lte=now) | (stale(now) & Q(attempts__lt=F('max_attempts')))
+
+
+def claim_jobs(worker, limit):
+    """Mark up to ``limit`` due jobs as running for ``worker`` and return their ids"""
+    now = timezone.now()
+    with db_transaction.atomic():
+        # Jobs that keep taking their worker down are not retried forever
+        Job.objects.filter(stale(now), attempts__gte=F('max_attempts')).update(
+            status='failed', error='The worker stopped responding.', finished_at=now, locked_by='', locked_at=None
+        )
+        candidates = Job.objects.filter(claimable(now)).order_by('run_after', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # Re-checking the condition keeps claims exclusive where rows can't be locked
+        Job.objects.filter(claimable(now), id__in=ids).update(
+            status='running',
+            locked_by=worker,
+            locked_at=now,
+            started_at=now,
+            attempts=F('attempts') + 1
+        )
+        return list(Job.objects.filter(id__in=ids, locked_by=worker, locked_at=now).values_list('id', flat=True))
+
+
+def finish(job, **updates):
+    """Record the outcome unless another worker has reclaimed the job meanwhile"""
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by, locked_at=job.locked_at).update(
+        locked_by='', locked_at=None, **updates
+    )
+
+
+def run_job(job_id):
+    """Run a claimed job and return its new status"""
+    job = Job.objects.select_related('user').get(pk=job_id)
+    try:
+        handler = TASKS.get(job.kind)
+        if handler is None:
+            raise LookupError(f'Unknown job kind: {job.kind}')
+        result = handler.func(job)
+    except Exception:
+        error = traceback.format_exc(limit=5)
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            finish(job, status='queued', error=error, run_after=now + backoff(job.attempts))
+            return 'queued'
+        finish(job, status='failed', error=error, finished_at=now)
+        return 'failed'
+    else:
+        finish(job, status='succeeded', result=result, error='', finished_at=timezone.now())
+        return 'succeeded'
+    finally:
+        job_finished.send(sender=Job, job=job)
+
+
+def run_job_in_thread(job_id):
+    try:
+        return run_job(job_id)
+    finally:
+        # Pool threads live outside the request cycle that normally closes connections
+        close_old_connections()
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import SlowQuery
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ['fingerprint', 'view', 'count', 'total_time', 'max_time', 'last_seen']
+    list_filter = ['view']
+    search_fields = ['normalized_sql', 'view']
+    readonly_fields = [field.name for field in SlowQuery._meta.fields]
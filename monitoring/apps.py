@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+    
+    def ready(self):
+        # Installs the slow query wrapper on every new database connection
+        from . import slow_queries  # noqa: F401
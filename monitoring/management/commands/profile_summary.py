@@ -0,0 +1,83 @@
+"""
+Management command to summarise the hottest functions across request profiles
+"""
+import os
+import pstats
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = {
+    'tottime': 2,
+    'cumtime': 3,
+}
+
+class Command(BaseCommand):
+    help = 'Aggregate the cProfile dumps written by the profiling middleware and list the hottest functions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            type=str,
+            default=str(settings.PROFILE_DIR),
+            help='Profile directory (default: PROFILE_DIR)'
+        )
+        parser.add_argument(
+            '--endpoint',
+            type=str,
+            action='append',
+            help='Only include this endpoint, e.g. TransactionViewSet.by_category (may be repeated)'
+        )
+        parser.add_argument(
+            '--sort',
+            choices=sorted(SORT_KEYS),
+            default='tottime',
+            help='Rank by time in the function itself or including its callees (default: tottime)'
+        )
+        parser.add_argument('--limit', type=int, default=20, help='Functions to list (default: 20)')
+
+    def dumps(self, directory, endpoints):
+        """{endpoint: [profile paths]}"""
+        found = {}
+        if not os.path.isdir(directory):
+            return found
+        for endpoint in sorted(os.listdir(directory)):
+            if endpoints and endpoint not in endpoints:
+                continue
+            folder = os.path.join(directory, endpoint)
+            if os.path.isdir(folder):
+                paths = sorted(
+                    os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('.prof')
+                )
+                if paths:
+                    found[endpoint] = paths
+        return found
+
+    def short_path(self, filename):
+        base = str(settings.BASE_DIR)
+        if filename.startswith(base + os.sep):
+            return os.path.relpath(filename, base)
+        # Library files: from the package directory on
+        parts = filename.split(os.sep)
+        return os.sep.join(parts[parts.index('site-packages') + 1:]) if 'site-packages' in parts else filename
+
+    def handle(self, *args, **options):
+        found = self.dumps(options['dir'], options['endpoint'])
+        if not found:
+            raise CommandError(f"No profiles found in {options['dir']}")
+        paths = [path for endpoint_paths in found.values() for path in endpoint_paths]
+        stats = pstats.Stats(*paths)
+        total = stats.total_tt
+
+        for endpoint, endpoint_paths in found.items():
+            self.stdout.write(f'{endpoint}: {len(endpoint_paths)} profile(s)')
+        self.stdout.write('')
+        self.stdout.write(f"{'calls':>10} {'tottime':>9} {'cumtime':>9} {'share':>6}  function")
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][SORT_KEYS[options['sort']]], reverse=True)
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows[:options['limit']]:
+            share = tottime / total * 100 if total else 0
+            location = name if filename == '~' else f'{name} ({self.short_path(filename)}:{line})'
+            self.stdout.write(f'{calls:>10} {tottime:>8.3f}s {cumtime:>8.3f}s {share:>5.1f}%  {location}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Summarised {len(paths)} profile(s) of {len(found)} endpoint(s), {total:.3f}s of profiled time'
+        ))
@@ -0,0 +1,60 @@
+"""
+Management command to list the slowest query shapes with their query plans
+"""
+from django.core.management.base import BaseCommand
+from monitoring.models import SlowQuery
+from monitoring.slow_queries import flush
+
+ORDERINGS = {
+    'total': '-total_time',
+    'max': '-max_time',
+    'count': '-count',
+}
+
+class Command(BaseCommand):
+    help = 'List the query shapes that ran slower than SLOW_QUERY_SECONDS, worst first'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sort',
+            choices=sorted(ORDERINGS),
+            default='total',
+            help='Rank by total time, slowest run or number of slow runs (default: total)'
+        )
+        parser.add_argument('--limit', type=int, default=10, help='Query shapes to list (default: 10)')
+        parser.add_argument(
+            '--view',
+            type=str,
+            help='Only queries run by this endpoint, e.g. TransactionViewSet.search'
+        )
+        parser.add_argument('--stack', action='store_true', help='Also show the call stack of the slowest run')
+        parser.add_argument('--clear', action='store_true', help='Delete the recorded slow queries')
+
+    def handle(self, *args, **options):
+        flush()
+        queries = SlowQuery.objects.all()
+        if options['view']:
+            queries = queries.filter(view=options['view'])
+        if options['clear']:
+            deleted, _ = queries.delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} slow query record(s)'))
+            return
+
+        shown = 0
+        for query in queries.order_by(ORDERINGS[options['sort']], 'id')[:options['limit']]:
+            shown += 1
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'#{shown} {query.fingerprint[:12]}: {query.count} slow run(s), total {query.total_time:.3f}s, '
+                f'avg {query.average_time:.3f}s, max {query.max_time:.3f}s, last {query.last_seen:%Y-%m-%d %H:%M}'
+            ))
+            self.stdout.write(f'  View: {query.view or "-"}  Stack: {query.stack_fingerprint[:12] or "-"}')
+            self.stdout.write(f'  SQL: {query.normalized_sql}')
+            if query.explain:
+                self.stdout.write('  Plan:')
+                for line in query.explain.splitlines():
+                    self.stdout.write(f'    {line}')
+            if options['stack'] and query.stack:
+                self.stdout.write('  Stack:')
+                for line in query.stack.splitlines():
+                    self.stdout.write(f'    {line}')
+        self.stdout.write(self.style.SUCCESS(f'Listed {shown} of {queries.count()} slow query shape(s)'))
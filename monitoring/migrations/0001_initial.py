@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True)),
+                ('normalized_sql', models.TextField()),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('total_time', models.FloatField(default=0)),
+                ('max_time', models.FloatField(default=0)),
+                ('sql', models.TextField()),
+                ('params', models.TextField(blank=True)),
+                ('explain', models.TextField(blank=True)),
+                ('view', models.CharField(blank=True, max_length=200)),
+                ('stack', models.TextField(blank=True)),
+                ('stack_fingerprint', models.CharField(blank=True, max_length=40)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+                'ordering': ['-total_time'],
+            },
+        ),
+    ]
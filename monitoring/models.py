@@ -0,0 +1,29 @@
+from django.db import models
+
+class SlowQuery(models.Model):
+    """A query shape that ran slower than ``SLOW_QUERY_SECONDS``, with its slowest occurrence"""
+    fingerprint = models.CharField(max_length=40, unique=True)
+    normalized_sql = models.TextField()
+    count = models.PositiveBigIntegerField(default=0)
+    total_time = models.FloatField(default=0)
+    max_time = models.FloatField(default=0)
+    # The slowest occurrence so far
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    explain = models.TextField(blank=True)
+    view = models.CharField(max_length=200, blank=True)
+    stack = models.TextField(blank=True)
+    stack_fingerprint = models.CharField(max_length=40, blank=True)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-total_time']
+        verbose_name_plural = 'slow queries'
+    
+    def __str__(self):
+        return f"{self.fingerprint[:12]} ({self.count} x, max {self.max_time:.3f}s)"
+    
+    @property
+    def average_time(self):
+        return self.total_time / self.count if self.count else 0
@@ -0,0 +1,190 @@
+"""
+Logging queries slower than ``SLOW_QUERY_SECONDS`` with their query plan
+
+The log is opt-in: while ``SLOW_QUERY_SECONDS`` is None no wrapper is
+installed. Otherwise an execute wrapper on every database connection times
+each query, and a slow one is recorded with the endpoint that ran it and a
+fingerprint of the project frames on its call stack. Occurrences are grouped
+by query shape: SQL with literals and ``IN`` lists collapsed. They are
+buffered in memory and written to ``SlowQuery`` when a request or a job
+finishes. The slowest run of each SELECT is explained then, outside the
+request's own transaction (through the raw cursor, so the EXPLAIN is
+neither timed nor logged itself), and the log survives rolled back requests.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.signals import request_finished, setting_changed
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from financial_tracker import metrics
+from financial_tracker.metrics import current_endpoint
+from jobs.signals import job_finished
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_FRAMES = 15
+# Execute wrappers are on every query's stack
+WRAPPER_FILES = {__file__, metrics.__file__}
+EXPLAINABLE = re.compile(r'^\s*(select|with)\b', re.IGNORECASE)
+NORMALIZERS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE), 'IN (...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+_buffer = {}
+_buffer_lock = threading.Lock()
+_flushing = ContextVar('slow_query_flushing', default=False)
+
+
+def normalize(sql):
+    """The shape of a query: literals and placeholders as ?, IN lists collapsed"""
+    for pattern, replacement in NORMALIZERS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def project_stack():
+    """(path, line, function) of the project frames leading to the query, innermost last"""
+    base = str(settings.BASE_DIR) + os.sep
+    frames = [
+        (os.path.relpath(frame.filename, base), frame.lineno, frame.name)
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base) and frame.filename not in WRAPPER_FILES
+        and os.sep + 'site-packages' + os.sep not in frame.filename
+    ]
+    return frames[-MAX_STACK_FRAMES:]
+
+
+def explain(connection, sql, params):
+    """The database's query plan, or '' when the query cannot be explained"""
+    if not EXPLAINABLE.match(sql):
+        return ''
+    try:
+        with connection.cursor() as cursor:
+            # The raw cursor skips the execute wrappers and the debug query log
+            cursor.cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            rows = cursor.cursor.fetchall()
+    except DatabaseError as exc:
+        return f'EXPLAIN failed: {exc}'
+    if connection.vendor in ('sqlite', 'postgresql'):
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join(' | '.join(str(value) for value in row) for row in rows)
+
+
+def record(sql, params, duration, connection, many):
+    normalized = normalize(sql)
+    key = fingerprint(normalized)
+    with _buffer_lock:
+        entry = _buffer.get(key)
+        slowest = entry is None or duration > entry['max_time']
+    occurrence = {}
+    if slowest:
+        stack = project_stack()
+        occurrence = {
+            'sql': sql,
+            'params': repr(params)[:2000],
+            # Explained when flushed, not inside the caller's transaction
+            'explain': None if many else (connection.alias, params),
+            'view': current_endpoint(),
+            'stack': '\n'.join(f'{path}:{line} in {name}' for path, line, name in stack),
+            # Without line numbers, so edits elsewhere in a file keep the fingerprint
+            'stack_fingerprint': fingerprint('\n'.join(f'{path}:{name}' for path, _, name in stack)) if stack else '',
+        }
+    now = timezone.now()
+    with _buffer_lock:
+        entry = _buffer.setdefault(key, {
+            'normalized_sql': normalized, 'count': 0, 'total_time': 0.0, 'max_time': 0.0, 'first_seen': now,
+        })
+        entry['count'] += 1
+        entry['total_time'] += duration
+        entry['last_seen'] = now
+        if occurrence and duration > entry['max_time']:
+            entry['max_time'] = duration
+            entry.update(occurrence)
+
+
+def record_slow_query(execute, sql, params, many, context):
+    """Connection execute wrapper buffering queries slower than the threshold"""
+    threshold = settings.SLOW_QUERY_SECONDS
+    if threshold is None or _flushing.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    if duration >= threshold:
+        record(sql, params, duration, context['connection'], many)
+    return result
+
+
+def instrument(connection, **kwargs):
+    if settings.SLOW_QUERY_SECONDS is not None and record_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_query)
+
+
+def toggle(setting, value, **kwargs):
+    """Install or remove the wrapper on open connections when the threshold is overridden, as in tests"""
+    if setting != 'SLOW_QUERY_SECONDS':
+        return
+    for connection in connections.all(initialized_only=True):
+        if value is None:
+            if record_slow_query in connection.execute_wrappers:
+                connection.execute_wrappers.remove(record_slow_query)
+        else:
+            instrument(connection)
+
+
+def flush(**kwargs):
+    """Explain the slowest run of each buffered query shape and write them to the database"""
+    global _buffer
+    with _buffer_lock:
+        if not _buffer:
+            return
+        entries, _buffer = _buffer, {}
+
+    from .models import SlowQuery
+    token = _flushing.set(True)
+    try:
+        for entry in entries.values():
+            target = entry.get('explain')
+            entry['explain'] = explain(connections[target[0]], entry['sql'], target[1]) if target else ''
+        for key, entry in entries.items():
+            slow_query, created = SlowQuery.objects.get_or_create(fingerprint=key, defaults=entry)
+            if created:
+                continue
+            updates = {
+                'count': F('count') + entry['count'],
+                'total_time': F('total_time') + entry['total_time'],
+                'max_time': Greatest(F('max_time'), entry['max_time']),
+                'last_seen': entry['last_seen'],
+            }
+            if entry['max_time'] > slow_query.max_time:
+                updates.update({name: entry[name] for name in ('sql', 'params', 'explain', 'view', 'stack',
+                                                                'stack_fingerprint')})
+            SlowQuery.objects.filter(pk=slow_query.pk).update(**updates)
+    except DatabaseError:
+        logger.exception('Could not save %d slow query record(s)', len(entries))
+    finally:
+        _flushing.reset(token)
+
+
+connection_created.connect(instrument)
+setting_changed.connect(toggle)
+request_finished.connect(flush)
+job_finished.connect(flush)
@@ -0,0 +1,124 @@
+import os
+import pstats
+import shutil
+import tempfile
+from io import StringIO
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+from datetime import datetime
+from decimal import Decimal
+from accounts.models import Account
+from jobs.registry import enqueue
+from jobs.worker import claim_jobs, run_job
+from transactions.models import Transaction
+from .models import SlowQuery
+from . import slow_queries
+from .slow_queries import flush as flush_slow_queries, record_slow_query
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='slowpoke', password='testpass123')
+        account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        for day in range(3):
+            Transaction.objects.create(
+                user=self.user, account=account, transaction_type='expense', amount=Decimal('5.00'),
+                description='Coffee', date=timezone.make_aware(datetime(2024, 1, day + 1, 12))
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_slow_queries_are_explained_and_grouped_by_shape(self):
+        """Test slow queries are saved once per shape with their plan, view and stack"""
+        with self.settings(SLOW_QUERY_SECONDS=0):
+            self.client.get('/transactions/api/transactions/', {'start_date': '2024-01-01'})
+            self.client.get('/transactions/api/transactions/', {'start_date': '2024-01-02'})
+            list(Transaction.objects.filter(id__in=[1, 2, 3]))
+            list(Transaction.objects.filter(id__in=[4, 5]))
+            flush_slow_queries()
+
+        listing = SlowQuery.objects.get(
+            view='TransactionViewSet.list', normalized_sql__startswith='SELECT "transactions_transaction"."id"'
+        )
+        self.assertEqual(listing.count, 2)
+        self.assertIn('transactions_transaction', listing.explain)
+        self.assertIn('conditional.py:', listing.stack)
+        self.assertNotIn('record_query', listing.stack)
+        self.assertNotIn('2024', listing.normalized_sql)
+        by_ids = SlowQuery.objects.get(normalized_sql__contains='IN (...)', view='')
+        self.assertEqual(by_ids.count, 2)
+
+        out = StringIO()
+        call_command('slow_queries', view='TransactionViewSet.list', sort='count', limit=50, stdout=out)
+        self.assertIn(listing.normalized_sql, out.getvalue())
+        self.assertIn('Plan:', out.getvalue())
+        self.assertNotIn('IN (...)', out.getvalue())
+
+    def test_opt_in_and_flushed_after_each_job(self):
+        """Test the wrapper is only installed while enabled and job workers save what they buffered"""
+        self.assertNotIn(record_slow_query, connection.execute_wrappers)
+        with self.settings(SLOW_QUERY_SECONDS=0):
+            self.assertIn(record_slow_query, connection.execute_wrappers)
+            job = enqueue('detect_recurring', self.user)
+            claim_jobs('test-worker', 1)
+            self.assertEqual(run_job(job.pk), 'succeeded')
+            self.assertEqual(slow_queries._buffer, {})
+        self.assertNotIn(record_slow_query, connection.execute_wrappers)
+
+        detection = SlowQuery.objects.get(normalized_sql__contains='FROM "transactions_transaction"', view='')
+        self.assertIn('transactions/recurring.py:', detection.stack)
+        self.assertIn('transactions_transaction', detection.explain)
+
+    def test_fast_queries_are_ignored(self):
+        """Test nothing is saved below the threshold"""
+        with self.settings(SLOW_QUERY_SECONDS=60):
+            self.client.get('/transactions/api/transactions/')
+            flush_slow_queries()
+        self.assertFalse(SlowQuery.objects.exists())
+
+class RequestProfilingTest(TestCase):
+    def setUp(self):
+        self.profiles = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiles)
+        settings = self.settings(PROFILE_DIR=self.profiles)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(username='profiled', password='testpass123')
+        self.staff = User.objects.create_user(username='profiler', password='testpass123', is_staff=True)
+        Account.objects.create(user=self.user, name='Checking', account_type='checking')
+
+    def test_staff_can_profile_a_request(self):
+        """Test ?profile=1 writes a pstats dump per endpoint for staff only"""
+        self.client.force_login(self.user)
+        response = self.client.get('/accounts/api/accounts/?profile=1')
+        self.assertNotIn('X-Profile', response)
+
+        self.client.force_login(self.staff)
+        response = self.client.get('/accounts/api/accounts/?profile=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['X-Profile'].startswith(os.path.join('AccountViewSet.list', '')))
+        stats = pstats.Stats(os.path.join(self.profiles, response['X-Profile']))
+        self.assertIn('list', {name for _, _, name in stats.stats})
+
+    def test_sampled_requests_and_summary(self):
+        """Test sampled requests are profiled and the command ranks functions across dumps"""
+        self.client.force_login(self.user)
+        with self.settings(PROFILE_SAMPLE_RATE=1.0):
+            for _ in range(2):
+                self.client.get('/accounts/api/accounts/')
+            self.client.get('/transactions/api/categories/')
+        self.assertEqual(len(os.listdir(os.path.join(self.profiles, 'AccountViewSet.list'))), 2)
+
+        out = StringIO()
+        call_command('profile_summary', endpoint=['AccountViewSet.list'], limit=5, stdout=out)
+        self.assertIn('AccountViewSet.list: 2 profile(s)', out.getvalue())
+        self.assertNotIn('CategoryViewSet', out.getvalue())
+        self.assertIn('Summarised 2 profile(s) of 1 endpoint(s)', out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('profile_summary', endpoint=['Missing.action'], stdout=StringIO())
@@ -85,7 +85,7 @@ class FinancialTrackerAPITest:
         print()
         
         # Test budgets
-        response = self.session.get(f"{self.base_url}/transactions/api/budgets/current/")
+        response = self.session.get(f"{self.base_url}/transactions/api/budgets/current/?expand=category")
         if response.status_code == 200:
             budgets = response.json()
             print(f"5. Current Budgets ({len(budgets)} total):")
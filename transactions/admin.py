@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Category, Transaction, Budget
+from .models import (
+    Category, Transaction, Budget, BalanceCheckpoint, DailyCategorySpend, MonthlySummary,
+    RecurringDetectionState, RecurringSeries, ExchangeRate
+)
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -40,3 +43,42 @@ class BudgetAdmin(admin.ModelAdmin):
     search_fields = ['category__name', 'user__username']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'start_date'
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['account', 'as_of', 'balance', 'created_at']
+    list_filter = ['as_of']
+    search_fields = ['account__name', 'account__user__username']
+    readonly_fields = ['created_at']
+
+@admin.register(DailyCategorySpend)
+class DailyCategorySpendAdmin(admin.ModelAdmin):
+    list_display = ['category', 'user', 'day', 'total', 'transaction_count']
+    list_filter = ['day']
+    search_fields = ['category__name', 'user__username']
+    date_hierarchy = 'day'
+
+@admin.register(MonthlySummary)
+class MonthlySummaryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'account', 'month', 'income_total', 'expense_total', 'transfer_total']
+    search_fields = ['user__username', 'account__name']
+    date_hierarchy = 'month'
+
+@admin.register(RecurringSeries)
+class RecurringSeriesAdmin(admin.ModelAdmin):
+    list_display = ['description', 'user', 'account', 'transaction_type', 'cadence', 'amount', 'occurrences', 'last_date']
+    list_filter = ['cadence', 'transaction_type']
+    search_fields = ['description', 'user__username']
+    readonly_fields = ['history', 'updated_at']
+
+@admin.register(RecurringDetectionState)
+class RecurringDetectionStateAdmin(admin.ModelAdmin):
+    list_display = ['user', 'last_transaction_id', 'updated_at']
+    search_fields = ['user__username']
+    readonly_fields = ['updated_at']
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ['currency', 'date', 'rate']
+    list_filter = ['currency']
+    date_hierarchy = 'date'
@@ -0,0 +1,175 @@
+"""
+Vectorised spending analytics over a user's whole transaction history
+
+A user's (day, amount, category, type) columns are loaded once into compact
+NumPy arrays and kept in a small in-process LRU keyed on the user's data
+version, so repeated chart requests only check the version before computing
+every metric with array operations.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, timedelta
+import numpy as np
+from django.db.models.functions import TruncDate
+from accounts.models import UserDataVersion
+from .models import Transaction
+
+MAX_CACHED_USERS = 64
+ROLLING_WINDOWS = (7, 30)
+PERCENTILES = (0.5, 0.9)
+TYPE_CODES = {'income': 0, 'expense': 1, 'transfer': 2}
+NO_CATEGORY = -1
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+UserArrays = namedtuple('UserArrays', ['version', 'days', 'amounts', 'categories', 'types'])
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_arrays(user_id, version):
+    """Read a user's transactions into arrays ordered by local day"""
+    rows = list(
+        Transaction.objects.filter(user_id=user_id)
+        .annotate(day=TruncDate('date'))
+        .order_by('day')
+        .values_list('day', 'amount', 'category_id', 'transaction_type')
+    )
+    count = len(rows)
+    return UserArrays(
+        version=version,
+        # Days since 1970-01-01, which NumPy reads directly as datetime64[D]
+        days=np.fromiter((row[0].toordinal() - EPOCH_ORDINAL for row in rows), dtype=np.int32, count=count),
+        amounts=np.fromiter((row[1] for row in rows), dtype=np.float64, count=count),
+        categories=np.fromiter(
+            (NO_CATEGORY if row[2] is None else row[2] for row in rows), dtype=np.int64, count=count
+        ),
+        types=np.fromiter((TYPE_CODES[row[3]] for row in rows), dtype=np.int8, count=count),
+    )
+
+
+def user_arrays(user_id):
+    """Return the user's arrays, reloading them only after their data changed"""
+    # Read the version first so a concurrent write can't be cached as older
+    version = UserDataVersion.current(user_id)
+    with _cache_lock:
+        cached = _cache.get(user_id)
+        if cached is not None and cached.version == version:
+            _cache.move_to_end(user_id)
+            return cached
+
+    arrays = load_arrays(user_id, version)
+    with _cache_lock:
+        _cache[user_id] = arrays
+        _cache.move_to_end(user_id)
+        while len(_cache) > MAX_CACHED_USERS:
+            _cache.popitem(last=False)
+    return arrays
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def daily_totals(days, amounts, first, last):
+    """Sum amounts per day for day numbers in [first, last]"""
+    mask = (days >= first) & (days <= last)
+    return np.bincount(days[mask] - first, weights=amounts[mask], minlength=last - first + 1)
+
+
+def rolling_mean(values, window):
+    """Trailing mean over ``window`` values; the first window - 1 are partial sums"""
+    sums = np.cumsum(np.concatenate(([0.0], values)))
+    return (sums[window:] - sums[:-window]) / window
+
+
+def group_percentiles(groups, values, quantiles):
+    """Per-group count, total and linearly interpolated percentiles"""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    keys, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    totals = np.add.reduceat(values, starts) if len(values) else np.zeros(0)
+    percentiles = {}
+    for quantile in quantiles:
+        position = starts + quantile * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        percentiles[quantile] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+    return keys, counts, totals, percentiles
+
+
+def month_numbers(days):
+    """Months since 1970-01 for day numbers"""
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def spending_analytics(arrays, start, end):
+    """Daily spend with rolling averages, category percentiles and month-over-month totals"""
+    first = start.toordinal() - EPOCH_ORDINAL
+    last = end.toordinal() - EPOCH_ORDINAL
+    widest = max(ROLLING_WINDOWS)
+    expense = arrays.types == TYPE_CODES['expense']
+    income = arrays.types == TYPE_CODES['income']
+
+    # Start early enough that the first day's rolling windows are complete
+    spend = daily_totals(arrays.days[expense], arrays.amounts[expense], first - widest + 1, last)
+    rolling = {window: rolling_mean(spend, window)[widest - window:] for window in ROLLING_WINDOWS}
+    spend = spend[widest - 1:]
+    daily = [
+        {
+            'date': start + timedelta(days=offset),
+            'spend': round(float(spend[offset]), 2),
+            **{f'rolling_{window}': round(float(rolling[window][offset]), 2) for window in ROLLING_WINDOWS},
+        }
+        for offset in range(len(spend))
+    ]
+
+    in_period = expense & (arrays.days >= first) & (arrays.days <= last)
+    keys, counts, totals, percentiles = group_percentiles(
+        arrays.categories[in_period], arrays.amounts[in_period], PERCENTILES
+    )
+    categories = [
+        {
+            'category_id': None if key == NO_CATEGORY else int(key),
+            'transaction_count': int(counts[index]),
+            'total': round(float(totals[index]), 2),
+            **{f'p{int(quantile * 100)}': round(float(percentiles[quantile][index]), 2) for quantile in PERCENTILES},
+        }
+        for index, key in enumerate(keys)
+    ]
+
+    # Whole calendar months touching the period, plus the month before for the first delta
+    first_month = int(month_numbers(np.array([first]))[0]) - 1
+    last_month = int(month_numbers(np.array([last]))[0])
+    months = month_numbers(arrays.days)
+    in_months = (months >= first_month) & (months <= last_month)
+    size = last_month - first_month + 1
+    expenses_by_month = np.bincount(
+        months[in_months & expense] - first_month, weights=arrays.amounts[in_months & expense], minlength=size
+    )
+    income_by_month = np.bincount(
+        months[in_months & income] - first_month, weights=arrays.amounts[in_months & income], minlength=size
+    )
+    change = np.diff(expenses_by_month)
+    previous = expenses_by_month[:-1]
+    monthly = [
+        {
+            'month': str(np.datetime64(first_month + offset, 'M')),
+            'income': round(float(income_by_month[offset]), 2),
+            'expenses': round(float(expenses_by_month[offset]), 2),
+            'expenses_change': round(float(change[offset - 1]), 2),
+            'expenses_change_pct': (
+                round(float(change[offset - 1] / previous[offset - 1] * 100), 2) if previous[offset - 1] else None
+            ),
+        }
+        for offset in range(1, size)
+    ]
+
+    return {
+        'start_date': start,
+        'end_date': end,
+        'daily': daily,
+        'categories': categories,
+        'monthly': monthly,
+    }
@@ -0,0 +1,82 @@
+"""
+Async variants of the read-heavy transaction and budget endpoints for ASGI deployments
+"""
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from financial_tracker.async_api import api_response, async_api_view, run_concurrently
+from financial_tracker.cache import async_cached_response
+from .filters import TransactionFilterSet, parse_period
+from .fx import DEFAULT_CURRENCY, MissingExchangeRate, convert_totals, user_currency
+from .models import Budget, Transaction
+from .rollups import empty_totals, period_queries, range_groups
+from .serializers import BudgetSerializer, TransactionSummarySerializer
+from .views import budget_status, summary_data
+
+def narrowed_queries(request, start_date, end_date):
+    transactions = TransactionFilterSet(request.GET, Transaction.objects.filter(user=request.user)).qs
+    return [partial(range_groups, transactions, start_date, end_date)]
+
+@async_api_view
+@async_cached_response('async.transactions.summary')
+async def transaction_summary(request):
+    """Transaction summary with the rollup and edge aggregates of the period run concurrently"""
+    start_date, end_date = parse_period(request.GET)
+    
+    if TransactionFilterSet(request.GET, None).is_narrowed(ignore=('start_date', 'end_date', 'ordering')):
+        queries = narrowed_queries(request, start_date, end_date)
+    else:
+        queries = period_queries(request.user, start_date, end_date)
+    currency, *groups = await run_concurrently(lambda: user_currency(request.user), *queries)
+    
+    try:
+        totals = await sync_to_async(convert_totals)(
+            [group for query_groups in groups for group in query_groups], currency, empty_totals()
+        )
+    except MissingExchangeRate as exc:
+        return api_response({'error': str(exc)}, status=400)
+    
+    return api_response(TransactionSummarySerializer(summary_data(totals, currency, start_date, end_date)).data)
+
+def month_expenses(groups, currency):
+    """Converted month-to-date expenses"""
+    return convert_totals(groups, currency, empty_totals())['expense_total']
+
+@async_api_view
+@async_cached_response('async.budgets.status')
+async def budget_status_summary(request):
+    """Current budgets and month-to-date spend against the profile's monthly budget, queried concurrently"""
+    today = timezone.localdate()
+    budgets = Budget.objects.filter(
+        user=request.user,
+        is_active=True,
+        start_date__lte=today,
+        end_date__gte=today
+    ).with_spent_amount().select_related('category')
+    
+    month = period_queries(request.user, today.replace(day=1), today)
+    listed, profile, *groups = await run_concurrently(
+        lambda: [(budget, BudgetSerializer(budget).data) for budget in budgets],
+        lambda: getattr(request.user, 'profile', None),
+        *month
+    )
+    currency = profile.default_currency if profile else DEFAULT_CURRENCY
+    
+    try:
+        expenses = await sync_to_async(month_expenses)(
+            [group for query_groups in groups for group in query_groups], currency
+        )
+    except MissingExchangeRate as exc:
+        return api_response({'error': str(exc)}, status=400)
+    
+    monthly_budget = profile.monthly_budget if profile else None
+    return api_response({
+        'currency': currency,
+        'monthly_budget': monthly_budget,
+        'month_expenses': expenses,
+        'monthly_remaining': monthly_budget - expenses if monthly_budget is not None else None,
+        'budgets': [
+            dict(zip(('spent_percentage', 'alert_type', 'message'), budget_status(budget)), budget=data)
+            for budget, data in listed
+        ]
+    })
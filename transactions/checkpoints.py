@@ -0,0 +1,142 @@
+"""
+Monthly balance checkpoints for "balance as of date" queries
+
+A checkpoint stores an account's closing balance at the end of a completed
+month. Historical balances are answered from the nearest checkpoint plus a
+small delta aggregate over the transactions between the two dates, instead of
+replaying the whole history. Checkpoints dated on or after a changed
+transaction are dropped by ``ledger.invalidate_checkpoints`` and rebuilt by
+the ``build_checkpoints`` command or job. Reads never write: dates without a
+checkpoint are answered by walking back from the live balance.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import DateField, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from accounts.models import Account
+from .ledger import balance_effect_expression, day_start, month_end, touches_account
+from .models import BalanceCheckpoint, Transaction
+
+
+def month_ends_between(start, end):
+    """Month-end dates falling within [start, end]"""
+    ends = []
+    current = month_end(start)
+    while current <= end:
+        ends.append(current)
+        current = month_end(current + timedelta(days=1))
+    return ends
+
+
+def net_effect(account_id, start=None, end=None):
+    """Net balance change on an account from transactions dated in [start, end)"""
+    transactions = Transaction.objects.filter(touches_account(account_id))
+    if start is not None:
+        transactions = transactions.filter(date__gte=start)
+    if end is not None:
+        transactions = transactions.filter(date__lt=end)
+    total = transactions.aggregate(net=Sum(balance_effect_expression(account_id)))['net']
+    return total or Decimal('0.00')
+
+
+def ensure_checkpoints(account_id):
+    """Create any missing month-end checkpoints up to the last completed month"""
+    last_complete = timezone.localdate().replace(day=1) - timedelta(days=1)
+    latest = BalanceCheckpoint.objects.filter(account_id=account_id).values_list('as_of', flat=True).first()
+    if latest is not None and latest >= last_complete:
+        return
+
+    with db_transaction.atomic():
+        transactions = Transaction.objects.filter(touches_account(account_id))
+        if latest is not None:
+            transactions = transactions.filter(date__gte=day_start(latest + timedelta(days=1)))
+        monthly = dict(
+            transactions.annotate(month=TruncMonth('date', output_field=DateField()))
+            .order_by()
+            .values('month')
+            .annotate(net=Sum(balance_effect_expression(account_id)))
+            .values_list('month', 'net')
+        )
+        if latest is None and not monthly:
+            return
+
+        first = latest + timedelta(days=1) if latest is not None else min(monthly)
+        balance = Account.objects.filter(pk=account_id).values_list('balance', flat=True).get()
+
+        # Walk backwards from the live balance, peeling off each later month
+        for month in monthly:
+            if month > last_complete:
+                balance -= monthly[month]
+        checkpoints = []
+        for as_of in reversed(month_ends_between(first, last_complete)):
+            checkpoints.append(BalanceCheckpoint(account_id=account_id, as_of=as_of, balance=balance))
+            balance -= monthly.get(as_of.replace(day=1), Decimal('0.00'))
+        BalanceCheckpoint.objects.bulk_create(checkpoints, ignore_conflicts=True)
+
+
+def build_checkpoints(account_ids):
+    """Create missing checkpoints for each account; return how many were processed"""
+    count = 0
+    for count, account_id in enumerate(account_ids, start=1):
+        ensure_checkpoints(account_id)
+    return count
+
+
+def replayed_balances(account_id, days):
+    """Closing balances at several local dates, walked back from the live balance"""
+    days = sorted(days)
+    daily = (
+        Transaction.objects.filter(touches_account(account_id), date__gte=day_start(days[0] + timedelta(days=1)))
+        .annotate(day=TruncDate('date'))
+        .order_by()
+        .values('day')
+        .annotate(net=Sum(balance_effect_expression(account_id)))
+        .values_list('day', 'net')
+    )
+    later = sorted(daily)
+    balance = Account.objects.filter(pk=account_id).values_list('balance', flat=True).get()
+    balances = {}
+    # Peel off each later day's net change, latest first
+    for day in reversed(days):
+        while later and later[-1][0] > day:
+            balance -= later.pop()[1]
+        balances[day] = balance
+    return balances
+
+
+def balance_as_of(account, day):
+    """Closing balance of an account at the end of a local date"""
+    checkpoints = BalanceCheckpoint.objects.filter(account=account)
+    before = checkpoints.filter(as_of__lte=day).order_by('-as_of').first()
+    if before is not None:
+        if before.as_of == day:
+            return before.balance
+        return before.balance + net_effect(
+            account.pk, day_start(before.as_of + timedelta(days=1)), day_start(day + timedelta(days=1))
+        )
+
+    after = checkpoints.filter(as_of__gt=day).order_by('as_of').first()
+    if after is not None:
+        return after.balance - net_effect(
+            account.pk, day_start(day + timedelta(days=1)), day_start(after.as_of + timedelta(days=1))
+        )
+
+    balance = Account.objects.filter(pk=account.pk).values_list('balance', flat=True).get()
+    return balance - net_effect(account.pk, start=day_start(day + timedelta(days=1)))
+
+
+def balance_history(account, start, end):
+    """Month-end balances between two dates, plus the balance at ``end``"""
+    balances = dict(
+        BalanceCheckpoint.objects.filter(account=account, as_of__gte=start, as_of__lte=end)
+        .values_list('as_of', 'balance')
+    )
+    dates = month_ends_between(start, end)
+    if not dates or dates[-1] != end:
+        dates.append(end)
+    missing = [as_of for as_of in dates if as_of not in balances]
+    if missing:
+        balances.update(replayed_balances(account.pk, missing))
+    return [{'date': as_of, 'balance': balances[as_of]} for as_of in dates]
@@ -0,0 +1,84 @@
+"""
+Streaming transaction exports (CSV and NDJSON)
+
+Rows are read as plain tuples with ``values_list().iterator()`` and encoded
+in batches as the response is sent, so no model instances or serializers
+are built and memory use does not grow with the size of the history.
+"""
+import csv
+import io
+import json
+
+DEFAULT_CHUNK_SIZE = 2000
+# Rows encoded per chunk handed to the server
+BATCH_SIZE = 500
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# (output column, queryset lookup)
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('date', 'date'),
+    ('type', 'transaction_type'),
+    ('amount', 'amount'),
+    ('account', 'account__name'),
+    ('to_account', 'to_account__name'),
+    ('category', 'category__name'),
+    ('description', 'description'),
+]
+HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+
+def export_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield export rows as tuples of strings, in the queryset's order"""
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    for pk, date, transaction_type, amount, account, to_account, category, description in (
+        queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+    ):
+        yield (str(pk), date.isoformat(), transaction_type, str(amount),
+               account, to_account or '', category or '', description)
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= BATCH_SIZE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _with_header(rows):
+    yield HEADER
+    yield from rows
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADER, row))) + '\n'
+
+
+def encode_rows(rows, output):
+    """Yield export rows encoded in batches of lines"""
+    if output == 'csv':
+        return _batched(_csv_lines(_with_header(rows)))
+    return _batched(_ndjson_lines(rows))
+
+
+def stream_export(queryset, output, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the encoded export in batches of lines"""
+    return encode_rows(export_rows(queryset, chunk_size), output)
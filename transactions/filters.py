@@ -0,0 +1,191 @@
+"""
+Declarative query-parameter filters for transaction listings
+
+Dates are turned into half-open datetime ranges (``date >= start`` and
+``date < end + 1 day``) rather than ``date__date`` lookups, so the filters
+stay sargable and can use the composite (user, ..., date) indexes.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .ledger import day_start
+from .models import Transaction
+
+# Periods are summed by whole months, and month-end arithmetic in the last
+# representable month would overflow
+LAST_PERIOD_DAY = date.max.replace(day=1) - timedelta(days=1)
+
+
+class Filter:
+    """A query parameter mapped onto a queryset lookup"""
+    many = False
+
+    def __init__(self, field_name=None, lookup='exact'):
+        self.field_name = field_name
+        self.lookup = lookup
+
+    def parse(self, value):
+        return value
+
+    def apply(self, queryset, value):
+        return queryset.filter(**{f'{self.field_name}__{self.lookup}': value})
+
+class NumberFilter(Filter):
+    def parse(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError('Enter a whole number.')
+
+class DecimalFilter(Filter):
+    def parse(self, value):
+        try:
+            parsed = Decimal(value)
+        except InvalidOperation:
+            raise ValueError('Enter a number.')
+        if not parsed.is_finite():
+            raise ValueError('Enter a number.')
+        return parsed
+
+class ChoiceFilter(Filter):
+    def __init__(self, field_name=None, choices=(), lookup='exact'):
+        super().__init__(field_name, lookup)
+        self.choices = [choice for choice, _ in choices]
+
+    def parse(self, value):
+        if value not in self.choices:
+            raise ValueError(f"Select one of: {', '.join(self.choices)}.")
+        return value
+
+class MultipleFilter(Filter):
+    """Comma-separated or repeated values matched with ``__in``"""
+    many = True
+
+    def __init__(self, item_filter):
+        super().__init__(item_filter.field_name, 'in')
+        self.item_filter = item_filter
+
+    def parse(self, values):
+        items = [item.strip() for value in values for item in value.split(',') if item.strip()]
+        return [self.item_filter.parse(item) for item in items]
+
+class BooleanFilter(Filter):
+    def parse(self, value):
+        if value.lower() in ('true', '1', 'yes'):
+            return True
+        if value.lower() in ('false', '0', 'no'):
+            return False
+        raise ValueError('Enter true or false.')
+
+class DateFilter(Filter):
+    """Local date bound turned into an aware datetime range boundary"""
+
+    def __init__(self, field_name=None, bound='start'):
+        super().__init__(field_name, 'gte' if bound == 'start' else 'lt')
+        self.bound = bound
+
+    def parse(self, value):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Enter a date in YYYY-MM-DD format.')
+        return day
+
+    def apply(self, queryset, value):
+        if self.bound == 'end':
+            if value == date.max:
+                # Nothing can be dated after it, and the next day would overflow
+                return queryset
+            value = value + timedelta(days=1)
+        return super().apply(queryset, day_start(value))
+
+class OrderingFilter(Filter):
+    """Whitelisted ordering with the primary key as a stable tie-breaker"""
+
+    def __init__(self, fields):
+        super().__init__()
+        self.fields = fields
+
+    def parse(self, value):
+        name = value.lstrip('-')
+        if name not in self.fields:
+            raise ValueError(f"Order by one of: {', '.join(self.fields)} (prefix with '-' for descending).")
+        return value
+
+    def apply(self, queryset, value):
+        tie_breaker = '-id' if value.startswith('-') else 'id'
+        return queryset.order_by(value, tie_breaker)
+
+class FilterSet:
+    """Apply the declared filters whose parameters are present in a request"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.declared_filters = {
+            name: value
+            for klass in reversed(cls.__mro__)
+            for name, value in vars(klass).items()
+            if isinstance(value, Filter)
+        }
+
+    def __init__(self, params, queryset):
+        self.params = params
+        self.queryset = queryset
+
+    @property
+    def qs(self):
+        queryset = self.queryset
+        errors = {}
+        for name, filter_ in self.declared_filters.items():
+            if filter_.many:
+                raw = [value for value in self.params.getlist(name) if value]
+            else:
+                raw = self.params.get(name)
+            if not raw:
+                continue
+            try:
+                queryset = filter_.apply(queryset, filter_.parse(raw))
+            except ValueError as exc:
+                errors[name] = [str(exc)]
+        if errors:
+            raise ValidationError(errors)
+        return queryset
+
+    def is_narrowed(self, ignore=()):
+        """Whether any filter other than those in ``ignore`` is in use"""
+        return any(
+            self.params.get(name)
+            for name in self.declared_filters
+            if name not in ignore
+        )
+
+class TransactionFilterSet(FilterSet):
+    type = ChoiceFilter('transaction_type', choices=Transaction.TRANSACTION_TYPES)
+    type__in = MultipleFilter(ChoiceFilter('transaction_type', choices=Transaction.TRANSACTION_TYPES))
+    account = NumberFilter('account_id')
+    account__in = MultipleFilter(NumberFilter('account_id'))
+    category = NumberFilter('category_id')
+    category__in = MultipleFilter(NumberFilter('category_id'))
+    uncategorized = BooleanFilter('category_id', 'isnull')
+    start_date = DateFilter('date', bound='start')
+    end_date = DateFilter('date', bound='end')
+    amount_min = DecimalFilter('amount', 'gte')
+    amount_max = DecimalFilter('amount', 'lte')
+    ordering = OrderingFilter(['date', 'amount', 'created_at'])
+
+
+def parse_period(params):
+    """Parse start_date/end_date, defaulting to the current month"""
+    end_date = timezone.now().date()
+    start_date = end_date.replace(day=1)
+    try:
+        if params.get('start_date'):
+            start_date = DateFilter().parse(params.get('start_date'))
+        if params.get('end_date'):
+            end_date = DateFilter().parse(params.get('end_date'))
+    except ValueError as exc:
+        raise ValidationError({'date': [str(exc)]})
+    if max(start_date, end_date) > LAST_PERIOD_DAY:
+        raise ValidationError({'date': [f'Dates must be on or before {LAST_PERIOD_DAY}.']})
+    return start_date, end_date
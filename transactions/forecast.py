@@ -0,0 +1,123 @@
+"""
+Batch cash-flow forecasts for all of a user's accounts
+
+Detected recurring series are projected on their cadence and the rest of the
+recent history as a per-account, per-category daily average. Daily balance
+changes for every account are laid out in one (accounts x days) array and
+cumulated in a single pass.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from accounts.models import Account
+from .ledger import balance_effects, day_start
+from .models import Transaction
+from .recurring import CADENCES, SeriesKey, detected_series, is_active, series_key
+
+HISTORY_DAYS = 180
+# Averages over very short histories would be dominated by single purchases
+MIN_AVERAGE_DAYS = 30
+DEFAULT_HORIZON = 90
+MAX_HORIZON = 730
+
+
+def history_rows(user, since):
+    return list(
+        Transaction.objects.filter(user=user, date__gte=day_start(since))
+        .annotate(day=TruncDate('date'))
+        .order_by('day', 'id')
+        .values_list('day', 'account_id', 'to_account_id', 'transaction_type', 'amount', 'description', 'category_id')
+    )
+
+
+def category_averages(rows, recurring_keys, span_days):
+    """Average daily balance effect per (account, category) of the non-recurring rows"""
+    totals = {}
+    for day, account_id, to_account_id, transaction_type, amount, description, category_id in rows:
+        if series_key(account_id, to_account_id, transaction_type, description) in recurring_keys:
+            continue
+        for effect_account, effect in balance_effects(transaction_type, amount, account_id, to_account_id).items():
+            key = (effect_account, category_id)
+            totals[key] = totals.get(key, Decimal('0.00')) + effect
+    return {key: float(total) / span_days for key, total in totals.items()}
+
+
+def upcoming_dates(series, today, horizon):
+    """Day offsets (1..horizon) of a series' projected occurrences after today"""
+    step = CADENCES[series.cadence]
+    gap = (today - series.last_date).days
+    steps = np.arange(1, int((gap + horizon) / step) + 2)
+    offsets = np.rint(steps * step).astype(np.int64) - gap
+    return offsets[(offsets >= 1) & (offsets <= horizon)]
+
+
+def forecast_accounts(user, horizon=DEFAULT_HORIZON, today=None):
+    """Project every active account's daily balance ``horizon`` days ahead"""
+    today = today or timezone.localdate()
+    accounts = list(
+        Account.objects.filter(user=user, is_active=True).order_by('id')
+        .values_list('id', 'name', 'currency', 'balance')
+    )
+    index = {account[0]: position for position, account in enumerate(accounts)}
+
+    since = today - timedelta(days=HISTORY_DAYS)
+    rows = history_rows(user, since)
+    span_days = max(MIN_AVERAGE_DAYS, (today - rows[0][0]).days + 1) if rows else MIN_AVERAGE_DAYS
+    series = [item for item in detected_series(user.pk) if is_active(item, today)]
+    averages = category_averages(rows, {SeriesKey(*item[:4]) for item in series}, span_days)
+
+    deltas = np.zeros((len(accounts), horizon))
+    drift = np.zeros(len(accounts))
+    for (account_id, _), average in averages.items():
+        if account_id in index:
+            drift[index[account_id]] += average
+    deltas += drift[:, None]
+
+    positions, offsets, amounts = [], [], []
+    upcoming = {account[0]: [] for account in accounts}
+    for item in series:
+        days = upcoming_dates(item, today, horizon)
+        if not len(days):
+            continue
+        effects = balance_effects(item.transaction_type, item.amount, item.account_id, item.to_account_id)
+        for account_id, effect in effects.items():
+            if account_id not in index:
+                continue
+            positions.append(np.full(len(days), index[account_id]))
+            offsets.append(days - 1)
+            amounts.append(np.full(len(days), float(effect)))
+            upcoming[account_id].append({
+                'description': item.description,
+                'transaction_type': item.transaction_type,
+                'cadence': item.cadence,
+                'amount': float(effect),
+                'next_date': today + timedelta(days=int(days[0])),
+            })
+    if positions:
+        np.add.at(deltas, (np.concatenate(positions), np.concatenate(offsets)), np.concatenate(amounts))
+
+    balances = np.array([float(account[3]) for account in accounts])
+    projected = balances[:, None] + np.cumsum(deltas, axis=1)
+    negative = projected < 0
+    first_negative = np.where(negative.any(axis=1), negative.argmax(axis=1), -1)
+    dates = [today + timedelta(days=offset) for offset in range(1, horizon + 1)]
+
+    return [
+        {
+            'account_id': account_id,
+            'name': name,
+            'currency': currency,
+            'balance': float(balance),
+            'projected_balance': round(float(projected[position, -1]), 2),
+            'first_negative_date': dates[first_negative[position]] if first_negative[position] >= 0 else None,
+            'daily_average': round(float(drift[position]), 2),
+            'recurring': upcoming[account_id],
+            'daily': [
+                {'date': day, 'balance': round(value, 2)}
+                for day, value in zip(dates, projected[position].tolist())
+            ],
+        }
+        for position, (account_id, name, currency, balance) in enumerate(accounts)
+    ]
@@ -0,0 +1,104 @@
+"""
+Currency conversion from locally loaded exchange rates
+
+Rates are stored against settings.FX_BASE_CURRENCY and looked up as the
+latest rate on or before a date. Lookups are memoised per process by
+(currency, date, rates version), where the version is the time rates were
+last loaded, read once per conversion. Converting aggregates therefore costs
+one version query plus one query per distinct (currency, period) group at
+most, and rates loaded by ``load_fx_rates`` are used by every process from
+the next conversion on.
+"""
+from decimal import Decimal
+from functools import lru_cache
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from .models import ExchangeRate
+
+CENT = Decimal('0.01')
+# Reporting currency of users without a profile
+DEFAULT_CURRENCY = 'USD'
+
+
+class MissingExchangeRate(ValueError):
+    """No rate is loaded for a currency on or before the requested date"""
+
+
+def rates_version():
+    """When exchange rates were last loaded, None before the first load"""
+    return ExchangeRate.objects.aggregate(loaded=Max('updated_at'))['loaded']
+
+
+def rate_on(currency, day, version=None):
+    """Units of ``currency`` per one unit of the base currency on ``day``
+
+    ``version`` is a ``rates_version()`` result, read here when not given.
+    """
+    if currency == settings.FX_BASE_CURRENCY:
+        return Decimal('1')
+    return versioned_rate(currency, day, rates_version() if version is None else version)
+
+
+@lru_cache(maxsize=settings.FX_CACHE_SIZE)
+def versioned_rate(currency, day, version):
+    rate = (
+        ExchangeRate.objects.filter(currency=currency, date__lte=day)
+        .order_by('-date')
+        .values_list('rate', flat=True)
+        .first()
+    )
+    if rate is None:
+        raise MissingExchangeRate(f'No {currency} exchange rate on or before {day}.')
+    return rate
+
+
+def convert(amount, from_currency, to_currency, day, version=None):
+    """Convert an amount between currencies at the rates in effect on ``day``"""
+    if from_currency == to_currency:
+        return amount
+    if version is None:
+        version = rates_version()
+    return (amount * rate_on(to_currency, day, version) / rate_on(from_currency, day, version)).quantize(CENT)
+
+
+def convert_totals(groups, to_currency, empty):
+    """Sum (currency, as_of, totals) groups into ``to_currency``; ``*_count`` fields are added as-is"""
+    groups = list(groups)
+    version = rates_version() if any(currency != to_currency for currency, _, _ in groups) else None
+    result = dict(empty)
+    for currency, as_of, totals in groups:
+        for field, value in totals.items():
+            if not field.endswith('_count'):
+                value = convert(value, currency, to_currency, as_of, version)
+            result[field] += value
+    return result
+
+
+def convert_balances(groups, to_currency, day):
+    """Total (currency, account_type, total, count) balance groups into ``to_currency``
+
+    Return the converted grand total and per-type counts and totals.
+    """
+    version = rates_version() if any(group['currency'] != to_currency for group in groups) else None
+    total_balance = Decimal('0.00')
+    account_types = {}
+    for group in groups:
+        converted = convert(group['total'], group['currency'], to_currency, day, version)
+        total_balance += converted
+        summary = account_types.setdefault(group['account_type'], {'count': 0, 'total_balance': 0})
+        summary['count'] += group['count']
+        summary['total_balance'] += float(converted)
+    return total_balance, account_types
+
+
+def balance_groups(accounts):
+    """One aggregate row per (currency, account type), so conversion needs one rate lookup per group"""
+    return list(
+        accounts.order_by().values('currency', 'account_type').annotate(total=Sum('balance'), count=Count('id'))
+    )
+
+
+def user_currency(user):
+    """The currency a user's aggregates are reported in"""
+    profile = getattr(user, 'profile', None)
+    return profile.default_currency if profile else DEFAULT_CURRENCY
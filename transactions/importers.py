@@ -0,0 +1,254 @@
+"""
+Streaming bank statement importers (CSV and OFX)
+
+Rows are parsed lazily from the source, validated in chunks and written with
+``bulk_create``. Balance changes are netted per account and applied once per
+chunk instead of once per row.
+"""
+import csv
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from accounts.models import Account
+from .ledger import entry_for, record_changes
+from .models import Category, Transaction
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+FORMATS = ['csv', 'ofx']
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+OFX_DATE = re.compile(r'^(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::[^\]]*)?\])?')
+
+
+def detect_format(filename):
+    """Guess the statement format from a file name"""
+    if filename and filename.lower().rsplit('.', 1)[-1] in ('ofx', 'qfx'):
+        return 'ofx'
+    return 'csv'
+
+
+def iter_csv_rows(lines):
+    """Yield (row number, row dict) pairs from CSV lines with normalized headers"""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [column.strip().lower() for column in header]
+    for number, values in enumerate(reader, start=2):
+        if not any(value.strip() for value in values):
+            continue
+        yield number, dict(zip(header, (value.strip() for value in values)))
+
+
+def _parse_ofx_date(value):
+    match = OFX_DATE.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid OFX date: {value!r}")
+    day, clock, offset = match.groups()
+    parsed = datetime.strptime(day + (clock or '000000'), '%Y%m%d%H%M%S')
+    tz = dt_timezone(timedelta(hours=float(offset))) if offset else dt_timezone.utc
+    return parsed.replace(tzinfo=tz)
+
+
+def _ofx_date_or_raw(value):
+    # Leave unparseable values for row validation to report
+    try:
+        return _parse_ofx_date(value)
+    except ValueError:
+        return value
+
+
+def iter_ofx_rows(lines):
+    """Yield (transaction number, row dict) pairs from OFX (SGML or XML) lines"""
+    current = None
+    number = 0
+    for line in lines:
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    number += 1
+                    yield number, current
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+    if current:
+        number += 1
+        yield number, current
+
+
+def _ofx_to_row(record):
+    description = record.get('NAME') or record.get('MEMO') or ''
+    memo = record.get('MEMO')
+    if memo and memo != description:
+        description = f"{description} - {memo}" if description else memo
+    return {
+        'date': _ofx_date_or_raw(record.get('DTPOSTED', '')),
+        'amount': record.get('TRNAMT', ''),
+        'description': description,
+    }
+
+
+class StatementImporter:
+    """Validate and bulk-write statement rows for a single account"""
+
+    def __init__(self, user, account, chunk_size=DEFAULT_CHUNK_SIZE, date_format=None, dry_run=False,
+                 progress=None):
+        self.user = user
+        self.account = account
+        self.chunk_size = chunk_size
+        self.date_format = date_format
+        self.dry_run = dry_run
+        # Called with the number of rows processed after each chunk
+        self.progress = progress
+        self.accounts = {}
+        for pk, name in Account.objects.filter(user=user).values_list('id', 'name'):
+            self.accounts[str(pk)] = pk
+            self.accounts.setdefault(name, pk)
+        self.categories = {
+            name.lower(): pk for pk, name in Category.objects.filter(user=user).values_list('id', 'name')
+        }
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def import_csv(self, lines):
+        return self.run(iter_csv_rows(lines))
+
+    def import_ofx(self, lines):
+        return self.run((number, _ofx_to_row(record)) for number, record in iter_ofx_rows(lines))
+
+    def import_file(self, lines, file_format):
+        if file_format == 'ofx':
+            return self.import_ofx(lines)
+        return self.import_csv(lines)
+
+    def run(self, rows):
+        """Consume numbered rows chunk by chunk and return an import report"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._process_chunk(chunk)
+            if self.progress is not None:
+                self.progress(self.created + self.failed)
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'dry_run': self.dry_run,
+            'errors': self.errors,
+        }
+
+    def _process_chunk(self, chunk):
+        objects = []
+        for number, row in chunk:
+            try:
+                objects.append(self.build_transaction(row))
+            except (KeyError, ValueError) as exc:
+                self.failed += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({'row': number, 'error': str(exc)})
+
+        if not objects:
+            return
+
+        if not self.dry_run:
+            with db_transaction.atomic():
+                Transaction.objects.bulk_create(objects, batch_size=self.chunk_size)
+                record_changes((None, entry_for(obj)) for obj in objects)
+        self.created += len(objects)
+
+    def build_transaction(self, row):
+        """Validate one row and return an unsaved Transaction"""
+        date = self._parse_date(row.get('date', ''))
+        amount = self._parse_amount(row.get('amount', ''))
+
+        transaction_type = (row.get('type') or row.get('transaction_type') or '').lower()
+        if not transaction_type:
+            transaction_type = 'expense' if amount < 0 else 'income'
+        elif transaction_type not in dict(Transaction.TRANSACTION_TYPES):
+            raise ValueError(f"Unknown transaction type: {transaction_type!r}")
+        amount = abs(amount)
+
+        description = row.get('description') or row.get('name') or row.get('memo')
+        if not description:
+            raise ValueError("Description is required.")
+
+        to_account_id = row.get('to_account_id') or row.get('to_account')
+        if transaction_type == 'transfer' and not to_account_id:
+            raise ValueError("Transfer transactions must specify a destination account.")
+        if transaction_type != 'transfer' and to_account_id:
+            raise ValueError("Only transfer transactions can have a destination account.")
+        if to_account_id:
+            to_account_id = self._resolve_account(to_account_id)
+            if to_account_id == self.account.pk:
+                raise ValueError("A transfer's destination must be a different account.")
+
+        return Transaction(
+            user=self.user,
+            account=self.account,
+            category_id=self._resolve_category(row.get('category')),
+            transaction_type=transaction_type,
+            amount=amount,
+            description=description,
+            date=date,
+            to_account_id=to_account_id,
+        )
+
+    def _parse_date(self, value):
+        if isinstance(value, datetime):
+            parsed = value
+        elif not value:
+            raise ValueError("Date is required.")
+        elif self.date_format:
+            parsed = datetime.strptime(value, self.date_format)
+        else:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                day = parse_date(value)
+                if day is None:
+                    raise ValueError(f"Invalid date: {value!r}")
+                parsed = datetime.combine(day, time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def _parse_amount(self, value):
+        try:
+            amount = Decimal(str(value).replace(',', '').strip())
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {value!r}")
+        if not amount.is_finite():
+            raise ValueError(f"Invalid amount: {value!r}")
+        amount = amount.quantize(Decimal('0.01'))
+        if len(amount.as_tuple().digits) > 15:
+            raise ValueError(f"Amount out of range: {value!r}")
+        return amount
+
+    def _resolve_account(self, value):
+        if value not in self.accounts:
+            raise ValueError("Destination account not found or doesn't belong to user.")
+        return self.accounts[value]
+
+    def _resolve_category(self, name):
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self.categories:
+            if self.dry_run:
+                return None
+            category, _ = Category.objects.get_or_create(user=self.user, name=name)
+            self.categories[key] = category.id
+        return self.categories[key]
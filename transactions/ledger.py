@@ -0,0 +1,143 @@
+"""
+Balance bookkeeping shared by single transaction writes and bulk imports
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from datetime import datetime, time, timedelta
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+from accounts.models import Account, UserDataVersion
+
+# The transaction columns that drive derived state such as account balances and recurring series
+LEDGER_FIELDS = (
+    'user_id', 'transaction_type', 'amount', 'account_id', 'to_account_id', 'category_id', 'date', 'description',
+)
+LedgerEntry = namedtuple('LedgerEntry', LEDGER_FIELDS)
+
+
+def entry_for(transaction):
+    """Snapshot the ledger-relevant columns of a transaction"""
+    return LedgerEntry(*(getattr(transaction, field) for field in LEDGER_FIELDS))
+
+
+def balance_effects(transaction_type, amount, account_id, to_account_id=None):
+    """Return the {account_id: delta} a transaction applies to account balances"""
+    if transaction_type == 'income':
+        return {account_id: amount}
+    if transaction_type == 'expense':
+        return {account_id: -amount}
+    if transaction_type == 'transfer':
+        effects = defaultdict(Decimal)
+        effects[account_id] -= amount
+        if to_account_id:
+            effects[to_account_id] += amount
+        return dict(effects)
+    return {}
+
+
+def balance_effect_expression(account_id):
+    """Database expression for a transaction's effect on one account's balance"""
+    output_field = DecimalField(max_digits=15, decimal_places=2)
+    outgoing = Case(
+        When(account_id=account_id, transaction_type='income', then=F('amount')),
+        When(account_id=account_id, transaction_type__in=['expense', 'transfer'], then=-F('amount')),
+        default=Value(0),
+        output_field=output_field,
+    )
+    incoming = Case(
+        When(to_account_id=account_id, transaction_type='transfer', then=F('amount')),
+        default=Value(0),
+        output_field=output_field,
+    )
+    return outgoing + incoming
+
+
+def touches_account(account_id):
+    """Filter for transactions that affect an account's balance"""
+    return Q(account_id=account_id) | Q(to_account_id=account_id)
+
+
+def day_start(day):
+    """Aware datetime for midnight at the start of a local date"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_end(day):
+    """Last day of the month containing ``day``"""
+    next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def local_day(value):
+    """Local calendar date of a transaction datetime"""
+    if timezone.is_naive(value):
+        return value.date()
+    return timezone.localdate(value)
+
+
+def net_balance_deltas(changes):
+    """Sum (old entry, new entry) pairs into one balance delta per account
+
+    ``old`` is None for created transactions and ``new`` is None for deleted
+    ones; an edit reverses the old effects and applies the new ones.
+    """
+    deltas = defaultdict(Decimal)
+    for old, new in changes:
+        for entry, sign in ((old, -1), (new, 1)):
+            if entry is None:
+                continue
+            effects = balance_effects(entry.transaction_type, entry.amount, entry.account_id, entry.to_account_id)
+            for account_id, delta in effects.items():
+                deltas[account_id] += sign * delta
+    return {account_id: delta for account_id, delta in deltas.items() if delta}
+
+
+def apply_balance_deltas(deltas):
+    """Apply net balance changes as in-database increments, one UPDATE per account"""
+    now = timezone.now()
+    # Lock rows in a stable order so concurrent writers cannot deadlock
+    for account_id, delta in sorted(deltas.items()):
+        Account.objects.filter(pk=account_id).update(balance=F('balance') + delta, updated_at=now)
+
+
+def record_changes(changes):
+    """Apply the derived-state effects of (old entry, new entry) pairs
+
+    Must run inside the same database transaction as the writes themselves.
+    Returns the balance deltas that were applied.
+    """
+    from . import recurring, rollups
+
+    changes = list(changes)
+    deltas = net_balance_deltas(changes)
+    apply_balance_deltas(deltas)
+    invalidate_checkpoints(changes)
+    recurring.invalidate(changes)
+    rollups.apply_spend_deltas(rollups.spend_deltas(changes))
+    rollups.apply_monthly_deltas(rollups.monthly_deltas(changes))
+    UserDataVersion.bump(entry.user_id for pair in changes for entry in pair if entry is not None)
+    return deltas
+
+
+def invalidate_checkpoints(changes):
+    """Drop balance checkpoints made stale by changes dated on or before them"""
+    from .models import BalanceCheckpoint
+
+    # Checkpoints only exist for completed months
+    current_month = timezone.localdate().replace(day=1)
+    earliest = {}
+    for old, new in changes:
+        if old == new:
+            continue
+        for entry in (old, new):
+            if entry is None:
+                continue
+            day = local_day(entry.date)
+            if day >= current_month:
+                continue
+            for account_id in (entry.account_id, entry.to_account_id):
+                if account_id and (account_id not in earliest or day < earliest[account_id]):
+                    earliest[account_id] = day
+
+    for account_id, day in earliest.items():
+        BalanceCheckpoint.objects.filter(account_id=account_id, as_of__gte=day).delete()
@@ -0,0 +1,149 @@
+"""
+Management command to benchmark every API endpoint against seeded datasets
+"""
+import json
+import os
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+from financial_tracker.benchmark import failures, parse_size, regressions, run_benchmarks, viewset_actions
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+# Timings vary a lot between runs, so only several-fold slowdowns fail
+DEFAULT_TOLERANCE = 3.0
+
+class Command(BaseCommand):
+    help = (
+        'Seed datasets of increasing size in a separate benchmark database, measure latency, '
+        'query count and peak memory of every API endpoint, and fail on query count regressions against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            default=['1k', '100k', '1m'],
+            help='Dataset sizes in transactions, e.g. 1k 100k 1m (default: 1k 100k 1m)'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint (default: 20)')
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='benchmark-report.json',
+            help='Where to write the JSON report (default: benchmark-report.json)'
+        )
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            default=str(DEFAULT_BASELINE),
+            help='Baseline report to compare against (default: benchmarks/baseline.json)'
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Store this run as the baseline for the measured sizes instead of comparing'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            nargs='?',
+            const=DEFAULT_TOLERANCE,
+            help=(
+                'Also fail when median latency or peak memory grows by more than this relative amount '
+                f'(default when given without a value: {DEFAULT_TOLERANCE}). Timings depend on the machine, '
+                'so only use it against a baseline recorded on the same one'
+            )
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes used for seeding (default: CPU count)'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the benchmark database, and the datasets in it, between runs'
+        )
+
+    def report_progress(self, label, name, result):
+        self.stdout.write(
+            f"{label:>6} {name:<32} {result['status']:>4} {result['p50_ms']:>9.2f}ms {result['p95_ms']:>9.2f}ms "
+            f"{result['queries']:>4} queries {result['peak_kib']:>9.1f} KiB"
+        )
+
+    def benchmark(self, sizes, options):
+        """Run the benchmarks in a throwaway database, like the test runner does"""
+        test_settings = connection.settings_dict['TEST']
+        original_name = test_settings.get('NAME')
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = str(settings.BASE_DIR / 'benchmark_db.sqlite3')
+        else:
+            test_settings['NAME'] = f"benchmark_{connection.settings_dict['NAME']}"
+        setup_test_environment()
+        try:
+            old_config = setup_databases(
+                options['verbosity'], interactive=False, keepdb=options['keepdb'], aliases={'default'}
+            )
+            try:
+                with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+                    return run_benchmarks(sizes, options['repeat'], options['workers'], self.report_progress)
+            except ValueError as exc:
+                # Datasets only grow, so a kept database cannot go back to a smaller size
+                raise CommandError(f'{exc}; run without --keepdb to start from an empty database')
+            finally:
+                teardown_databases(old_config, options['verbosity'], keepdb=options['keepdb'])
+        finally:
+            teardown_test_environment()
+            test_settings['NAME'] = original_name
+
+    def handle(self, *args, **options):
+        try:
+            for size in options['sizes']:
+                parse_size(size)
+        except ValueError:
+            raise CommandError('Sizes must be whole numbers of transactions, optionally ending in k or m')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        report = self.benchmark(options['sizes'], options)
+        with open(options['output'], 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+        self.stdout.write(f"Wrote {options['output']}")
+
+        problems = failures(report)
+        measured = {name for size in report['sizes'].values() for name in size['endpoints']}
+        problems += [f'{name}: not benchmarked' for name in sorted(viewset_actions() - measured)]
+        if problems:
+            for problem in problems:
+                self.stderr.write(self.style.ERROR(problem))
+            raise CommandError(f'{len(problems)} endpoint(s) could not be benchmarked')
+
+        baseline_path = options['baseline']
+        baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path, encoding='utf-8') as handle:
+                baseline = json.load(handle)
+
+        if options['update_baseline']:
+            baseline.update({key: value for key, value in report.items() if key != 'sizes'})
+            baseline.setdefault('sizes', {}).update(report['sizes'])
+            os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+            with open(baseline_path, 'w', encoding='utf-8') as handle:
+                json.dump(baseline, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Updated baseline {baseline_path} for {', '.join(report['sizes'])}"))
+            return
+
+        if not baseline:
+            self.stdout.write(self.style.WARNING(f'No baseline at {baseline_path}; run with --update-baseline'))
+            return
+        found = regressions(report, baseline, options['tolerance'])
+        if found:
+            for regression in found:
+                self.stderr.write(self.style.ERROR(regression))
+            raise CommandError(f'{len(found)} regression(s) against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline_path}'))
@@ -0,0 +1,30 @@
+"""
+Management command to create missing monthly balance checkpoints
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from accounts.models import Account
+from transactions.checkpoints import build_checkpoints
+
+class Command(BaseCommand):
+    help = 'Create missing month-end balance checkpoints up to the last completed month'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            action='append',
+            help='Only build checkpoints for this user\'s accounts (may be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by('pk')
+        if options['username']:
+            users = User.objects.filter(username__in=options['username'])
+            missing = set(options['username']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"User not found: {', '.join(sorted(missing))}")
+            accounts = accounts.filter(user__in=users)
+
+        count = build_checkpoints(accounts.values_list('pk', flat=True).iterator())
+        self.stdout.write(self.style.SUCCESS(f'Built checkpoints for {count} account(s)'))
@@ -0,0 +1,59 @@
+"""
+Management command to detect recurring transactions for many users in parallel
+"""
+import os
+from functools import partial
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from financial_tracker.parallel import run_in_processes
+from transactions.recurring import update_series
+
+class Command(BaseCommand):
+    help = 'Detect recurring transactions from transactions created since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            action='append',
+            help='Only process this user (may be repeated)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: CPU count)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Discard stored series and reprocess the whole history'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['username']:
+            users = users.filter(username__in=options['username'])
+            missing = set(options['username']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"User not found: {', '.join(sorted(missing))}")
+        else:
+            users = users.filter(transactions__isnull=False).distinct()
+        user_ids = list(users.order_by('id').values_list('id', flat=True))
+
+        task = partial(update_series, full=options['full'])
+        transactions = series = failed = 0
+        for user_id, result, error in run_in_processes(task, user_ids, options['workers']):
+            if error is not None:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'User {user_id}: {error}'))
+                continue
+            transactions += result['transactions']
+            series += result['series']
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {transactions} new transaction(s) for {len(user_ids) - failed} user(s), '
+            f'updating {series} series'
+        ))
+        if failed:
+            raise CommandError(f'{failed} user(s) failed')
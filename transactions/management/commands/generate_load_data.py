@@ -0,0 +1,85 @@
+"""
+Management command to generate large synthetic datasets for load testing
+"""
+import os
+import time
+from functools import partial
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from financial_tracker.parallel import run_in_processes
+from transactions.synthetic import generate_users
+
+# Users generated per worker task
+USERS_PER_TASK = 50
+
+class Command(BaseCommand):
+    help = 'Generate users with accounts and realistic multi-year transaction histories for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users (default: 10)')
+        parser.add_argument(
+            '--accounts-per-user',
+            type=int,
+            default=3,
+            help='Accounts per user: checking, savings, credit, investment, cash (default: 3)'
+        )
+        parser.add_argument('--years', type=int, default=2, help='Years of history (default: 2)')
+        parser.add_argument(
+            '--tx-per-month',
+            type=int,
+            default=60,
+            help='Transactions per user per month (default: 60)'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument(
+            '--prefix',
+            type=str,
+            default='loaduser',
+            help='Username prefix; users are named <prefix>1, <prefix>2, ... (default: loaduser)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: CPU count)'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['accounts_per_user'] < 1 or options['years'] < 1:
+            raise CommandError('--users, --accounts-per-user and --years must be at least 1')
+        if options['tx_per_month'] < 0:
+            raise CommandError('--tx-per-month cannot be negative')
+        prefix = options['prefix']
+        numbers = list(range(1, options['users'] + 1))
+        existing = User.objects.filter(username__in=[f'{prefix}{number}' for number in numbers]).count()
+        if existing:
+            raise CommandError(f'{existing} user(s) named {prefix}N already exist; choose another --prefix')
+
+        task = partial(
+            generate_users,
+            prefix=prefix,
+            seed=options['seed'],
+            accounts_per_user=options['accounts_per_user'],
+            years=options['years'],
+            tx_per_month=options['tx_per_month']
+        )
+        shards = [numbers[start:start + USERS_PER_TASK] for start in range(0, len(numbers), USERS_PER_TASK)]
+        started = time.monotonic()
+        totals = {'users': 0, 'accounts': 0, 'transactions': 0}
+        failed = 0
+        for shard, result, error in run_in_processes(task, shards, options['workers']):
+            if error is not None:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'Users {prefix}{shard[0]}-{prefix}{shard[-1]}: {error}'))
+                continue
+            for key in totals:
+                totals[key] += result[key]
+            self.stdout.write(f"Generated {prefix}{shard[0]}-{prefix}{shard[-1]} ({result['transactions']} transactions)")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {totals['users']} user(s), {totals['accounts']} account(s) and "
+            f"{totals['transactions']} transaction(s) in {elapsed:.1f}s"
+        ))
+        if failed:
+            raise CommandError(f'{failed} batch(es) failed')
@@ -0,0 +1,87 @@
+"""
+Management command to bulk import a bank statement (CSV or OFX) for a user
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from accounts.models import Account
+from transactions.importers import DEFAULT_CHUNK_SIZE, FORMATS, StatementImporter, detect_format
+
+class Command(BaseCommand):
+    help = 'Bulk import transactions from a CSV or OFX bank statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Path to the statement file')
+        parser.add_argument(
+            '--username',
+            type=str,
+            required=True,
+            help='Owner of the imported transactions'
+        )
+        parser.add_argument(
+            '--account',
+            type=str,
+            required=True,
+            help='Target account ID or name'
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=FORMATS,
+            help='Statement format (detected from the file extension by default)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Number of rows validated and written per batch'
+        )
+        parser.add_argument(
+            '--date-format',
+            type=str,
+            help='strptime format for the date column (ISO 8601 by default)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User not found: {options['username']}")
+
+        accounts = Account.objects.filter(user=user)
+        account = None
+        if options['account'].isdigit():
+            account = accounts.filter(id=int(options['account'])).first()
+        if account is None:
+            account = accounts.filter(name=options['account']).first()
+        if account is None:
+            raise CommandError(f"Account not found for {user.username}: {options['account']}")
+
+        importer = StatementImporter(
+            user,
+            account,
+            chunk_size=options['chunk_size'],
+            date_format=options['date_format'],
+            dry_run=options['dry_run']
+        )
+        file_format = options['format'] or detect_format(options['path'])
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as statement:
+                report = importer.import_file(statement, file_format)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['error']}"))
+
+        verb = 'Validated' if report['dry_run'] else 'Imported'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {report['created']} transactions into {account.name} ({report['failed']} rows failed)"
+            )
+        )
@@ -0,0 +1,62 @@
+"""
+Management command to load exchange rates from a local CSV file
+"""
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from accounts.models import UserDataVersion
+from transactions.models import ExchangeRate
+
+BATCH_SIZE = 1000
+
+class Command(BaseCommand):
+    help = (
+        'Load exchange rates from a CSV file with date,currency,rate columns, '
+        f'where rate is units of currency per one {settings.FX_BASE_CURRENCY}'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='CSV file to load')
+
+    def parse(self, path):
+        rates = {}
+        try:
+            with open(path, newline='', encoding='utf-8') as handle:
+                reader = csv.DictReader(handle)
+                missing = {'date', 'currency', 'rate'} - set(reader.fieldnames or [])
+                if missing:
+                    raise CommandError(f"Missing column(s): {', '.join(sorted(missing))}")
+                for line, row in enumerate(reader, start=2):
+                    try:
+                        day = datetime.strptime(row['date'].strip(), '%Y-%m-%d').date()
+                        rate = Decimal(row['rate'].strip())
+                    except (ValueError, InvalidOperation):
+                        raise CommandError(f'Line {line}: invalid date or rate')
+                    currency = row['currency'].strip().upper()
+                    if len(currency) != 3 or rate <= 0:
+                        raise CommandError(f'Line {line}: invalid currency or rate')
+                    rates[(currency, day)] = rate
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        return rates
+
+    def handle(self, *args, **options):
+        rates = self.parse(options['path'])
+        with db_transaction.atomic():
+            ExchangeRate.objects.bulk_create(
+                [ExchangeRate(currency=currency, date=day, rate=rate) for (currency, day), rate in rates.items()],
+                batch_size=BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['currency', 'date'],
+                update_fields=['rate', 'updated_at']
+            )
+            # Responses cached with the previous rates must not be served again
+            UserDataVersion.bump_all()
+
+        currencies = sorted({currency for currency, _ in rates})
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {len(rates)} rate(s) for {len(currencies)} currency(ies): {', '.join(currencies)}"
+        ))
@@ -0,0 +1,31 @@
+"""
+Management command to rebuild the spend and monthly summary rollups
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from transactions.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild daily category spend and monthly summary rollups from transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            action='append',
+            help='Only rebuild rollups for this user (may be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['username']:
+            users = User.objects.filter(username__in=options['username'])
+            missing = set(options['username']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"User not found: {', '.join(sorted(missing))}")
+            user_ids = list(users.values_list('id', flat=True))
+
+        rebuild_rollups(user_ids)
+
+        scope = f"{len(user_ids)} user(s)" if user_ids is not None else 'all users'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {scope}'))
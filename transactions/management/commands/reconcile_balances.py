@@ -0,0 +1,89 @@
+"""
+Management command to find and fix drift between stored and computed account balances
+"""
+import os
+from functools import partial
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from financial_tracker.parallel import run_in_processes
+from transactions.reconcile import reconcile_users
+
+# Drifting accounts listed individually in the output
+MAX_LISTED = 50
+
+class Command(BaseCommand):
+    help = 'Compare every account balance with its transactions and optionally fix the difference'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            action='append',
+            help='Only reconcile this user (may be repeated)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: CPU count)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users reconciled per aggregate query (default: 1000)'
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Set drifting balances to the computed value'
+        )
+
+    def user_ranges(self, user_ids, batch_size):
+        """Contiguous (first, last) id ranges of at most batch_size users"""
+        return [
+            (batch[0], batch[-1])
+            for batch in (user_ids[start:start + batch_size] for start in range(0, len(user_ids), batch_size))
+        ]
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['username']:
+            users = users.filter(username__in=options['username'])
+            missing = set(options['username']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"User not found: {', '.join(sorted(missing))}")
+        user_ids = list(users.order_by('id').values_list('id', flat=True))
+        if options['username']:
+            # Ranges of named users must not sweep in the users between them
+            ranges = [(user_id, user_id) for user_id in user_ids]
+        else:
+            ranges = self.user_ranges(user_ids, max(1, options['batch_size']))
+
+        task = partial(reconcile_users, fix=options['fix'])
+        checked = fixed = failed = 0
+        drift = []
+        for user_range, result, error in run_in_processes(task, ranges, options['workers']):
+            if error is not None:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'Users {user_range[0]}-{user_range[1]}: {error}'))
+                continue
+            checked += result['accounts']
+            fixed += result['fixed']
+            drift.extend(result['drift'])
+
+        drift.sort(key=lambda item: item['account_id'])
+        for item in drift[:MAX_LISTED]:
+            self.stdout.write(
+                f"Account {item['account_id']} (user {item['user_id']}): stored {item['stored']}, "
+                f"actual {item['actual']}, drift {item['stored'] - item['actual']}"
+            )
+        if len(drift) > MAX_LISTED:
+            self.stdout.write(f'... and {len(drift) - MAX_LISTED} more')
+
+        summary = f'Checked {checked} account(s), {len(drift)} with drift'
+        if options['fix']:
+            summary += f', fixed {fixed}'
+        self.stdout.write(self.style.SUCCESS(summary) if not drift or options['fix'] else self.style.WARNING(summary))
+        if failed:
+            raise CommandError(f'{failed} batch(es) failed')
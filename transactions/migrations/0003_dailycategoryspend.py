@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_spend(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    DailyCategorySpend = apps.get_model('transactions', 'DailyCategorySpend')
+    grouped = (
+        Transaction.objects.filter(transaction_type='expense', category__isnull=False)
+        .annotate(day=TruncDate('date'))
+        .order_by()
+        .values('user_id', 'category_id', 'day')
+        .annotate(total=Sum('amount'), transaction_count=Count('id'))
+    )
+    DailyCategorySpend.objects.bulk_create(
+        (DailyCategorySpend(**row) for row in grouped.iterator()), batch_size=5000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_balancecheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategorySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_spend', to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_category_spend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily category spend',
+                'ordering': ['-day'],
+                'unique_together': {('user', 'category', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_spend, migrations.RunPython.noop),
+    ]
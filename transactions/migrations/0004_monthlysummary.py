@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def backfill_monthly_summaries(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    MonthlySummary = apps.get_model('transactions', 'MonthlySummary')
+    aggregates = {}
+    for transaction_type in ('income', 'expense', 'transfer'):
+        only_type = Q(transaction_type=transaction_type)
+        aggregates[f'{transaction_type}_total'] = Sum('amount', filter=only_type)
+        aggregates[f'{transaction_type}_count'] = Count('id', filter=only_type)
+    grouped = (
+        Transaction.objects.annotate(month=TruncMonth('date'))
+        .order_by()
+        .values('user_id', 'month')
+        .annotate(**aggregates)
+    )
+    MonthlySummary.objects.bulk_create(
+        (
+            MonthlySummary(
+                user_id=row['user_id'],
+                month=timezone.localdate(row['month']),
+                **{field: row[field] or 0 for field in aggregates}
+            )
+            for row in grouped.iterator()
+        ),
+        batch_size=5000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_dailycategoryspend'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('income_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('income_count', models.IntegerField(default=0)),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('transfer_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('transfer_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Monthly summaries',
+                'ordering': ['-month'],
+                'unique_together': {('user', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_summaries, migrations.RunPython.noop),
+    ]
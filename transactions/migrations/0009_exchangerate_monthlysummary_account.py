@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def split_monthly_summaries_by_account(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    MonthlySummary = apps.get_model('transactions', 'MonthlySummary')
+    aggregates = {}
+    for transaction_type in ('income', 'expense', 'transfer'):
+        only_type = Q(transaction_type=transaction_type)
+        aggregates[f'{transaction_type}_total'] = Sum('amount', filter=only_type)
+        aggregates[f'{transaction_type}_count'] = Count('id', filter=only_type)
+    grouped = (
+        Transaction.objects.annotate(month=TruncMonth('date'))
+        .order_by()
+        .values('user_id', 'account_id', 'month')
+        .annotate(**aggregates)
+    )
+    MonthlySummary.objects.all().delete()
+    MonthlySummary.objects.bulk_create(
+        (
+            MonthlySummary(
+                user_id=row['user_id'],
+                account_id=row['account_id'],
+                month=timezone.localdate(row['month']),
+                **{field: row[field] or 0 for field in aggregates}
+            )
+            for row in grouped.iterator()
+        ),
+        batch_size=5000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_userdataversion'),
+        ('transactions', '0008_recurring_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('currency', 'date')},
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlysummary',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='account',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='accounts.account'),
+        ),
+        migrations.RunPython(split_monthly_summaries_by_account, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='monthlysummary',
+            name='account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='accounts.account'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlysummary',
+            unique_together={('user', 'account', 'month')},
+        ),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction as db_transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
-from accounts.models import Account
+from accounts.models import Account, UserDataVersion
+from . import ledger
 
 class Category(models.Model):
     """Categories for transactions"""
@@ -18,6 +21,17 @@ class Category(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
+            UserDataVersion.bump([self.user_id])
+    
+    def delete(self, *args, **kwargs):
+        with db_transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            UserDataVersion.bump([self.user_id])
+        return result
 
 class Transaction(models.Model):
     """Model for financial transactions"""
@@ -42,66 +56,70 @@ class Transaction(models.Model):
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Serves keyset pagination over a user's (date, id) ordering
+            models.Index(fields=['user', 'date', 'id'], name='transaction_user_date_id_idx'),
+            # Serve the common account and category filters combined with date ranges
+            models.Index(fields=['user', 'account', 'date'], name='transaction_user_account_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='transaction_user_category_idx'),
+        ]
     
     def __str__(self):
         return f"{self.transaction_type.title()}: {self.amount} - {self.description[:50]}"
     
+    def _get_stored_entry(self):
+        # Lock and re-read the row: another writer may have changed it since this
+        # instance was loaded, and its stored state is what has to be reversed
+        row = (
+            Transaction.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list(*ledger.LEDGER_FIELDS)
+            .first()
+        )
+        return ledger.LedgerEntry(*row) if row else None
+    
     def save(self, *args, **kwargs):
-        """Update account balances when saving transactions"""
-        is_new = self.pk is None
-        old_transaction = None
-        
-        if not is_new:
-            old_transaction = Transaction.objects.get(pk=self.pk)
-        
-        super().save(*args, **kwargs)
+        """Update account balances atomically when saving transactions"""
+        with db_transaction.atomic():
+            old_entry = None if self._state.adding else self._get_stored_entry()
+            super().save(*args, **kwargs)
+            new_entry = ledger.entry_for(self)
+            deltas = ledger.record_changes([(old_entry, new_entry)])
         
-        # Update account balances
-        self._update_account_balances(old_transaction, is_new)
+        self._sync_cached_balances(deltas)
     
     def delete(self, *args, **kwargs):
-        """Update account balances when deleting transactions"""
-        # Reverse the transaction effects
-        if self.transaction_type == 'income':
-            self.account.balance -= self.amount
-        elif self.transaction_type == 'expense':
-            self.account.balance += self.amount
-        elif self.transaction_type == 'transfer':
-            self.account.balance += self.amount
-            if self.to_account:
-                self.to_account.balance -= self.amount
-                self.to_account.save()
+        """Update account balances atomically when deleting transactions"""
+        with db_transaction.atomic():
+            old_entry = self._get_stored_entry()
+            result = super().delete(*args, **kwargs)
+            deltas = ledger.record_changes([(old_entry, None)])
         
-        self.account.save()
-        super().delete(*args, **kwargs)
-    
-    def _update_account_balances(self, old_transaction, is_new):
-        """Helper method to update account balances"""
-        if old_transaction:
-            # Reverse old transaction effects
-            if old_transaction.transaction_type == 'income':
-                old_transaction.account.balance -= old_transaction.amount
-            elif old_transaction.transaction_type == 'expense':
-                old_transaction.account.balance += old_transaction.amount
-            elif old_transaction.transaction_type == 'transfer':
-                old_transaction.account.balance += old_transaction.amount
-                if old_transaction.to_account:
-                    old_transaction.to_account.balance -= old_transaction.amount
-                    old_transaction.to_account.save()
-            old_transaction.account.save()
-        
-        # Apply new transaction effects
-        if self.transaction_type == 'income':
-            self.account.balance += self.amount
-        elif self.transaction_type == 'expense':
-            self.account.balance -= self.amount
-        elif self.transaction_type == 'transfer':
-            self.account.balance -= self.amount
-            if self.to_account:
-                self.to_account.balance += self.amount
-                self.to_account.save()
-        
-        self.account.save()
+        self._sync_cached_balances(deltas)
+        return result
+    
+    def _sync_cached_balances(self, deltas):
+        """Mirror applied balance deltas onto already-loaded account instances"""
+        for field in ('account', 'to_account'):
+            if Transaction._meta.get_field(field).is_cached(self):
+                account = getattr(self, field)
+                if account is not None and account.pk in deltas:
+                    account.balance = Decimal(str(account.balance)) + deltas[account.pk]
+
+class BudgetQuerySet(models.QuerySet):
+    def with_spent_amount(self):
+        """Annotate each budget with its spend from the daily rollup"""
+        spend = DailyCategorySpend.objects.filter(
+            user_id=models.OuterRef('user_id'),
+            category_id=models.OuterRef('category_id'),
+            day__gte=models.OuterRef('start_date'),
+            day__lte=models.OuterRef('end_date')
+        ).order_by().values('category_id').annotate(total=models.Sum('total')).values('total')
+        return self.annotate(spent_total=Coalesce(
+            models.Subquery(spend),
+            models.Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=15, decimal_places=2)
+        ))
 
 class Budget(models.Model):
     """Budget model for tracking spending limits"""
@@ -119,6 +137,8 @@ class Budget(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BudgetQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'category', 'start_date', 'end_date']
@@ -126,19 +146,143 @@ class Budget(models.Model):
     def __str__(self):
         return f"{self.category.name} - {self.amount} ({self.period})"
     
+    def save(self, *args, **kwargs):
+        # The category or period may have changed
+        self.__dict__.pop('spent_total', None)
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
+            UserDataVersion.bump([self.user_id])
+    
+    def delete(self, *args, **kwargs):
+        with db_transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            UserDataVersion.bump([self.user_id])
+        return result
+    
     @property
     def spent_amount(self):
         """Calculate how much has been spent in this budget period"""
-        transactions = Transaction.objects.filter(
-            user=self.user,
-            category=self.category,
-            transaction_type='expense',
-            date__date__gte=self.start_date,
-            date__date__lte=self.end_date
-        )
-        return sum(t.amount for t in transactions)
+        if 'spent_total' not in self.__dict__:
+            self.spent_total = DailyCategorySpend.objects.filter(
+                user_id=self.user_id,
+                category_id=self.category_id,
+                day__gte=self.start_date,
+                day__lte=self.end_date
+            ).aggregate(total=models.Sum('total'))['total'] or Decimal('0.00')
+        return self.spent_total
     
     @property
     def remaining_amount(self):
         """Calculate remaining budget amount"""
         return self.amount - self.spent_amount
+
+
+class DailyCategorySpend(models.Model):
+    """Expense totals per user, category and day, maintained on every write"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_category_spend')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_spend')
+    day = models.DateField()
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    transaction_count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day']
+        unique_together = ['user', 'category', 'day']
+        verbose_name_plural = 'Daily category spend'
+    
+    def __str__(self):
+        return f"{self.category.name} on {self.day}: {self.total}"
+
+class MonthlySummary(models.Model):
+    """Per-account monthly totals and counts by transaction type, maintained on every write"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_summaries')
+    # Totals are in the account's currency
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='monthly_summaries')
+    month = models.DateField()  # First day of the month
+    income_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    income_count = models.IntegerField(default=0)
+    expense_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    expense_count = models.IntegerField(default=0)
+    transfer_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    transfer_count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-month']
+        unique_together = ['user', 'account', 'month']
+        verbose_name_plural = 'Monthly summaries'
+    
+    def __str__(self):
+        return f"{self.account.name} {self.month:%Y-%m}"
+
+class BalanceCheckpoint(models.Model):
+    """Closing balance of an account at the end of a month"""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='balance_checkpoints')
+    as_of = models.DateField()
+    balance = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-as_of']
+        unique_together = ['account', 'as_of']
+    
+    def __str__(self):
+        return f"{self.account.name} @ {self.as_of}: {self.balance}"
+
+class RecurringSeries(models.Model):
+    """A run of similar transactions, recurring once ``cadence`` has been detected"""
+    CADENCES = [
+        ('weekly', 'Weekly'),
+        ('biweekly', 'Every two weeks'),
+        ('monthly', 'Monthly'),
+        ('quarterly', 'Quarterly'),
+        ('yearly', 'Yearly'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_series')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='recurring_series')
+    to_account = models.ForeignKey(Account, on_delete=models.CASCADE, null=True, blank=True, related_name='incoming_recurring_series')
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    description = models.CharField(max_length=255)  # Normalized
+    cadence = models.CharField(max_length=20, choices=CADENCES, null=True, blank=True)
+    interval_days = models.FloatField(null=True, blank=True)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    occurrences = models.IntegerField(default=0)
+    first_date = models.DateField()
+    last_date = models.DateField()
+    # Most recent [day ordinal, amount] pairs the cadence is re-evaluated from
+    history = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-amount']
+        verbose_name_plural = 'Recurring series'
+        indexes = [
+            models.Index(fields=['user', 'description'], name='recurring_user_description_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.description} ({self.cadence or 'candidate'})"
+
+class RecurringDetectionState(models.Model):
+    """Per-user watermark: transactions with ids up to here have been processed"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='recurring_detection')
+    last_transaction_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user_id} @ {self.last_transaction_id}"
+
+class ExchangeRate(models.Model):
+    """Units of ``currency`` per one unit of settings.FX_BASE_CURRENCY on a date"""
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    # Rate lookups are memoised per latest update, so every process sees newly loaded rates
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['currency', 'date']
+    
+    def __str__(self):
+        return f"{self.currency} {self.rate} @ {self.date}"
@@ -0,0 +1,106 @@
+"""
+Keyset (cursor) pagination for transaction listings
+"""
+import base64
+import binascii
+from collections import OrderedDict
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class TransactionKeysetPagination(BasePagination):
+    """Forward-only pagination keyed on (date, id)
+
+    Each page seeks past the last row of the previous one, so deep pages cost
+    the same as the first and no COUNT query is issued. Rows are returned
+    newest first unless the queryset is ordered by ascending date.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = queryset.query.order_by
+        if ordering and ordering[0] not in ('date', '-date'):
+            raise ValidationError({'ordering': ['Cursor pagination only supports ordering by date.']})
+        ascending = bool(ordering) and ordering[0] == 'date'
+        queryset = queryset.order_by('date', 'id') if ascending else queryset.order_by('-date', '-id')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            date, pk = position
+            if ascending:
+                queryset = queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = (rows[-1].date, rows[-1].pk) if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            decoded = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            date, pk = decoded.rsplit('|', 1)
+            parsed = parse_datetime(date)
+            if parsed is None:
+                raise ValueError(date)
+            return parsed, int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        date, pk = position
+        token = base64.urlsafe_b64encode(f'{date.isoformat()}|{pk}'.encode('ascii')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def wants_keyset_pagination(request):
+    """Keyset pagination is opt-in via ?pagination=cursor or a cursor parameter"""
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or bool(params.get(TransactionKeysetPagination.cursor_query_param))
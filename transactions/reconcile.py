@@ -0,0 +1,115 @@
+"""
+Detecting and repairing drift between stored and computed account balances
+
+``Account.balance`` is maintained incrementally by ``ledger.record_changes``,
+so writes that bypass it (``QuerySet.delete()``, raw SQL, cascades) leave it
+wrong. The true balance of every account in a range of users is computed
+with one grouped aggregate: the per-account income, expense and outgoing
+transfer sums, unioned with the incoming transfer sums per destination
+account. Ranges are independent, so they can be spread over processes.
+"""
+from collections import namedtuple
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.utils import timezone
+from accounts.models import Account, UserDataVersion
+from .models import BalanceCheckpoint, Transaction
+
+ZERO = Decimal('0.00')
+COMPONENTS = ('income', 'expense', 'transfer_out', 'transfer_in')
+
+Drift = namedtuple('Drift', ['account_id', 'user_id', 'stored', 'actual'])
+
+
+def _sum_of(transaction_type):
+    return Sum(Case(
+        When(transaction_type=transaction_type, then=F('amount')),
+        default=Value(ZERO),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    ))
+
+
+def _zero():
+    return Value(ZERO, output_field=DecimalField(max_digits=15, decimal_places=2))
+
+
+def component_totals(transactions):
+    """{account_id: {component: total}} for a transaction queryset, in a single query"""
+    outgoing = transactions.order_by().values(balance_account=F('account_id')).annotate(
+        income=_sum_of('income'),
+        expense=_sum_of('expense'),
+        transfer_out=_sum_of('transfer'),
+        transfer_in=_zero(),
+    )
+    incoming = transactions.filter(transaction_type='transfer', to_account__isnull=False).order_by().values(
+        balance_account=F('to_account_id')
+    ).annotate(
+        income=_zero(),
+        expense=_zero(),
+        transfer_out=_zero(),
+        transfer_in=Sum('amount'),
+    )
+    totals = {}
+    for row in outgoing.union(incoming, all=True):
+        account = totals.setdefault(row['balance_account'], dict.fromkeys(COMPONENTS, ZERO))
+        for component in COMPONENTS:
+            # Some backends (SQLite) sum decimals as floats
+            account[component] += Decimal(row[component] or 0).quantize(ZERO)
+    return totals
+
+
+def actual_balance(components):
+    return (components['income'] - components['expense']
+            - components['transfer_out'] + components['transfer_in'])
+
+
+def find_drift(accounts, transactions):
+    """Return (accounts checked, drift of those whose stored balance differs from their transactions)"""
+    totals = component_totals(transactions)
+    checked = 0
+    drift = []
+    for account_id, user_id, stored in accounts.order_by('id').values_list('id', 'user_id', 'balance'):
+        checked += 1
+        components = totals.get(account_id)
+        actual = actual_balance(components) if components else ZERO
+        if actual != stored:
+            drift.append(Drift(account_id, user_id, stored, actual))
+    return checked, drift
+
+
+def fix_drift(drift):
+    """Set drifting balances to their computed value and return the drift actually fixed
+
+    The accounts are locked and recomputed first, so a transaction written
+    since the drift was found is neither lost nor counted twice.
+    """
+    account_ids = [item.account_id for item in drift]
+    now = timezone.now()
+    with db_transaction.atomic():
+        list(Account.objects.select_for_update().filter(id__in=account_ids).order_by('id').values_list('id'))
+        _, current = find_drift(
+            Account.objects.filter(id__in=account_ids),
+            Transaction.objects.filter(Q(account_id__in=account_ids) | Q(to_account_id__in=account_ids))
+        )
+        for item in current:
+            Account.objects.filter(pk=item.account_id).update(balance=item.actual, updated_at=now)
+        # Checkpoints are derived from the stored balance
+        BalanceCheckpoint.objects.filter(account_id__in=[item.account_id for item in current]).delete()
+        UserDataVersion.bump(item.user_id for item in current)
+    return current
+
+
+def reconcile_users(user_range, fix=False):
+    """Find (and optionally fix) drift for users with ids in [first, last]; return a report"""
+    first, last = user_range
+    checked, drift = find_drift(
+        Account.objects.filter(user_id__gte=first, user_id__lte=last),
+        Transaction.objects.filter(user_id__gte=first, user_id__lte=last)
+    )
+    fixed = fix_drift(drift) if fix and drift else []
+    return {
+        'accounts': checked,
+        'drift': [item._asdict() for item in drift],
+        'fixed': len(fixed),
+    }
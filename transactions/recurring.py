@@ -0,0 +1,201 @@
+"""
+Incremental detection of recurring transactions (salaries, subscriptions, rent)
+
+Transactions are grouped by account, type and normalized description into
+``RecurringSeries`` rows. A series is recurring once it has enough
+occurrences at a regular interval that matches a known cadence, with
+consistent amounts. Each run only reads transactions created after the
+user's watermark and re-evaluates the series they belong to from the most
+recent occurrences stored on the series. Editing or deleting a transaction
+drops the user's watermark, so their next run rebuilds from scratch.
+
+Detection runs in the ``detect_recurring`` command or job; requests only
+read the stored series.
+"""
+import re
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import lru_cache
+import numpy as np
+from django.db import transaction as db_transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from accounts.models import UserDataVersion
+from .models import RecurringDetectionState, RecurringSeries, Transaction
+
+MIN_OCCURRENCES = 3
+# Share of intervals and amounts that must agree with the series' typical value
+MIN_AGREEMENT = 0.75
+INTERVAL_TOLERANCE = 0.2
+AMOUNT_TOLERANCE = 0.15
+# Occurrences kept per series for re-evaluating its cadence
+MAX_HISTORY = 24
+# Candidates unseen for longer than two yearly periods are dropped
+CANDIDATE_EXPIRY_DAYS = 800
+CADENCES = {
+    'weekly': 7,
+    'biweekly': 14,
+    'monthly': 30.44,
+    'quarterly': 91.31,
+    'yearly': 365.25,
+}
+
+NOISE = re.compile(r'[^a-z]+')
+
+# Ledger entry fields a transaction's series and occurrences are derived from
+SERIES_FIELDS = ('account_id', 'to_account_id', 'transaction_type', 'amount', 'date', 'description')
+
+SeriesKey = namedtuple('SeriesKey', ['account_id', 'to_account_id', 'transaction_type', 'description'])
+Series = namedtuple('Series', SeriesKey._fields + (
+    'cadence', 'interval_days', 'amount', 'occurrences', 'first_date', 'last_date',
+))
+
+
+@lru_cache(maxsize=4096)
+def normalize_description(description):
+    """Reduce a description to its letters so reference numbers and dates don't split a series"""
+    return ' '.join(NOISE.sub(' ', description.lower()).split())
+
+
+def series_key(account_id, to_account_id, transaction_type, description):
+    return SeriesKey(account_id, to_account_id, transaction_type, normalize_description(description)[:255])
+
+
+def match_cadence(days, amounts):
+    """Return (cadence, interval days, typical amount) if the occurrences are regular, else None"""
+    if len(days) < MIN_OCCURRENCES:
+        return None
+    intervals = np.diff(np.asarray(days, dtype=np.int64))
+    interval = float(np.median(intervals))
+    for cadence, length in CADENCES.items():
+        if abs(interval - length) <= length * INTERVAL_TOLERANCE:
+            break
+    else:
+        return None
+    if np.mean(np.abs(intervals - length) <= length * INTERVAL_TOLERANCE) < MIN_AGREEMENT:
+        return None
+
+    amounts = np.asarray(amounts, dtype=np.float64)
+    amount = float(np.median(amounts))
+    if np.mean(np.abs(amounts - amount) <= abs(amount) * AMOUNT_TOLERANCE) < MIN_AGREEMENT:
+        return None
+    return cadence, interval, Decimal(str(round(amount, 2)))
+
+
+def is_active(series, today):
+    """A series is still running if its last occurrence is under two periods old"""
+    return (today - series.last_date).days <= 2 * CADENCES[series.cadence]
+
+
+def next_date(series):
+    return series.last_date + timedelta(days=round(CADENCES[series.cadence]))
+
+
+def apply_occurrences(series, occurrences):
+    """Merge new (day ordinal, amount) pairs into a series and re-evaluate its cadence"""
+    history = sorted(
+        [(day, Decimal(amount)) for day, amount in series.history] + occurrences
+    )[-MAX_HISTORY:]
+    series.history = [[day, str(amount)] for day, amount in history]
+    series.occurrences += len(occurrences)
+    days = [day for day, _ in occurrences]
+    series.first_date = min(filter(None, [series.first_date, date.fromordinal(min(days))]))
+    series.last_date = max(filter(None, [series.last_date, date.fromordinal(max(days))]))
+
+    match = match_cadence([day for day, _ in history], [amount for _, amount in history])
+    if match is None:
+        series.cadence, series.interval_days, series.amount = None, None, history[-1][1]
+    else:
+        series.cadence, series.interval_days, series.amount = match
+
+
+def update_series(user_id, full=False):
+    """Process a user's transactions created since the last run; return the counts"""
+    with db_transaction.atomic():
+        state, created = RecurringDetectionState.objects.get_or_create(user_id=user_id)
+        # Without a watermark, whatever series are stored have to be rebuilt
+        full = full or created
+        deleted = 0
+        if full:
+            deleted, _ = RecurringSeries.objects.filter(user_id=user_id).delete()
+            state.last_transaction_id = 0
+
+        watermark = state.last_transaction_id
+        new = defaultdict(list)
+        rows = (
+            Transaction.objects.filter(user_id=user_id, id__gt=watermark)
+            .annotate(day=TruncDate('date'))
+            .order_by('id')
+            .values_list('id', 'day', 'account_id', 'to_account_id', 'transaction_type', 'amount', 'description')
+        )
+        count = 0
+        for pk, day, account_id, to_account_id, transaction_type, amount, description in rows.iterator(chunk_size=2000):
+            key = series_key(account_id, to_account_id, transaction_type, description)
+            if key.description:
+                new[key].append((day.toordinal(), amount))
+            watermark = pk
+            count += 1
+        if not count and not full:
+            return {'transactions': 0, 'series': 0}
+
+        existing = {
+            SeriesKey(series.account_id, series.to_account_id, series.transaction_type, series.description): series
+            for series in RecurringSeries.objects.filter(
+                user_id=user_id, description__in={key.description for key in new}
+            )
+        }
+        now = timezone.now()
+        created, updated = [], []
+        for key, occurrences in new.items():
+            series = existing.get(key)
+            if series is None:
+                series = RecurringSeries(user_id=user_id, **key._asdict())
+                created.append(series)
+            else:
+                series.updated_at = now
+                updated.append(series)
+            apply_occurrences(series, occurrences)
+
+        RecurringSeries.objects.bulk_create(created)
+        RecurringSeries.objects.bulk_update(updated, [
+            'cadence', 'interval_days', 'amount', 'occurrences', 'first_date', 'last_date', 'history', 'updated_at'
+        ])
+        expired, _ = RecurringSeries.objects.filter(
+            user_id=user_id,
+            cadence__isnull=True,
+            last_date__lt=timezone.localdate() - timedelta(days=CANDIDATE_EXPIRY_DAYS)
+        ).delete()
+
+        state.last_transaction_id = watermark
+        state.save()
+        if created or updated or deleted or expired:
+            # Cached forecasts and ETags are keyed on the user's data version
+            UserDataVersion.bump([user_id])
+    return {'transactions': count, 'series': len(created) + len(updated)}
+
+
+def invalidate(changes):
+    """Drop the watermark of users whose existing transactions changed in a way their series depend on
+
+    Runs as part of ``ledger.record_changes``. Created transactions are past
+    the watermark already and need nothing.
+    """
+    user_ids = set()
+    for old, new in changes:
+        if old is None:
+            continue
+        if new is None or any(getattr(old, field) != getattr(new, field) for field in SERIES_FIELDS):
+            user_ids.update(entry.user_id for entry in (old, new) if entry is not None)
+    if user_ids:
+        RecurringDetectionState.objects.filter(user_id__in=user_ids).delete()
+
+
+def detected_series(user_id):
+    """The user's series with a detected cadence"""
+    return [
+        Series(*row) for row in RecurringSeries.objects.filter(user_id=user_id, cadence__isnull=False).values_list(
+            'account_id', 'to_account_id', 'transaction_type', 'description',
+            'cadence', 'interval_days', 'amount', 'occurrences', 'first_date', 'last_date'
+        )
+    ]
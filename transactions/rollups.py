@@ -0,0 +1,230 @@
+"""
+Incrementally maintained rollups
+
+``DailyCategorySpend`` holds one row per (user, category, day) with the total
+and count of expenses, and ``MonthlySummary`` one row per (user, account,
+month) with totals and counts per transaction type in the account's currency.
+``ledger.record_changes`` feeds both the net change of every write, so budget
+progress and period summaries are sums over a handful of rollup rows instead
+of scans of the transaction table.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.contrib.auth.models import User
+from accounts.models import UserDataVersion
+from .ledger import day_start, local_day, month_end
+from .models import DailyCategorySpend, MonthlySummary, Transaction
+
+TRANSACTION_TYPES = ('income', 'expense', 'transfer')
+
+REBUILD_BATCH_SIZE = 5000
+
+
+def increment(model, lookup, **deltas):
+    """Add ``deltas`` to the row matching ``lookup``, creating it if needed"""
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with db_transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another writer created the row first
+        model.objects.filter(**lookup).update(**updates)
+
+
+def spend_deltas(changes):
+    """Net expense change per (user, category, day) for (old, new) entry pairs"""
+    deltas = defaultdict(lambda: [Decimal('0.00'), 0])
+    for old, new in changes:
+        if old == new:
+            continue
+        for entry, sign in ((old, -1), (new, 1)):
+            if entry is None or entry.transaction_type != 'expense' or not entry.category_id:
+                continue
+            delta = deltas[(entry.user_id, entry.category_id, local_day(entry.date))]
+            delta[0] += sign * entry.amount
+            delta[1] += sign
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def apply_spend_deltas(deltas):
+    for (user_id, category_id, day), (total, count) in sorted(deltas.items()):
+        increment(
+            DailyCategorySpend,
+            {'user_id': user_id, 'category_id': category_id, 'day': day},
+            total=total,
+            transaction_count=count,
+        )
+
+
+def monthly_deltas(changes):
+    """Net total/count change per (user, account, month) and transaction type"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for old, new in changes:
+        if old == new:
+            continue
+        for entry, sign in ((old, -1), (new, 1)):
+            if entry is None or entry.transaction_type not in TRANSACTION_TYPES:
+                continue
+            delta = deltas[(entry.user_id, entry.account_id, local_day(entry.date).replace(day=1))]
+            delta[f'{entry.transaction_type}_total'] += sign * entry.amount
+            delta[f'{entry.transaction_type}_count'] += sign
+    return {
+        key: {field: value for field, value in delta.items() if value}
+        for key, delta in deltas.items()
+        if any(delta.values())
+    }
+
+
+def apply_monthly_deltas(deltas):
+    for (user_id, account_id, month), delta in sorted(deltas.items()):
+        increment(MonthlySummary, {'user_id': user_id, 'account_id': account_id, 'month': month}, **delta)
+
+
+def totals_aggregates():
+    """Conditional aggregates for per-type totals and counts in one query"""
+    aggregates = {}
+    for transaction_type in TRANSACTION_TYPES:
+        only_type = Q(transaction_type=transaction_type)
+        aggregates[f'{transaction_type}_total'] = Sum('amount', filter=only_type)
+        aggregates[f'{transaction_type}_count'] = Count('id', filter=only_type)
+    return aggregates
+
+
+def empty_totals():
+    totals = {}
+    for transaction_type in TRANSACTION_TYPES:
+        totals[f'{transaction_type}_total'] = Decimal('0.00')
+        totals[f'{transaction_type}_count'] = 0
+    return totals
+
+
+def add_totals(totals, row):
+    for field, value in row.items():
+        if field in totals and value:
+            totals[field] += value
+    return totals
+
+
+def range_groups(transactions, start, end):
+    """Per-currency totals of ``transactions`` on local dates [start, end], as of ``end``"""
+    rows = transactions.filter(
+        date__gte=day_start(start),
+        date__lt=day_start(end + timedelta(days=1))
+    ).order_by().values('account__currency').annotate(**totals_aggregates())
+    return [(row['account__currency'], end, add_totals(empty_totals(), row)) for row in rows]
+
+
+def monthly_groups(user, first, last):
+    """Per-currency totals of each whole month from ``first`` to ``last``, as of the month's end"""
+    rows = (
+        MonthlySummary.objects.filter(user=user, month__gte=first, month__lte=last)
+        .values('account__currency', 'month')
+        .annotate(**{field: Sum(field) for field in empty_totals()})
+        .order_by()
+    )
+    return [(row['account__currency'], month_end(row['month']), add_totals(empty_totals(), row)) for row in rows]
+
+
+def period_queries(user, start, end):
+    """Independent zero-argument queries whose groups together cover local dates [start, end]
+
+    Whole months are summed from ``MonthlySummary``; only the partial months
+    at either edge of the range are aggregated from the transaction table.
+    """
+    if start > end:
+        return []
+    transactions = Transaction.objects.filter(user=user)
+
+    first_full = start if start.day == 1 else month_end(start) + timedelta(days=1)
+    if end == month_end(end):
+        last_full = end.replace(day=1)
+    else:
+        last_full = (end.replace(day=1) - timedelta(days=1)).replace(day=1)
+    if first_full > last_full:
+        return [partial(range_groups, transactions, start, end)]
+
+    queries = [partial(monthly_groups, user, first_full, last_full)]
+    if start < first_full:
+        queries.append(partial(range_groups, transactions, start, first_full - timedelta(days=1)))
+    if end > month_end(last_full):
+        queries.append(partial(range_groups, transactions, month_end(last_full) + timedelta(days=1), end))
+    return queries
+
+
+def period_groups(user, start, end):
+    """Per-type totals for local dates [start, end] as (currency, as_of, totals) groups
+
+    Each group covers a single currency and at most one month, and ``as_of``
+    is its last day, so it can be converted with one exchange rate.
+    """
+    return [group for query in period_queries(user, start, end) for group in query()]
+
+
+def rebuild_monthly_summaries(user_ids=None):
+    """Recompute monthly summaries from the transaction table"""
+    rows = MonthlySummary.objects.all()
+    transactions = Transaction.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+        transactions = transactions.filter(user_id__in=user_ids)
+
+    grouped = (
+        transactions.annotate(month=TruncMonth('date'))
+        .order_by()
+        .values('user_id', 'account_id', 'month')
+        .annotate(**totals_aggregates())
+    )
+    with db_transaction.atomic():
+        rows.delete()
+        batch = []
+        for row in grouped.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            summary = add_totals(empty_totals(), row)
+            batch.append(MonthlySummary(
+                user_id=row['user_id'], account_id=row['account_id'], month=local_day(row['month']), **summary
+            ))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                MonthlySummary.objects.bulk_create(batch)
+                batch = []
+        MonthlySummary.objects.bulk_create(batch)
+
+
+def rebuild_spend_rollup(user_ids=None):
+    """Recompute daily category spend from the transaction table"""
+    rows = DailyCategorySpend.objects.all()
+    expenses = Transaction.objects.filter(transaction_type='expense', category__isnull=False)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+        expenses = expenses.filter(user_id__in=user_ids)
+
+    grouped = (
+        expenses.annotate(day=TruncDate('date'))
+        .order_by()
+        .values('user_id', 'category_id', 'day')
+        .annotate(total=Sum('amount'), transaction_count=Count('id'))
+    )
+    with db_transaction.atomic():
+        rows.delete()
+        batch = []
+        for row in grouped.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(DailyCategorySpend(**row))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                DailyCategorySpend.objects.bulk_create(batch)
+                batch = []
+        DailyCategorySpend.objects.bulk_create(batch)
+
+
+def rebuild_rollups(user_ids=None):
+    """Recompute every rollup table, optionally for a subset of users"""
+    rebuild_spend_rollup(user_ids)
+    rebuild_monthly_summaries(user_ids)
+    # Responses cached from the stale rollups must not be served again
+    if user_ids is None:
+        user_ids = User.objects.values_list('id', flat=True)
+    UserDataVersion.bump(user_ids)
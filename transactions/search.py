@@ -0,0 +1,97 @@
+"""
+Full-text search over transaction descriptions
+
+SQLite uses an external-content FTS5 table kept in sync by triggers, so every
+insert, update and delete (including ``bulk_create`` and queryset deletes)
+updates the index. PostgreSQL uses a GIN index over
+``to_tsvector('english', description)``. Other databases fall back to
+``icontains`` matching.
+"""
+import re
+from django.db import connections
+
+FTS_TABLE = 'transactions_transaction_fts'
+TRANSACTION_TABLE = 'transactions_transaction'
+SEARCH_CONFIG = 'english'
+POSTGRES_INDEX = 'transaction_description_search_idx'
+
+SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"description, content='{TRANSACTION_TABLE}', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TRANSACTION_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TRANSACTION_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF description ON {TRANSACTION_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+POSTGRES_CREATE = [
+    f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON {TRANSACTION_TABLE} "
+    f"USING GIN (to_tsvector('{SEARCH_CONFIG}', description))",
+]
+POSTGRES_DROP = [f"DROP INDEX IF EXISTS {POSTGRES_INDEX}"]
+
+
+def install_search_index(schema_editor):
+    """Create the vendor-specific text index
+
+    SQLite drops triggers when Django rebuilds a table, so migrations that
+    alter the transaction table on SQLite must call this again afterwards.
+    """
+    statements = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def remove_search_index(schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def search_terms(query):
+    """Split free text into word tokens, dropping search syntax"""
+    return re.findall(r'\w+', query)
+
+
+def search_transactions(queryset, query):
+    """Restrict a transaction queryset to matches for ``query``, best first"""
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # Quote every term so user input can't inject FTS5 syntax, and match prefixes
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.extra(
+            select={'rank': f'bm25({FTS_TABLE})'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {TRANSACTION_TABLE}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            order_by=['rank', '-date'],
+        )
+
+    if vendor == 'postgresql':
+        vector = f"to_tsvector('{SEARCH_CONFIG}', {TRANSACTION_TABLE}.description)"
+        tsquery = f"plainto_tsquery('{SEARCH_CONFIG}', %s)"
+        text = ' '.join(terms)
+        return queryset.extra(
+            select={'rank': f'ts_rank({vector}, {tsquery})'},
+            select_params=[text],
+            where=[f'{vector} @@ {tsquery}'],
+            params=[text],
+            order_by=['-rank', '-date'],
+        )
+
+    for term in terms:
+        queryset = queryset.filter(description__icontains=term)
+    return queryset.order_by('-date', '-id')
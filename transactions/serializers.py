@@ -1,10 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Category, Transaction, Budget
-from accounts.serializers import AccountSummarySerializer
+from django.utils import timezone
+from .models import Category, Transaction, Budget, RecurringSeries
+from .recurring import is_active, next_date
+from accounts.serializers import AccountSummarySerializer, UserSerializer
+from financial_tracker.fieldsets import ExpandableFieldsMixin
 
-class CategorySerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
+class CategorySerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    
+    expandable_fields = {
+        'user': (UserSerializer, {}),
+    }
     
     class Meta:
         model = Category
@@ -15,15 +22,22 @@ class CategorySerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class TransactionSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
-    account = AccountSummarySerializer(read_only=True)
+class TransactionSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    account = serializers.PrimaryKeyRelatedField(read_only=True)
     account_id = serializers.IntegerField(write_only=True)
-    category = CategorySerializer(read_only=True)
+    category = serializers.PrimaryKeyRelatedField(read_only=True)
     category_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
-    to_account = AccountSummarySerializer(read_only=True)
+    to_account = serializers.PrimaryKeyRelatedField(read_only=True)
     to_account_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     
+    expandable_fields = {
+        'user': (UserSerializer, {}),
+        'account': (AccountSummarySerializer, {}),
+        'category': (CategorySerializer, {}),
+        'to_account': (AccountSummarySerializer, {}),
+    }
+    
     class Meta:
         model = Transaction
         fields = ['id', 'user', 'account', 'account_id', 'category', 'category_id', 
@@ -40,6 +54,11 @@ class TransactionSerializer(serializers.ModelSerializer):
         if data.get('transaction_type') != 'transfer' and data.get('to_account_id'):
             raise serializers.ValidationError("Only transfer transactions can have a destination account.")
         
+        # A transfer to its own account would change nothing but still be counted
+        account_id = data.get('account_id', getattr(self.instance, 'account_id', None))
+        if data.get('to_account_id') and data.get('to_account_id') == account_id:
+            raise serializers.ValidationError("A transfer's destination must be a different account.")
+        
         return data
     
     def create(self, validated_data):
@@ -73,13 +92,18 @@ class TransactionSerializer(serializers.ModelSerializer):
         
         return super().create(validated_data)
 
-class BudgetSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
-    category = CategorySerializer(read_only=True)
+class BudgetSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    category = serializers.PrimaryKeyRelatedField(read_only=True)
     category_id = serializers.IntegerField(write_only=True)
     spent_amount = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     remaining_amount = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     
+    expandable_fields = {
+        'user': (UserSerializer, {}),
+        'category': (CategorySerializer, {}),
+    }
+    
     class Meta:
         model = Budget
         fields = ['id', 'user', 'category', 'category_id', 'amount', 'period', 
@@ -105,5 +129,42 @@ class TransactionSummarySerializer(serializers.Serializer):
     total_expenses = serializers.DecimalField(max_digits=15, decimal_places=2)
     net_amount = serializers.DecimalField(max_digits=15, decimal_places=2)
     transaction_count = serializers.IntegerField()
+    currency = serializers.CharField()
     period_start = serializers.DateField()
-    period_end = serializers.DateField()
\ No newline at end of file
+    period_end = serializers.DateField()
+
+class TransactionImportSerializer(serializers.Serializer):
+    """Serializer for bulk statement import uploads"""
+    file = serializers.FileField()
+    account_id = serializers.IntegerField()
+    file_format = serializers.ChoiceField(choices=['csv', 'ofx'], required=False)
+    date_format = serializers.CharField(required=False, allow_blank=True)
+    dry_run = serializers.BooleanField(required=False, default=False)
+    background = serializers.BooleanField(required=False, default=False)
+    
+    def validate(self, data):
+        from accounts.models import Account
+        try:
+            data['account'] = Account.objects.get(id=data.pop('account_id'), user=self.context['request'].user)
+        except Account.DoesNotExist:
+            raise serializers.ValidationError("Account not found or doesn't belong to user.")
+        return data
+
+
+class RecurringSeriesSerializer(serializers.ModelSerializer):
+    """Serializer for detected recurring transactions"""
+    next_date = serializers.SerializerMethodField()
+    is_active = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = RecurringSeries
+        fields = ['id', 'account', 'to_account', 'transaction_type', 'description', 'cadence',
+                 'interval_days', 'amount', 'occurrences', 'first_date', 'last_date',
+                 'next_date', 'is_active']
+        read_only_fields = fields
+    
+    def get_next_date(self, obj):
+        return next_date(obj)
+    
+    def get_is_active(self, obj):
+        return is_active(obj, timezone.localdate())
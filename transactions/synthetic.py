@@ -0,0 +1,208 @@
+"""
+Synthetic users, accounts and transaction histories for load testing
+
+Every user's history is drawn from its own generator seeded with
+(seed, user number), so the data is the same however users are split
+across worker processes. Rows are written with ``bulk_create``, bypassing
+the ledger. Balances are then set from one grouped aggregate per batch of
+users, and the rollups are rebuilt.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from accounts.models import Account, UserProfile
+from .ledger import day_start
+from .models import Category, Transaction
+from .reconcile import find_drift
+from .rollups import rebuild_rollups
+
+ACCOUNT_TYPES = ['checking', 'savings', 'credit', 'investment', 'cash']
+
+# name: (share of everyday spending, median amount, spread of log amount, merchants)
+SPENDING = {
+    'Groceries': (0.30, 45.0, 0.6, ['Fresh Market', 'Corner Grocery', 'SuperSave']),
+    'Dining': (0.22, 22.0, 0.7, ['Cafe Central', 'Noodle Bar', 'Pizza Place', 'Burger Joint']),
+    'Transport': (0.18, 12.0, 0.8, ['City Transit', 'Fuel Station', 'RideShare']),
+    'Shopping': (0.12, 40.0, 1.1, ['Online Store', 'Department Store', 'Bookshop']),
+    'Entertainment': (0.08, 25.0, 0.8, ['Cinema', 'Streaming Service', 'Concert Hall']),
+    'Health': (0.06, 35.0, 0.9, ['Pharmacy', 'Dental Clinic', 'Gym']),
+    'Utilities': (0.04, 80.0, 0.4, ['Power Company', 'Water Utility', 'Internet Provider']),
+}
+FIXED_CATEGORIES = ['Salary', 'Housing']
+CATEGORY_NAMES = FIXED_CATEGORIES + list(SPENDING)
+SHARES = np.array([share for share, _, _, _ in SPENDING.values()])
+SHARES = SHARES / SHARES.sum()
+
+MEDIAN_SALARY = 4000.0
+RENT_SHARE = 0.3
+SAVINGS_SHARE = 0.1
+CARD_PAYMENT_SHARE = 0.35
+# Spending falls on days 1-28 so every month has the same number of days
+DAYS_PER_MONTH = 28
+BATCH_SIZE = 10000
+UNUSABLE_PASSWORD = make_password(None)
+
+
+def month_starts(years, today):
+    first = today.replace(day=1)
+    starts = []
+    for _ in range(years * 12):
+        starts.append(first)
+        first = (first - timedelta(days=1)).replace(day=1)
+    return starts[::-1]
+
+
+def cents(value):
+    return Decimal(int(round(value * 100))) / 100
+
+
+class HistoryGenerator:
+    """Generate the transactions of one user"""
+
+    def __init__(self, seed, number, accounts, categories, months, tx_per_month, today):
+        self.rng = np.random.default_rng([seed, number])
+        self.accounts = accounts
+        self.categories = categories
+        self.months = months
+        self.tx_per_month = tx_per_month
+        self.today = today
+        self.salary = MEDIAN_SALARY * self.rng.lognormal(0, 0.35)
+
+    def last_day(self, month):
+        """Last day of ``month`` with transactions: the 28th, or today in the current month"""
+        return min(self.today.day, DAYS_PER_MONTH) if month == self.today.replace(day=1) else DAYS_PER_MONTH
+
+    def at(self, month, day, seconds):
+        return day_start(month.replace(day=day)) + timedelta(seconds=int(seconds))
+
+    def transaction(self, user_id, kind, account, amount, description, date, category=None, to_account=None):
+        return Transaction(
+            user_id=user_id,
+            account_id=account,
+            to_account_id=to_account,
+            category_id=category,
+            transaction_type=kind,
+            amount=cents(amount),
+            description=description,
+            date=date,
+        )
+
+    def generate(self, user_id):
+        rng = self.rng
+        checking = self.accounts['checking']
+        savings = self.accounts.get('savings')
+        credit = self.accounts.get('credit')
+        spend_accounts = [checking, credit] if credit else [checking]
+
+        for month in self.months:
+            hour = 9 * 3600
+            last_day = self.last_day(month)
+            # Salary on the 1st is never in the future
+            yield self.transaction(user_id, 'income', checking, self.salary * rng.uniform(0.98, 1.02),
+                                   'Salary', self.at(month, 1, hour), self.categories['Salary'])
+            if last_day >= 2:
+                yield self.transaction(user_id, 'expense', checking, self.salary * RENT_SHARE, 'Rent',
+                                       self.at(month, 2, hour), self.categories['Housing'])
+            fixed = 2
+            if savings:
+                fixed += 1
+                if last_day >= 3:
+                    yield self.transaction(user_id, 'transfer', checking, self.salary * SAVINGS_SHARE,
+                                           'Transfer to savings', self.at(month, 3, hour), to_account=savings)
+            if credit:
+                fixed += 1
+                payment = self.salary * CARD_PAYMENT_SHARE * rng.uniform(0.7, 1.3)
+                if last_day >= 25:
+                    yield self.transaction(user_id, 'transfer', checking, payment, 'Credit card payment',
+                                           self.at(month, 25, hour), to_account=credit)
+
+            # The current month gets its share of spending for the days so far, at the usual daily rate
+            count = round(max(0, self.tx_per_month - fixed) * last_day / DAYS_PER_MONTH)
+            picks = rng.choice(len(SPENDING), size=count, p=SHARES)
+            days = rng.integers(1, last_day + 1, size=count)
+            seconds = rng.integers(7 * 3600, 23 * 3600, size=count)
+            on_card = rng.random(count) < 0.4
+            noise = rng.standard_normal(count)
+            merchants = rng.random(count)
+            for index in range(count):
+                name = CATEGORY_NAMES[len(FIXED_CATEGORIES) + picks[index]]
+                _, median, spread, shops = SPENDING[name]
+                yield self.transaction(
+                    user_id,
+                    'expense',
+                    spend_accounts[-1] if on_card[index] else spend_accounts[0],
+                    max(0.5, median * np.exp(spread * noise[index])),
+                    shops[int(merchants[index] * len(shops))],
+                    self.at(month, int(days[index]), seconds[index]),
+                    self.categories[name],
+                )
+
+
+def _insert(objects):
+    Transaction.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+    return len(objects)
+
+
+def set_balances(user_ids):
+    """Set the generated accounts' balances from their transactions in one aggregate"""
+    _, drift = find_drift(
+        Account.objects.filter(user_id__in=user_ids),
+        Transaction.objects.filter(user_id__in=user_ids)
+    )
+    Account.objects.bulk_update(
+        [Account(pk=item.account_id, balance=item.actual) for item in drift], ['balance'], batch_size=BATCH_SIZE
+    )
+
+
+def generate_users(numbers, prefix, seed, accounts_per_user, years, tx_per_month, today=None):
+    """Create users ``numbers`` with accounts, categories and histories; return row counts"""
+    today = today or timezone.localdate()
+    months = month_starts(years, today)
+    joined = day_start(months[0])
+    with db_transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}{number}', email=f'{prefix}{number}@example.com',
+                 password=UNUSABLE_PASSWORD, date_joined=joined)
+            for number in numbers
+        ])
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+        accounts = Account.objects.bulk_create([
+            Account(user=user, name=f'{account_type.title()} {index + 1}', account_type=account_type)
+            for user in users
+            for index, account_type in enumerate(
+                ACCOUNT_TYPES[position % len(ACCOUNT_TYPES)] for position in range(accounts_per_user)
+            )
+        ])
+        categories = Category.objects.bulk_create([
+            Category(user=user, name=name) for user in users for name in CATEGORY_NAMES
+        ])
+
+        by_user = {}
+        for account in accounts:
+            by_user.setdefault(account.user_id, {}).setdefault(account.account_type, account.pk)
+        category_ids = {}
+        for category in categories:
+            category_ids.setdefault(category.user_id, {})[category.name] = category.pk
+
+        created = 0
+        batch = []
+        for number, user in zip(numbers, users):
+            generator = HistoryGenerator(
+                seed, number, by_user[user.pk], category_ids[user.pk], months, tx_per_month, today
+            )
+            for transaction in generator.generate(user.pk):
+                batch.append(transaction)
+                if len(batch) >= BATCH_SIZE:
+                    created += _insert(batch)
+                    batch = []
+        if batch:
+            created += _insert(batch)
+
+        user_ids = [user.pk for user in users]
+        set_balances(user_ids)
+    rebuild_rollups(user_ids)
+    return {'users': len(users), 'accounts': len(accounts), 'transactions': created}
@@ -0,0 +1,101 @@
+"""
+Background job handlers for imports, exports, balance and rollup maintenance
+"""
+import codecs
+import tempfile
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import QueryDict
+from django.utils import timezone
+from accounts.models import Account
+from jobs.registry import task
+from .checkpoints import build_checkpoints
+from .exporters import encode_rows, export_rows
+from .filters import TransactionFilterSet
+from .importers import StatementImporter
+from .models import Transaction
+from .reconcile import reconcile_users
+from .recurring import update_series
+from .rollups import rebuild_rollups
+
+# Rows between progress updates of an export
+PROGRESS_EVERY = 5000
+# Exports are buffered in memory up to this size before spilling to disk
+SPOOL_SIZE = 1024 * 1024
+
+
+def counted(rows, progress):
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        yield row
+        if count % PROGRESS_EVERY == 0:
+            progress(count)
+    progress(count)
+
+
+@task('import_statement')
+def import_statement(job):
+    """Import an uploaded statement saved to storage by the import endpoint"""
+    params = job.params
+    try:
+        account = Account.objects.get(pk=params['account_id'], user=job.user)
+        importer = StatementImporter(
+            job.user,
+            account,
+            date_format=params.get('date_format') or None,
+            dry_run=params.get('dry_run', False),
+            progress=job.set_progress
+        )
+        with default_storage.open(params['file'], 'rb') as upload:
+            return importer.import_file(codecs.iterdecode(upload, 'utf-8-sig'), params['file_format'])
+    finally:
+        default_storage.delete(params['file'])
+
+
+@task('export_transactions')
+def export_transactions(job):
+    """Write the filtered history to a file that can be downloaded from the job"""
+    output = job.params.get('output', 'csv')
+    query = QueryDict(mutable=True)
+    for name, values in job.params.get('filters', {}).items():
+        query.setlist(name, values)
+    transactions = TransactionFilterSet(
+        query, Transaction.objects.filter(user=job.user).order_by('-date', '-id')
+    ).qs
+    job.set_progress(0, transactions.count())
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as buffer:
+        for chunk in encode_rows(counted(export_rows(transactions), job.set_progress), output):
+            buffer.write(chunk.encode('utf-8'))
+        buffer.seek(0)
+        name = default_storage.save(
+            f'jobs/{job.pk}/transactions-{timezone.localdate():%Y%m%d}.{output}', File(buffer)
+        )
+    return {'file': name, 'rows': job.progress_done}
+
+
+@task('rebuild_rollups', api=True)
+def rebuild_rollups_task(job):
+    """Recompute the job owner's rollups, or everyone's for jobs without a user"""
+    rebuild_rollups([job.user_id] if job.user_id else None)
+    return {'users': 1 if job.user_id else 'all'}
+
+
+@task('build_checkpoints', api=True)
+def build_checkpoints_task(job):
+    """Create missing balance checkpoints for the job owner's accounts"""
+    accounts = Account.objects.filter(user=job.user).values_list('pk', flat=True)
+    return {'accounts': build_checkpoints(accounts.iterator())}
+
+
+@task('detect_recurring', api=True)
+def detect_recurring(job):
+    """Catch up recurring detection, from scratch with ``{"full": true}``"""
+    return update_series(job.user_id, full=bool(job.params.get('full')))
+
+
+@task('rebuild_balances', api=True)
+def rebuild_balances(job):
+    """Recompute the job owner's account balances from their transactions"""
+    report = reconcile_users((job.user_id, job.user_id), fix=True)
+    return {'accounts': report['accounts'], 'drift': len(report['drift']), 'fixed': report['fixed']}
@@ -1,3 +1,1533 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from accounts.models import Account, UserDataVersion, UserProfile
+from accounts.serializers import AccountSerializer
+from financial_tracker.benchmark import failures, regressions, run_benchmarks, viewset_actions
+from financial_tracker.metrics import REGISTRY
+from jobs.registry import enqueue
+from jobs.worker import claim_jobs, run_job
+from .analytics import clear_cache as clear_analytics_cache
+from .checkpoints import balance_as_of
+from .forecast import forecast_accounts
+from .fx import rate_on, versioned_rate
+from .importers import StatementImporter
+from .ledger import day_start
+from .models import (
+    BalanceCheckpoint, Budget, Category, ExchangeRate, MonthlySummary, RecurringDetectionState, RecurringSeries,
+    Transaction
+)
+from .reconcile import component_totals, find_drift
+from .recurring import update_series
+from .synthetic import generate_users
 
-# Create your tests here.
+class StatementImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='testpass123')
+        self.checking = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_csv_import_applies_net_balance(self):
+        """Test CSV rows are bulk created and balances updated once per chunk"""
+        lines = [
+            'date,amount,description,category,type,to_account',
+            '2024-01-01,2500.00,Salary,,,',
+            '2024-01-02,-45.10,Groceries,Food,,',
+            '2024-01-03,100.00,Move to savings,,transfer,Savings',
+            'not-a-date,1.00,Broken row,,,',
+        ]
+        importer = StatementImporter(self.user, self.checking, chunk_size=2)
+
+        report = importer.import_csv(lines)
+
+        self.assertEqual(report['created'], 3)
+        self.assertEqual(report['failed'], 1)
+        self.assertEqual(report['errors'][0]['row'], 5)
+        self.checking.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('2354.90'))
+        self.assertEqual(self.savings.balance, Decimal('100.00'))
+        self.assertTrue(Category.objects.filter(user=self.user, name='Food').exists())
+
+    def test_ofx_upload_via_api(self):
+        """Test the import action parses an uploaded OFX statement"""
+        statement = (
+            b'OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            b'<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240115120000[-5:EST]<TRNAMT>-12.50<NAME>Coffee Shop\n'
+            b'</STMTTRN>\n'
+            b'<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240116<TRNAMT>300.00<NAME>Refund<MEMO>Order 42\n'
+            b'</STMTTRN>\n'
+            b'</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        )
+        response = self.client.post('/transactions/api/transactions/import/', {
+            'file': SimpleUploadedFile('statement.ofx', statement),
+            'account_id': self.checking.id,
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('287.50'))
+        refund = Transaction.objects.get(user=self.user, transaction_type='income')
+        self.assertEqual(refund.description, 'Refund - Order 42')
+
+    def test_rejects_undecodable_files_and_self_transfers(self):
+        """Test a non-UTF-8 upload is a 400 naming the file and transfers into the source account fail"""
+        response = self.client.post('/transactions/api/transactions/import/', {
+            'file': SimpleUploadedFile('latin1.csv', 'date,amount\n2024-01-01,-5\nCafé,\n'.encode('latin-1')),
+            'account_id': self.checking.id,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('latin1.csv', response.data['file'][0])
+
+        report = StatementImporter(self.user, self.checking).import_csv([
+            'date,amount,description,type,to_account',
+            '2024-01-03,100.00,Nowhere,transfer,Checking',
+        ])
+        self.assertEqual((report['created'], report['failed']), (0, 1))
+        self.assertIn('different account', report['errors'][0]['error'])
+
+    def test_dry_run_writes_nothing(self):
+        """Test dry runs validate rows without touching the database"""
+        upload = SimpleUploadedFile('statement.csv', b'date,amount,description\n2024-01-01,-5,Snack\n')
+        response = self.client.post('/transactions/api/transactions/import/', {
+            'file': upload,
+            'account_id': self.checking.id,
+            'dry_run': True,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertFalse(Transaction.objects.exists())
+
+class BalanceUpdateTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='saver', password='testpass123')
+        self.checking = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+
+    def create_transaction(self, **kwargs):
+        defaults = {
+            'user': self.user,
+            'account': self.checking,
+            'transaction_type': 'expense',
+            'amount': Decimal('10.00'),
+            'description': 'Test',
+            'date': timezone.now(),
+        }
+        defaults.update(kwargs)
+        return Transaction.objects.create(**defaults)
+
+    def test_edit_moves_balance_between_accounts(self):
+        """Test editing a transaction reverses the stored effect with one locked read"""
+        transaction = self.create_transaction(transaction_type='income', amount=Decimal('100.00'))
+        transaction = Transaction.objects.get(pk=transaction.pk)
+
+        transaction.transaction_type = 'transfer'
+        transaction.amount = Decimal('40.00')
+        transaction.to_account = self.savings
+        with CaptureQueriesContext(connection) as queries:
+            transaction.save()
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('SELECT')]), 1)
+
+        self.checking.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('-40.00'))
+        self.assertEqual(self.savings.balance, Decimal('40.00'))
+
+    def test_delete_reverses_stored_state(self):
+        """Test deleting reverses what was saved, not unsaved in-memory edits"""
+        transaction = self.create_transaction(amount=Decimal('25.00'))
+        transaction.amount = Decimal('999.00')
+        transaction.delete()
+
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('0.00'))
+
+    def test_stale_instances_reverse_the_stored_row(self):
+        """Test an edit loaded before another writer's edit reverses what is stored now"""
+        transaction = self.create_transaction(amount=Decimal('25.00'))
+        first = Transaction.objects.get(pk=transaction.pk)
+        second = Transaction.objects.get(pk=transaction.pk)
+
+        first.amount = Decimal('50.00')
+        first.save()
+        second.amount = Decimal('70.00')
+        second.save()
+
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('-70.00'))
+
+    def test_account_edits_keep_concurrent_increments(self):
+        """Test saving an account loaded before a transaction does not undo its balance change"""
+        stale = Account.objects.get(pk=self.checking.pk)
+        self.create_transaction(account_id=self.checking.pk, amount=Decimal('30.00'))
+
+        serializer = AccountSerializer(stale, data={'name': 'Everyday', 'balance': '999.00'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(f'/accounts/api/accounts/{self.checking.pk}/toggle_active/')
+        self.assertEqual(response.status_code, 200)
+
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.name, 'Everyday')
+        self.assertFalse(self.checking.is_active)
+        self.assertEqual(self.checking.balance, Decimal('-30.00'))
+
+class ConcurrentBalanceUpdateTest(TransactionTestCase):
+    def test_parallel_writers_do_not_lose_updates(self):
+        """Test many threads posting to one account leave the exact final balance"""
+        user = User.objects.create_user(username='racer', password='testpass123')
+        account = Account.objects.create(user=user, name='Shared', account_type='checking')
+        threads, per_thread = 8, 25
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(per_thread):
+                    Transaction.objects.create(
+                        user=user,
+                        account_id=account.pk,
+                        transaction_type='income',
+                        amount=Decimal('1.25'),
+                        description='Deposit',
+                        date=timezone.now(),
+                    )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal('1.25') * threads * per_thread)
+
+class BalanceCheckpointTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='historian', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for days_ago, amount in [(400, '1000.00'), (200, '-300.00'), (100, '-50.00'), (1, '20.00')]:
+            Transaction.objects.create(
+                user=self.user,
+                account=self.account,
+                transaction_type='income' if amount[0] != '-' else 'expense',
+                amount=abs(Decimal(amount)),
+                description='Test',
+                date=timezone.now() - timedelta(days=days_ago),
+            )
+
+    def replayed_balance(self, day):
+        total = Decimal('0.00')
+        for transaction in Transaction.objects.filter(account=self.account):
+            if timezone.localdate(transaction.date) <= day:
+                total += transaction.amount if transaction.transaction_type == 'income' else -transaction.amount
+        return total
+
+    def test_as_of_matches_full_replay(self):
+        """Test balances agree with replaying every transaction, with and without checkpoints"""
+        today = timezone.localdate()
+        days = [today - timedelta(days=days_ago) for days_ago in (500, 399, 250, 150, 99, 30, 0)]
+        for day in days:
+            self.assertEqual(balance_as_of(self.account, day), self.replayed_balance(day))
+        self.assertFalse(BalanceCheckpoint.objects.exists())
+
+        out = StringIO()
+        call_command('build_checkpoints', username=['historian'], stdout=out)
+        self.assertIn('Built checkpoints for 1 account(s)', out.getvalue())
+        self.assertTrue(BalanceCheckpoint.objects.filter(account=self.account).exists())
+        for day in days:
+            self.assertEqual(balance_as_of(self.account, day), self.replayed_balance(day))
+
+    def test_backdated_edit_invalidates_later_checkpoints(self):
+        """Test editing an old transaction drops stale checkpoints and the next build replaces them"""
+        day = timezone.localdate() - timedelta(days=90)
+        call_command('build_checkpoints', stdout=StringIO())
+        old = Transaction.objects.get(account=self.account, amount=Decimal('300.00'))
+        old.amount = Decimal('200.00')
+        old.save()
+
+        stale = BalanceCheckpoint.objects.filter(account=self.account, as_of__gte=timezone.localdate(old.date))
+        self.assertFalse(stale.exists())
+        self.assertEqual(balance_as_of(self.account, day), self.replayed_balance(day))
+
+        job = enqueue('build_checkpoints', self.user)
+        claim_jobs('test-worker', 1)
+        self.assertEqual(run_job(job.pk), 'succeeded')
+        self.assertTrue(stale.exists())
+        self.assertEqual(balance_as_of(self.account, day), self.replayed_balance(day))
+
+    def test_balance_history_action(self):
+        """Test the balance_history endpoint returns month-end points"""
+        response = self.client.get(f'/accounts/api/accounts/{self.account.id}/balance_history/')
+
+        self.assertEqual(response.status_code, 200)
+        points = response.data['balances']
+        self.assertEqual(points[-1]['date'], timezone.localdate())
+        self.assertEqual(points[-1]['balance'], Decimal('670.00'))
+        for point in points:
+            self.assertEqual(point['balance'], self.replayed_balance(point['date']))
+
+    def test_balance_history_only_reads(self):
+        """Test history without checkpoints is replayed in a fixed number of read queries"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/accounts/api/accounts/{self.account.id}/balance_history/', {
+                'start_date': (timezone.localdate() - timedelta(days=450)).isoformat()
+            })
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries))
+        self.assertLess(len(queries), 10)
+        self.assertFalse(BalanceCheckpoint.objects.exists())
+        for point in response.data['balances']:
+            self.assertEqual(point['balance'], self.replayed_balance(point['date']))
+
+class BudgetSpendRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='budgeter', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.fun = Category.objects.create(user=self.user, name='Fun')
+        self.today = timezone.localdate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def spend(self, amount, category, **kwargs):
+        return Transaction.objects.create(
+            user=self.user,
+            account=self.account,
+            category=category,
+            transaction_type='expense',
+            amount=Decimal(amount),
+            description='Test',
+            date=kwargs.pop('date', timezone.now()),
+            **kwargs
+        )
+
+    def budget(self, category, amount='100.00', start_offset=0):
+        return Budget.objects.create(
+            user=self.user,
+            category=category,
+            amount=Decimal(amount),
+            start_date=self.today - timedelta(days=10 + start_offset),
+            end_date=self.today + timedelta(days=10),
+        )
+
+    def test_rollup_tracks_save_edit_and_delete(self):
+        """Test spent_amount follows creates, recategorization and deletes"""
+        food_budget = self.budget(self.food)
+        fun_budget = self.budget(self.fun)
+        groceries = self.spend('40.00', self.food)
+        self.spend('15.50', self.food, date=timezone.now() - timedelta(days=30))
+        self.spend('10.00', self.fun)
+
+        self.assertEqual(Budget.objects.get(pk=food_budget.pk).spent_amount, Decimal('40.00'))
+
+        groceries.category = self.fun
+        groceries.save()
+        self.assertEqual(Budget.objects.get(pk=food_budget.pk).spent_amount, Decimal('0.00'))
+        self.assertEqual(Budget.objects.get(pk=fun_budget.pk).spent_amount, Decimal('50.00'))
+
+        groceries.delete()
+        self.assertEqual(Budget.objects.get(pk=fun_budget.pk).spent_amount, Decimal('10.00'))
+
+    def test_deleting_an_account_removes_its_spend(self):
+        """Test budgets and monthly summaries drop the transactions deleted with their account"""
+        food_budget = self.budget(self.food)
+        savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        self.spend('40.00', self.food)
+        Transaction.objects.create(
+            user=self.user, account=savings, category=self.food, transaction_type='expense',
+            amount=Decimal('25.00'), description='Test', date=timezone.now()
+        )
+        Transaction.objects.create(
+            user=self.user, account=self.account, to_account=savings, transaction_type='transfer',
+            amount=Decimal('100.00'), description='Test', date=timezone.now()
+        )
+        self.assertEqual(Budget.objects.get(pk=food_budget.pk).spent_amount, Decimal('65.00'))
+
+        savings.delete()
+        self.assertEqual(Budget.objects.get(pk=food_budget.pk).spent_amount, Decimal('40.00'))
+        summary = MonthlySummary.objects.get(account=self.account)
+        self.assertEqual((summary.transfer_total, summary.transfer_count), (Decimal('0.00'), 0))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('-40.00'))
+
+    def test_budget_list_query_count_is_constant(self):
+        """Test listing budgets does not issue queries per budget"""
+        self.spend('85.00', self.food)
+        self.budget(self.food)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get('/transactions/api/budgets/')
+        self.assertEqual(response.data['results'][0]['spent_amount'], '85.00')
+
+        for offset in range(1, 10):
+            self.budget(self.fun if offset % 2 else self.food, start_offset=offset)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get('/transactions/api/budgets/')
+        self.assertEqual(len(few), len(many))
+
+    def test_alerts_report_overspending(self):
+        """Test alerts flag budgets at or above 80 percent"""
+        self.budget(self.food)
+        self.spend('120.00', self.food)
+
+        response = self.client.get('/transactions/api/budgets/alerts/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['alert_type'], 'over_budget')
+        self.assertEqual(response.data[0]['spent_percentage'], 120.0)
+
+class MonthlySummaryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='summarizer', password='testpass123')
+        self.checking = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        start = timezone.make_aware(datetime(2024, 1, 1, 12))
+        for day in range(0, 200, 3):
+            kind = ['income', 'expense', 'transfer'][day % 3 if day % 9 else 0]
+            Transaction.objects.create(
+                user=self.user,
+                account=self.checking,
+                to_account=self.savings if kind == 'transfer' else None,
+                transaction_type=kind,
+                amount=Decimal(day + 1),
+                description='Test',
+                date=start + timedelta(days=day),
+            )
+
+    def direct_summary(self, start, end):
+        transactions = [
+            t for t in Transaction.objects.filter(user=self.user)
+            if start <= timezone.localdate(t.date) <= end
+        ]
+        income = sum((t.amount for t in transactions if t.transaction_type == 'income'), Decimal('0.00'))
+        expenses = sum((t.amount for t in transactions if t.transaction_type == 'expense'), Decimal('0.00'))
+        return income, expenses, len(transactions)
+
+    def test_summary_matches_direct_aggregation(self):
+        """Test summaries built from monthly rollups plus edges match a full scan"""
+        ranges = [('2024-01-01', '2024-06-30'), ('2024-01-15', '2024-05-03'), ('2024-02-10', '2024-02-20')]
+        for start, end in ranges:
+            response = self.client.get('/transactions/api/transactions/summary/', {
+                'start_date': start,
+                'end_date': end,
+            })
+            income, expenses, count = self.direct_summary(date.fromisoformat(start), date.fromisoformat(end))
+            self.assertEqual(Decimal(response.data['total_income']), income)
+            self.assertEqual(Decimal(response.data['total_expenses']), expenses)
+            self.assertEqual(response.data['transaction_count'], count)
+
+    def test_rebuild_command_reproduces_incremental_rollups(self):
+        """Test rebuild_rollups produces the same rows as incremental maintenance"""
+        fields = ['account_id', 'month', 'income_total', 'income_count', 'expense_total', 'expense_count',
+                  'transfer_total', 'transfer_count']
+        incremental = list(MonthlySummary.objects.filter(user=self.user).order_by('account_id', 'month').values_list(*fields))
+
+        call_command('rebuild_rollups', username=['summarizer'], stdout=StringIO())
+
+        rebuilt = list(MonthlySummary.objects.filter(user=self.user).order_by('account_id', 'month').values_list(*fields))
+        self.assertEqual(rebuilt, incremental)
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='scroller', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        same_time = timezone.now() - timedelta(days=1)
+        for index in range(45):
+            Transaction.objects.create(
+                user=self.user,
+                account=self.account,
+                transaction_type='expense',
+                amount=Decimal('1.00'),
+                description=f'Item {index}',
+                # Duplicate timestamps exercise the id tie-breaker
+                date=same_time if index % 3 == 0 else same_time - timedelta(hours=index),
+            )
+
+    def test_cursor_pages_cover_every_row_once(self):
+        """Test following next links visits every transaction exactly once in order"""
+        url = '/transactions/api/transactions/?pagination=cursor&page_size=10'
+        seen = []
+        query_counts = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            self.assertFalse([q for q in queries if 'COUNT(' in q['sql']])
+            query_counts.append(len(queries))
+            seen.extend((item['date'], item['id']) for item in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(len(set(seen)), 45)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_invalid_cursor_returns_404(self):
+        """Test a tampered cursor is rejected"""
+        response = self.client.get('/transactions/api/transactions/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination_remains_default(self):
+        """Test listings without the opt-in keep page-number pagination"""
+        response = self.client.get('/transactions/api/transactions/')
+        self.assertEqual(response.data['count'], 45)
+
+class TransactionFilterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='filterer', password='testpass123')
+        self.checking = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        self.cash = Account.objects.create(user=self.user, name='Cash', account_type='cash')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        rows = [
+            (self.checking, self.food, '12.00', datetime(2024, 3, 1, 0, 0)),
+            (self.checking, None, '250.00', datetime(2024, 3, 15, 12, 0)),
+            (self.savings, self.food, '40.00', datetime(2024, 3, 31, 23, 59)),
+            (self.cash, None, '5.00', datetime(2024, 4, 1, 0, 0)),
+        ]
+        for account, category, amount, when in rows:
+            Transaction.objects.create(
+                user=self.user,
+                account=account,
+                category=category,
+                transaction_type='expense',
+                amount=Decimal(amount),
+                description='Test',
+                date=timezone.make_aware(when),
+            )
+
+    def amounts(self, **params):
+        response = self.client.get('/transactions/api/transactions/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['amount'] for item in response.data['results']]
+
+    def test_date_range_is_half_open_and_index_friendly(self):
+        """Test end_date includes the whole day without casting the column"""
+        with CaptureQueriesContext(connection) as queries:
+            amounts = self.amounts(start_date='2024-03-01', end_date='2024-03-31')
+        self.assertEqual(amounts, ['40.00', '250.00', '12.00'])
+        self.assertFalse([q for q in queries if 'cast_date' in q['sql']])
+
+    def test_multi_value_amount_and_category_filters(self):
+        """Test __in, amount range and uncategorized filters combine"""
+        ids = f'{self.checking.id},{self.savings.id}'
+        self.assertEqual(self.amounts(account__in=ids, amount_min='20'), ['40.00', '250.00'])
+        self.assertEqual(self.amounts(uncategorized='true', amount_max='100'), ['5.00'])
+        self.assertEqual(self.amounts(category__in=str(self.food.id), ordering='amount'), ['12.00', '40.00'])
+
+    def test_invalid_filters_return_400(self):
+        """Test malformed filter values are reported instead of crashing"""
+        response = self.client.get('/transactions/api/transactions/', {
+            'start_date': '03/01/2024',
+            'amount_min': 'lots',
+            'ordering': 'description',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'start_date', 'amount_min', 'ordering'})
+
+    def test_last_representable_date(self):
+        """Test 9999-12-31 is an open end for filters and a 400 for period endpoints"""
+        self.assertEqual(self.amounts(end_date='9999-12-31'), ['5.00', '40.00', '250.00', '12.00'])
+        for url in ('/transactions/api/transactions/summary/', '/transactions/api/transactions/by_category/'):
+            response = self.client.get(url, {'start_date': '2024-03-01', 'end_date': '9999-12-31'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('date', response.data)
+        response = self.client.get(f'/accounts/api/accounts/{self.checking.id}/balance_history/', {
+            'end_date': '9999-12-31'
+        })
+        self.assertEqual(response.status_code, 400)
+
+class TransactionSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.checking = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.card = Account.objects.create(user=self.user, name='Card', account_type='credit')
+        other_account = Account.objects.create(user=self.other, name='Checking', account_type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for account, description in [
+            (self.checking, 'Amazon Marketplace order'),
+            (self.card, 'AMAZON prime amazon video'),
+            (self.checking, 'Corner grocery'),
+            (other_account, 'Amazon gift card'),
+        ]:
+            Transaction.objects.create(
+                user=account.user,
+                account=account,
+                transaction_type='expense',
+                amount=Decimal('10.00'),
+                description=description,
+                date=timezone.now(),
+            )
+
+    def search(self, **params):
+        response = self.client.get('/transactions/api/transactions/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['description'] for item in response.data['results']]
+
+    def test_ranked_results_scoped_to_user(self):
+        """Test matches are ranked and never leak other users' rows"""
+        self.assertEqual(self.search(q='amazon'), ['AMAZON prime amazon video', 'Amazon Marketplace order'])
+        self.assertEqual(self.search(q='groc'), ['Corner grocery'])
+
+    def test_composes_with_filters(self):
+        """Test search respects the regular transaction filters"""
+        self.assertEqual(self.search(q='amazon', account=self.checking.id), ['Amazon Marketplace order'])
+
+    def test_explicit_ordering_replaces_rank(self):
+        """Test ?ordering= applies to the matches instead of being ignored"""
+        Transaction.objects.filter(description='Amazon Marketplace order').update(amount=Decimal('1.00'))
+        cheapest_first = ['Amazon Marketplace order', 'AMAZON prime amazon video']
+        self.assertEqual(self.search(q='amazon', ordering='amount'), cheapest_first)
+        self.assertEqual(self.search(q='amazon', ordering='-amount'), cheapest_first[::-1])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Test the text index is kept in sync on save and delete"""
+        grocery = Transaction.objects.get(description='Corner grocery')
+        grocery.description = 'Farmers market'
+        grocery.save()
+        self.assertEqual(self.search(q='grocery'), [])
+        self.assertEqual(self.search(q='farmers'), ['Farmers market'])
+
+        grocery.delete()
+        self.assertEqual(self.search(q='farmers'), [])
+
+    def test_query_syntax_is_neutralised(self):
+        """Test search operators in user input don't cause errors"""
+        self.assertEqual(self.search(q='amazon" (*'), ['AMAZON prime amazon video', 'Amazon Marketplace order'])
+        response = self.client.get('/transactions/api/transactions/search/')
+        self.assertEqual(response.status_code, 400)
+
+class ByCategoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='grouper', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.categories = [Category.objects.create(user=self.user, name=name) for name in ('Food', 'Rent', 'Fun')]
+
+    def add_transactions(self, count):
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user,
+                account=self.account,
+                category=self.categories[index % 3],
+                transaction_type='expense',
+                amount=Decimal(index % 3 + 1),
+                description=f'Item {index}',
+                date=timezone.now() - timedelta(minutes=index),
+            )
+            for index in range(count)
+        ])
+        # bulk_create bypasses the ledger, so invalidate cached responses by hand
+        UserDataVersion.bump([self.user.id])
+
+    def test_totals_use_constant_queries(self):
+        """Test totals come from one grouped query regardless of row count"""
+        self.add_transactions(9)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get('/transactions/api/transactions/by_category/')
+        self.add_transactions(300)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/transactions/api/transactions/by_category/')
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual([row['category']['name'] for row in response.data], ['Fun', 'Rent', 'Food'])
+        fun = response.data[0]
+        self.assertEqual(fun['transaction_count'], 103)
+        self.assertEqual(fun['total_amount'], 309.0)
+        self.assertNotIn('transactions', fun)
+
+    def test_include_transactions_is_capped_per_category(self):
+        """Test ?include=transactions returns only the newest N rows per category"""
+        self.add_transactions(30)
+        response = self.client.get('/transactions/api/transactions/by_category/', {
+            'include': 'transactions',
+            'per_category': 4,
+        })
+
+        for row in response.data:
+            self.assertEqual(row['transaction_count'], 10)
+            self.assertEqual(len(row['transactions']), 4)
+            dates = [item['date'] for item in row['transactions']]
+            self.assertEqual(dates, sorted(dates, reverse=True))
+
+class SparseFieldsetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sparse', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.category = Category.objects.create(user=self.user, name='Food')
+        self.transaction = Transaction.objects.create(
+            user=self.user,
+            account=self.account,
+            category=self.category,
+            transaction_type='expense',
+            amount=Decimal('12.50'),
+            description='Lunch',
+            date=timezone.now(),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def list_sql(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/transactions/api/transactions/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], [query['sql'] for query in queries if 'transactions_transaction' in query['sql']][-1]
+
+    def test_related_objects_are_flat_by_default(self):
+        """Test related objects are returned as ids without joins"""
+        results, sql = self.list_sql({})
+        self.assertEqual(results[0]['account'], self.account.id)
+        self.assertEqual(results[0]['category'], self.category.id)
+        self.assertEqual(results[0]['user'], self.user.id)
+        self.assertNotIn('JOIN', sql)
+
+    def test_expand_nests_and_joins(self):
+        """Test ?expand= nests the named relations and loads them in the same query"""
+        results, sql = self.list_sql({'expand': 'account,category'})
+        self.assertEqual(results[0]['account']['name'], 'Checking')
+        self.assertEqual(results[0]['category']['name'], 'Food')
+        self.assertEqual(results[0]['to_account'], None)
+        self.assertIn('accounts_account', sql)
+        self.assertIn('transactions_category', sql)
+
+    def test_fields_trim_response_and_columns(self):
+        """Test ?fields= limits both the payload and the selected columns"""
+        results, sql = self.list_sql({'fields': 'id,amount,category', 'expand': 'category'})
+        self.assertEqual(set(results[0]), {'id', 'amount', 'category'})
+        self.assertEqual(results[0]['category']['name'], 'Food')
+        self.assertIn('"transactions_category"."name"', sql)
+        self.assertNotIn('"transactions_transaction"."description"', sql)
+
+    def test_fields_do_not_affect_writes(self):
+        """Test write requests still accept and return the full representation"""
+        response = self.client.post('/transactions/api/transactions/?fields=id', {
+            'account_id': self.account.id,
+            'transaction_type': 'income',
+            'amount': '5.00',
+            'description': 'Refund',
+            'date': timezone.now().isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['description'], 'Refund')
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='cached', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_income(self, amount):
+        return Transaction.objects.create(
+            user=self.user,
+            account=self.account,
+            transaction_type='income',
+            amount=Decimal(amount),
+            description='Pay',
+            date=timezone.now(),
+        )
+
+    def test_repeat_request_is_served_from_cache(self):
+        """Test an unchanged summary is returned without recomputing it"""
+        self.add_income('10.00')
+        first = self.client.get('/transactions/api/transactions/summary/')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/transactions/api/transactions/summary/')
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('accounts_userdataversion', queries[0]['sql'])
+
+    def test_writes_invalidate_cached_responses(self):
+        """Test transaction, category and account writes all bump the version"""
+        self.client.get('/transactions/api/transactions/summary/')
+        self.add_income('10.00')
+        response = self.client.get('/transactions/api/transactions/summary/')
+        self.assertEqual(response.data['total_income'], '10.00')
+
+        self.client.get('/transactions/api/categories/popular/')
+        Category.objects.create(user=self.user, name='Food')
+        response = self.client.get('/transactions/api/categories/popular/')
+        self.assertEqual([row['name'] for row in response.data], ['Food'])
+
+        self.client.get('/accounts/api/accounts/summary/')
+        Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        response = self.client.get('/accounts/api/accounts/summary/')
+        self.assertEqual(response.data['total_accounts'], 2)
+
+    def test_keys_are_per_user_and_params(self):
+        """Test other users and other query parameters never share an entry"""
+        self.add_income('10.00')
+        self.client.get('/transactions/api/transactions/summary/')
+        response = self.client.get('/transactions/api/transactions/summary/', {'start_date': '2000-01-01', 'end_date': '2000-01-31'})
+        self.assertEqual(response.data['total_income'], '0.00')
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(other)
+        response = self.client.get('/transactions/api/transactions/summary/')
+        self.assertEqual(response.data['total_income'], '0.00')
+
+    def test_stats_count_hits_and_misses(self):
+        """Test the staff stats endpoint reports hit and miss counters"""
+        for _ in range(3):
+            self.client.get('/transactions/api/budgets/current/')
+        self.assertEqual(self.client.get('/api/cache-stats/').status_code, 403)
+
+        self.client.force_authenticate(User.objects.create_user(username='staff', password='testpass123', is_staff=True))
+        stats = self.client.get('/api/cache-stats/').data
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mobile', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_matching_etag_returns_304_without_list_query(self):
+        """Test If-None-Match short-circuits before the list query and serializers"""
+        response = self.client.get('/transactions/api/transactions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/transactions/api/transactions/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('accounts_userdataversion', queries[0]['sql'])
+
+    def test_writes_change_the_etag(self):
+        """Test every write path gives list and detail endpoints a new ETag"""
+        url = f'/accounts/api/accounts/{self.account.id}/'
+        etag = self.client.get(url)['ETag']
+        Transaction.objects.create(
+            user=self.user,
+            account=self.account,
+            transaction_type='income',
+            amount=Decimal('10.00'),
+            description='Pay',
+            date=timezone.now(),
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balance'], '10.00')
+
+        etag = self.client.get('/transactions/api/budgets/')['ETag']
+        Category.objects.create(user=self.user, name='Food')
+        self.assertEqual(self.client.get('/transactions/api/budgets/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_query_and_user(self):
+        """Test different representations never share an ETag"""
+        etag = self.client.get('/transactions/api/categories/')['ETag']
+        self.assertNotEqual(self.client.get('/transactions/api/categories/', {'fields': 'id'})['ETag'], etag)
+
+        self.client.force_authenticate(User.objects.create_user(username='other', password='testpass123'))
+        self.assertEqual(self.client.get('/transactions/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_user_edits_change_expanded_etag(self):
+        """Test an edit to the user row is not answered with 304 when the user is expanded"""
+        url = f'/accounts/api/accounts/{self.account.id}/'
+        etag = self.client.get(url, {'expand': 'user'})['ETag']
+        self.user.email = 'mobile@example.com'
+        self.user.save()
+
+        response = self.client.get(url, {'expand': 'user'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['email'], 'mobile@example.com')
+
+class TransactionExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user,
+                account=self.account,
+                category=self.food if index % 2 else None,
+                transaction_type='expense' if index % 2 else 'income',
+                amount=Decimal(index + 1),
+                description=f'Row {index}, "quoted"',
+                date=timezone.now() - timedelta(days=index),
+            )
+            for index in range(1200)
+        ])
+
+    def test_csv_export_streams_every_row(self):
+        """Test CSV export contains a header and all rows, newest first"""
+        response = self.client.get('/transactions/api/transactions/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'date', 'type', 'amount', 'account', 'to_account', 'category', 'description'])
+        self.assertEqual(len(rows), 1201)
+        self.assertEqual(rows[1][2:], ['income', '1.00', 'Checking', '', '', 'Row 0, "quoted"'])
+
+    def test_ndjson_export_honours_filters(self):
+        """Test NDJSON export applies the listing filters with a single query"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/transactions/api/transactions/export/', {
+                'output': 'ndjson',
+                'category': self.food.id,
+                'amount_max': '10',
+            })
+            lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['amount'] for record in records], ['2.00', '4.00', '6.00', '8.00', '10.00'])
+        self.assertEqual(records[0]['category'], 'Food')
+        self.assertEqual(len([query for query in queries if 'transactions_transaction' in query['sql']]), 1)
+
+    def test_invalid_output_is_rejected(self):
+        """Test unknown output formats and bad filters return 400 before streaming"""
+        self.assertEqual(self.client.get('/transactions/api/transactions/export/', {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/transactions/api/transactions/export/', {'start_date': 'nope'}).status_code, 400)
+
+class SpendingAnalyticsTest(TestCase):
+    def setUp(self):
+        clear_analytics_cache()
+        self.user = User.objects.create_user(username='analyst', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.add('expense', '100.00', datetime(2024, 2, 15, 12))
+        self.add('income', '500.00', datetime(2024, 3, 1, 12))
+        for day, amount in ((10, '10.00'), (10, '20.00'), (12, '30.00')):
+            self.add('expense', amount, datetime(2024, 3, day, 12), self.food)
+
+    def add(self, transaction_type, amount, when, category=None):
+        return Transaction.objects.create(
+            user=self.user,
+            account=self.account,
+            category=category,
+            transaction_type=transaction_type,
+            amount=Decimal(amount),
+            description='Row',
+            date=timezone.make_aware(when),
+        )
+
+    def get(self):
+        return self.client.get('/transactions/api/transactions/analytics/', {
+            'start_date': '2024-03-01',
+            'end_date': '2024-03-31',
+        })
+
+    def test_metrics(self):
+        """Test daily series, rolling averages, percentiles and month-over-month deltas"""
+        data = self.get().data
+        daily = {str(row['date']): row for row in data['daily']}
+        self.assertEqual(len(daily), 31)
+        self.assertEqual(daily['2024-03-10']['spend'], 30.0)
+        self.assertEqual(daily['2024-03-12']['rolling_7'], 8.57)
+        self.assertEqual(daily['2024-03-12']['rolling_30'], 5.33)
+
+        self.assertEqual(data['categories'], [
+            {'category_id': self.food.id, 'transaction_count': 3, 'total': 60.0, 'p50': 20.0, 'p90': 28.0},
+        ])
+        self.assertEqual(data['monthly'], [{
+            'month': '2024-03',
+            'income': 500.0,
+            'expenses': 60.0,
+            'expenses_change': -40.0,
+            'expenses_change_pct': -40.0,
+        }])
+
+    def test_arrays_are_cached_per_data_version(self):
+        """Test repeat requests skip the transaction query until data changes"""
+        self.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.get()
+        self.assertFalse([query for query in queries if 'transactions_transaction' in query['sql']])
+
+        self.add('expense', '40.00', datetime(2024, 3, 20, 12), self.food)
+        data = self.get().data
+        self.assertEqual(data['categories'][0]['transaction_count'], 4)
+
+    def test_invalid_period(self):
+        """Test reversed or overlong periods return 400"""
+        response = self.client.get('/transactions/api/transactions/analytics/', {
+            'start_date': '2024-03-31',
+            'end_date': '2024-03-01',
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/transactions/api/transactions/analytics/', {
+            'start_date': '2000-01-01',
+            'end_date': '2024-03-01',
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty_history(self):
+        """Test a user without transactions gets zeroed series"""
+        self.client.force_authenticate(User.objects.create_user(username='newcomer', password='testpass123'))
+        data = self.get().data
+        self.assertEqual(data['categories'], [])
+        self.assertEqual(sum(row['spend'] for row in data['daily']), 0)
+
+class CashFlowForecastTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='forecaster', password='testpass123')
+        self.checking = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.cash = Account.objects.create(user=self.user, name='Cash', account_type='cash', balance=Decimal('200.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.localdate()
+        for days_ago in (90, 60, 30):
+            self.add(self.checking, 'income', '3000.00', f'ACME PAYROLL {days_ago:04d}', days_ago)
+            self.add(self.checking, 'expense', '1000.00', 'Rent', days_ago)
+        for days_ago in (100, 97, 50, 10, 2):
+            self.add(self.checking, 'expense', '4.00', 'Coffee', days_ago)
+        for days_ago in (21, 14, 7):
+            self.add(self.cash, 'expense', '50.00', 'Gym', days_ago)
+
+    def add(self, account, transaction_type, amount, description, days_ago):
+        return Transaction.objects.create(
+            user=self.user,
+            account=account,
+            transaction_type=transaction_type,
+            amount=Decimal(amount),
+            description=description,
+            date=day_start(self.today - timedelta(days=days_ago)) + timedelta(hours=12),
+        )
+
+    def test_projection_combines_recurring_and_averages(self):
+        """Test recurring series follow their cadence and the rest is averaged daily"""
+        update_series(self.user.pk)
+        checking, cash = forecast_accounts(self.user, 90, today=self.today)
+
+        self.assertEqual(checking['balance'], 5980.0)
+        self.assertEqual(
+            sorted((item['description'], item['cadence']) for item in checking['recurring']),
+            [('acme payroll', 'monthly'), ('rent', 'monthly')]
+        )
+        # Two more pay days and rent payments fall within 90 days; coffee is averaged over 101 days
+        self.assertEqual(checking['daily_average'], round(-20 / 101, 2))
+        self.assertAlmostEqual(checking['projected_balance'], 5980 + 4000 - 90 * 20 / 101, places=2)
+        self.assertIsNone(checking['first_negative_date'])
+        self.assertEqual(len(checking['daily']), 90)
+
+        self.assertEqual(cash['first_negative_date'], self.today + timedelta(days=14))
+
+    def test_endpoint(self):
+        """Test the forecast endpoint returns every account and validates the horizon"""
+        response = self.client.get('/accounts/api/accounts/forecast/', {'days': 365})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data['accounts']], ['Checking', 'Cash'])
+        self.assertEqual(len(response.data['accounts'][0]['daily']), 365)
+        self.assertEqual(self.client.get('/accounts/api/accounts/forecast/', {'days': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/accounts/api/accounts/forecast/', {'days': 'x'}).status_code, 400)
+
+    def test_detection_refreshes_cached_forecast(self):
+        """Test a cached forecast is recomputed once detection stores new series"""
+        caches['responses'].clear()
+        before = self.client.get('/accounts/api/accounts/forecast/', {'days': 90}).data['accounts'][0]
+        self.assertEqual(before['recurring'], [])
+
+        update_series(self.user.pk)
+        after = self.client.get('/accounts/api/accounts/forecast/', {'days': 90}).data['accounts'][0]
+        self.assertEqual(len(after['recurring']), 2)
+        self.assertNotEqual(after['projected_balance'], before['projected_balance'])
+
+class RecurringDetectionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='subscriber', password='testpass123')
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.localdate()
+
+    def add(self, description, amount, days_ago, transaction_type='expense'):
+        return Transaction.objects.create(
+            user=self.user,
+            account=self.account,
+            transaction_type=transaction_type,
+            amount=Decimal(amount),
+            description=description,
+            date=day_start(self.today - timedelta(days=days_ago)) + timedelta(hours=12),
+        )
+
+    def test_runs_only_process_new_transactions(self):
+        """Test each run reads transactions past the watermark and updates their series"""
+        for days_ago in (91, 63, 35):
+            self.add(f'NETFLIX.COM #{days_ago}', '15.99', days_ago)
+        self.add('Hardware store', '80.00', 20)
+
+        self.assertEqual(update_series(self.user.id), {'transactions': 4, 'series': 2})
+        series = RecurringSeries.objects.get(user=self.user, description='netflix com')
+        self.assertEqual((series.cadence, series.amount, series.occurrences), ('monthly', Decimal('15.99'), 3))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(update_series(self.user.id), {'transactions': 0, 'series': 0})
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(all(sql.startswith('SELECT') for sql in statements))
+
+        self.add('NETFLIX.COM #7', '17.99', 7)
+        self.assertEqual(update_series(self.user.id), {'transactions': 1, 'series': 1})
+        series.refresh_from_db()
+        self.assertEqual((series.cadence, series.occurrences), ('monthly', 4))
+        self.assertEqual(series.last_date, self.today - timedelta(days=7))
+
+    def test_edits_and_deletes_trigger_a_rebuild(self):
+        """Test changing a processed transaction drops the watermark and the next run starts over"""
+        gym = [self.add('Gym', '40.00', days_ago) for days_ago in (70, 42, 14)]
+        update_series(self.user.id)
+        self.assertEqual(RecurringSeries.objects.get(user=self.user).cadence, 'monthly')
+
+        gym[0].category = Category.objects.create(user=self.user, name='Health')
+        gym[0].save()
+        self.assertTrue(RecurringDetectionState.objects.filter(user=self.user).exists())
+
+        gym[1].delete()
+        self.assertFalse(RecurringDetectionState.objects.filter(user=self.user).exists())
+        self.assertEqual(update_series(self.user.id), {'transactions': 2, 'series': 1})
+        series = RecurringSeries.objects.get(user=self.user)
+        self.assertEqual((series.cadence, series.occurrences), (None, 2))
+
+    def test_endpoint_only_reads(self):
+        """Test listing series neither runs detection nor writes"""
+        for days_ago in (90, 60, 30):
+            self.add('Salary', '3000.00', days_ago, 'income')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/transactions/api/transactions/recurring/')
+        self.assertEqual(response.data, [])
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries))
+
+    def test_command_and_endpoint(self):
+        """Test the command processes users and the endpoint lists detected series"""
+        for days_ago in (90, 60, 30):
+            self.add('Salary', '3000.00', days_ago, 'income')
+        self.add('Gift', '50.00', 10)
+
+        out = StringIO()
+        call_command('detect_recurring', workers=1, stdout=out)
+        self.assertIn('Processed 4 new transaction(s) for 1 user(s)', out.getvalue())
+        call_command('detect_recurring', workers=1, full=True, stdout=out)
+        self.assertEqual(RecurringSeries.objects.filter(user=self.user).count(), 2)
+
+        response = self.client.get('/transactions/api/transactions/recurring/')
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['description'], 'salary')
+        self.assertEqual(response.data[0]['cadence'], 'monthly')
+        self.assertTrue(response.data[0]['is_active'])
+
+class ParallelRecurringDetectionTest(TransactionTestCase):
+    def test_workers_process_users_in_parallel(self):
+        """Test worker processes each handle their own users"""
+        today = timezone.localdate()
+        for index in range(3):
+            user = User.objects.create_user(username=f'parallel{index}', password='testpass123')
+            account = Account.objects.create(user=user, name='Checking', account_type='checking')
+            for days_ago in (90, 60, 30):
+                Transaction.objects.create(
+                    user=user,
+                    account=account,
+                    transaction_type='income',
+                    amount=Decimal('1000.00'),
+                    description='Salary',
+                    date=day_start(today - timedelta(days=days_ago)) + timedelta(hours=12),
+                )
+
+        out = StringIO()
+        call_command('detect_recurring', workers=3, stdout=out)
+        self.assertIn('Processed 9 new transaction(s) for 3 user(s)', out.getvalue())
+        self.assertEqual(RecurringSeries.objects.filter(cadence='monthly').count(), 3)
+
+class CurrencyConversionTest(TestCase):
+    def setUp(self):
+        versioned_rate.cache_clear()
+        self.user = User.objects.create_user(username='traveller', password='testpass123')
+        UserProfile.objects.create(user=self.user, default_currency='EUR')
+        self.checking = Account.objects.create(
+            user=self.user, name='Checking', account_type='checking', currency='USD'
+        )
+        self.pounds = Account.objects.create(
+            user=self.user, name='Pounds', account_type='checking', currency='GBP'
+        )
+        ExchangeRate.objects.bulk_create([
+            ExchangeRate(currency='EUR', date=date(2024, 1, 1), rate=Decimal('0.9')),
+            ExchangeRate(currency='GBP', date=date(2024, 1, 1), rate=Decimal('0.8')),
+            ExchangeRate(currency='EUR', date=date(2024, 2, 1), rate=Decimal('0.5')),
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_income(self, account, amount, day):
+        Transaction.objects.create(
+            user=self.user,
+            account=account,
+            transaction_type='income',
+            amount=Decimal(amount),
+            description='Income',
+            date=timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12),
+        )
+
+    def test_summary_converts_each_month_at_its_rate(self):
+        """Test transaction totals are converted per currency and month into the default currency"""
+        for day in range(1, 29):
+            self.add_income(self.checking, '10.00', date(2024, 1, day))
+            self.add_income(self.pounds, '10.00', date(2024, 2, day))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/transactions/api/transactions/summary/', {
+                'start_date': '2024-01-01',
+                'end_date': '2024-02-29',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['currency'], 'EUR')
+        # 280 USD at 0.9 in January, 280 GBP at 0.5 / 0.8 in February
+        self.assertEqual(Decimal(response.data['total_income']), Decimal('252.00') + Decimal('175.00'))
+        self.assertEqual(response.data['transaction_count'], 56)
+        # The rates version, then EUR and GBP in January and EUR in February
+        rate_queries = [query for query in queries.captured_queries if 'exchangerate' in query['sql']]
+        self.assertEqual(len(rate_queries), 4)
+
+    def test_account_summary_converts_balances(self):
+        """Test account balances are totalled in the default currency"""
+        self.add_income(self.checking, '100.00', date(2024, 1, 10))
+        self.add_income(self.pounds, '80.00', date(2024, 1, 10))
+
+        response = self.client.get('/accounts/api/accounts/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['currency'], 'EUR')
+        self.assertEqual(response.data['total_balance'], Decimal('100.00'))
+        self.assertEqual(response.data['account_types']['checking']['count'], 2)
+
+    def test_missing_rate_returns_error(self):
+        """Test a currency without a loaded rate is reported instead of summed unconverted"""
+        yen = Account.objects.create(user=self.user, name='Yen', account_type='cash', currency='JPY')
+        self.add_income(yen, '1000.00', date(2024, 1, 10))
+
+        response = self.client.get('/transactions/api/transactions/summary/', {
+            'start_date': '2024-01-01',
+            'end_date': '2024-01-31',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JPY', response.data['error'])
+
+    def test_load_fx_rates_upserts_and_versions_lookups(self):
+        """Test the loader updates existing rates and memoised lookups in any process see them"""
+        self.assertEqual(rate_on('EUR', date(2024, 2, 10)), Decimal('0.5'))
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write('date,currency,rate\n2024-02-01,EUR,0.75\n2024-02-01,jpy,150\n')
+        self.addCleanup(os.remove, handle.name)
+        version = UserDataVersion.current(self.user.pk)
+        idle = User.objects.create_user(username='idle', password='testpass123')
+
+        out = StringIO()
+        call_command('load_fx_rates', handle.name, stdout=out)
+        self.assertIn('Loaded 2 rate(s) for 2 currency(ies): EUR, JPY', out.getvalue())
+        self.assertEqual(rate_on('EUR', date(2024, 2, 10)), Decimal('0.75'))
+        self.assertEqual(ExchangeRate.objects.filter(currency='EUR').count(), 2)
+        self.assertGreater(UserDataVersion.current(self.user.pk), version)
+        self.assertEqual(UserDataVersion.current(idle.pk), 1)
+
+class AsyncSummaryTest(TransactionTestCase):
+    # Concurrent aggregates run on their own connections, which only see committed data
+    def setUp(self):
+        self.user = User.objects.create_user(username='asyncuser', password='testpass123')
+        self.checking = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        today = timezone.localdate()
+        start = timezone.make_aware(datetime(today.year, today.month, 1, 12)) - timedelta(days=60)
+        for day in range(0, 60 + today.day, 2):
+            kind = ['income', 'expense', 'transfer'][day % 3]
+            Transaction.objects.create(
+                user=self.user,
+                account=self.checking,
+                to_account=self.savings if kind == 'transfer' else None,
+                category=self.food if kind == 'expense' else None,
+                transaction_type=kind,
+                amount=Decimal(day + 1),
+                description='Test',
+                date=start + timedelta(days=day),
+            )
+        Budget.objects.create(
+            user=self.user, category=self.food, amount=Decimal('10.00'),
+            start_date=today.replace(day=1), end_date=today + timedelta(days=30)
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    async def async_get(self, path, params=None):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        return await client.get(path, params or {})
+
+    def test_summaries_match_sync_endpoints(self):
+        """Test the async summaries return the same data as their synchronous counterparts"""
+        params = {'start_date': (timezone.localdate() - timedelta(days=45)).isoformat()}
+        for sync_path, async_path, query in [
+            ('/accounts/api/accounts/summary/', '/accounts/api/accounts/summary/async/', {}),
+            ('/transactions/api/transactions/summary/', '/transactions/api/transactions/summary/async/', params),
+            ('/transactions/api/transactions/summary/', '/transactions/api/transactions/summary/async/',
+             dict(params, type='expense')),
+        ]:
+            expected = json.loads(self.api.get(sync_path, query).content)
+            response = async_to_sync(self.async_get)(async_path, query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected)
+
+    def test_budget_status(self):
+        """Test budget status reports spend and alerts for current budgets"""
+        response = async_to_sync(self.async_get)('/transactions/api/budgets/status/async/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['currency'], 'USD')
+        self.assertIsNone(data['monthly_budget'])
+        self.assertEqual(len(data['budgets']), 1)
+        self.assertEqual(data['budgets'][0]['alert_type'], 'over_budget')
+        self.assertEqual(Decimal(data['budgets'][0]['budget']['spent_amount']), Decimal(data['month_expenses']))
+
+    def test_requires_authentication_and_valid_dates(self):
+        """Test anonymous requests are rejected and bad parameters answer 400"""
+        response = async_to_sync(AsyncClient().get)('/transactions/api/budgets/status/async/')
+        self.assertEqual(response.status_code, 403)
+        response = async_to_sync(self.async_get)('/transactions/api/transactions/summary/async/', {'end_date': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date', response.json())
+
+class ReconcileBalancesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reconciler', password='testpass123')
+        self.checking = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        self.other = User.objects.create_user(username='bystander', password='testpass123')
+        self.untouched = Account.objects.create(user=self.other, name='Checking', account_type='checking')
+        start = timezone.make_aware(datetime(2024, 1, 1, 12))
+        for day, kind, amount in [(0, 'income', '1000.00'), (1, 'expense', '200.00'), (2, 'transfer', '300.00'),
+                                  (40, 'expense', '50.00'), (41, 'income', '75.00')]:
+            Transaction.objects.create(
+                user=self.user,
+                account=self.checking,
+                to_account=self.savings if kind == 'transfer' else None,
+                transaction_type=kind,
+                amount=Decimal(amount),
+                description='Test',
+                date=start + timedelta(days=day),
+            )
+        Transaction.objects.create(
+            user=self.other, account=self.untouched, transaction_type='income',
+            amount=Decimal('10.00'), description='Test', date=start
+        )
+
+    def test_no_drift_when_writes_go_through_the_ledger(self):
+        """Test balances maintained by transaction writes reconcile cleanly"""
+        out = StringIO()
+        call_command('reconcile_balances', workers=1, stdout=out)
+        self.assertIn('Checked 3 account(s), 0 with drift', out.getvalue())
+
+    def test_reports_and_fixes_drift_from_bulk_deletes(self):
+        """Test a queryset delete that skips the ledger is detected and repaired"""
+        call_command('build_checkpoints', username=['reconciler'], stdout=StringIO())
+        self.assertTrue(BalanceCheckpoint.objects.filter(account=self.checking).exists())
+        Transaction.objects.filter(user=self.user, transaction_type='transfer').delete()
+        version = UserDataVersion.current(self.user.pk)
+
+        out = StringIO()
+        call_command('reconcile_balances', workers=1, batch_size=1, stdout=out)
+        self.assertIn('Account %d (user %d): stored 525.00, actual 825.00' % (self.checking.pk, self.user.pk),
+                      out.getvalue())
+        self.assertIn('Checked 3 account(s), 2 with drift', out.getvalue())
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('525.00'))
+
+        call_command('reconcile_balances', username=['reconciler'], fix=True, workers=1, stdout=out)
+        self.assertIn('2 with drift, fixed 2', out.getvalue())
+        self.checking.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual((self.checking.balance, self.savings.balance), (Decimal('825.00'), Decimal('0.00')))
+        self.assertFalse(BalanceCheckpoint.objects.filter(account=self.checking).exists())
+        self.assertGreater(UserDataVersion.current(self.user.pk), version)
+        self.assertEqual(balance_as_of(self.checking, date(2024, 1, 31)), Decimal('800.00'))
+
+    def test_totals_come_from_one_query(self):
+        """Test every account's components are computed with a single grouped aggregate"""
+        with CaptureQueriesContext(connection) as queries:
+            totals = component_totals(Transaction.objects.all())
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(totals[self.savings.pk]['transfer_in'], Decimal('300.00'))
+        self.assertEqual(totals[self.checking.pk]['transfer_out'], Decimal('300.00'))
+
+class GenerateLoadDataTest(TestCase):
+    def test_generates_consistent_histories(self):
+        """Test generated users get the requested history with reconciled balances and rollups"""
+        out = StringIO()
+        call_command('generate_load_data', users=2, accounts_per_user=3, years=1, tx_per_month=20,
+                     workers=1, stdout=out)
+        # Eleven full months and the current one up to today
+        self.assertIn(f'Created 2 user(s), 6 account(s) and {Transaction.objects.count()} transaction(s)',
+                      out.getvalue())
+        self.assertGreater(Transaction.objects.filter(user__username='loaduser1').count(), 220)
+        tomorrow = day_start(timezone.localdate() + timedelta(days=1))
+        self.assertFalse(Transaction.objects.filter(date__gte=tomorrow).exists())
+        self.assertTrue(Transaction.objects.filter(transaction_type='transfer', to_account__isnull=False).exists())
+        self.assertFalse(Transaction.objects.filter(amount__lte=0).exists())
+
+        _, drift = find_drift(Account.objects.all(), Transaction.objects.all())
+        self.assertEqual(drift, [])
+        self.assertNotEqual(Account.objects.get(user__username='loaduser1', account_type='checking').balance,
+                            Decimal('0.00'))
+        self.assertEqual(MonthlySummary.objects.filter(user__username='loaduser2').values('month').distinct().count(),
+                         12)
+
+        with self.assertRaises(CommandError):
+            call_command('generate_load_data', users=1, workers=1, stdout=StringIO())
+
+    def test_same_seed_gives_same_history(self):
+        """Test a user's history depends only on the seed and its number, not on how users are batched"""
+        today = date(2024, 6, 15)
+
+        def history(username):
+            return list(Transaction.objects.filter(user__username=username).order_by('date', 'id').values_list(
+                'transaction_type', 'amount', 'description', 'category__name', 'date'
+            ))
+
+        generate_users([1, 2], 'first', 7, 2, 1, 15, today=today)
+        generate_users([2], 'second', 7, 2, 1, 15, today=today)
+        generate_users([2], 'reseeded', 8, 2, 1, 15, today=today)
+        self.assertEqual(history('first2'), history('second2'))
+        self.assertNotEqual(history('first2'), history('reseeded2'))
+        self.assertFalse(Transaction.objects.filter(date__gt=timezone.make_aware(datetime(2024, 6, 16))).exists())
+        # Fifteen of June's 28 days: salary, rent, the savings transfer and 15/28 of the 12 purchases
+        june = Transaction.objects.filter(user__username='first1', date__gte=timezone.make_aware(datetime(2024, 6, 1)))
+        self.assertEqual(june.count(), 3 + 6)
+        self.assertLess(june.filter(date__gte=timezone.make_aware(datetime(2024, 6, 15))).count(), 4)
+
+class ApiBenchmarkTest(TransactionTestCase):
+    # Async endpoints aggregate on worker threads, which only see committed data
+    def test_benchmarks_every_endpoint_and_detects_regressions(self):
+        """Test every viewset action is measured successfully and worse runs are flagged"""
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            report = run_benchmarks(['1k'], repeat=2)
+        size = report['sizes']['1k']
+        self.assertGreaterEqual(size['transactions'], 1000)
+        self.assertEqual(failures(report), [])
+        self.assertEqual(viewset_actions() - set(size['endpoints']), set())
+        self.assertGreater(size['endpoints']['transaction.list']['queries'], 0)
+        self.assertEqual(regressions(report, report), [])
+
+        slower = json.loads(json.dumps(report))
+        result = slower['sizes']['1k']['endpoints']['transaction.list']
+        result['queries'] += 10
+        result['p50_ms'] = result['p50_ms'] * 10 + 100
+        found = regressions(slower, report)
+        self.assertEqual(len(found), 1)
+        self.assertIn('queries', found[0])
+        # Timings only count when asked for
+        self.assertEqual(len(regressions(slower, report, tolerance=3.0)), 2)
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        REGISTRY.clear()
+        self.addCleanup(REGISTRY.clear)
+        self.user = User.objects.create_user(username='measured', password='testpass123')
+        self.staff = User.objects.create_user(username='operator', password='testpass123', is_staff=True)
+        account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        Transaction.objects.create(
+            user=self.user, account=account, transaction_type='expense', amount=Decimal('5.00'),
+            description='Coffee', date=timezone.now()
+        )
+        self.client = APIClient()
+
+    def metrics(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_requests_are_timed_per_action(self):
+        """Test responses carry Server-Timing and metrics aggregate per viewset action"""
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            response = self.client.get('/transactions/api/transactions/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries"$')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/transactions/api/transactions/summary/async/').status_code, 200)
+
+        text = self.metrics()
+        labels = 'endpoint="TransactionViewSet.list",method="GET"'
+        self.assertIn(f'http_requests_total{{{labels},status="200"}} 2', text)
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', text)
+        self.assertIn(f'http_request_queries_bucket{{{labels},le="0"}} 0', text)
+        self.assertIn('# TYPE http_request_db_seconds histogram', text)
+        # Aggregates run on worker threads are counted as well as the session, user and version lookups
+        async_queries = [
+            line for line in text.splitlines()
+            if line.startswith('http_request_queries_sum{endpoint="transactions.async_views.transaction_summary"')
+        ]
+        self.assertGreater(float(async_queries[0].split()[-1]), 3)
+
+    def test_metrics_are_staff_only(self):
+        """Test regular users cannot read the metrics endpoint"""
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_slow_request_log(self):
+        """Test requests over the threshold are logged with their endpoint and query count"""
+        self.client.force_authenticate(self.user)
+        with self.settings(METRICS_SLOW_REQUEST_SECONDS=0), \
+                self.assertLogs('financial_tracker.metrics', 'WARNING') as logs:
+            self.client.get('/transactions/api/transactions/?type=expense')
+        self.assertIn('GET /transactions/api/transactions/?type=expense (TransactionViewSet.list)', logs.output[0])
+
+    def test_concurrent_observations(self):
+        """Test observations from many threads are all counted"""
+        def observe():
+            for _ in range(500):
+                REGISTRY.observe('Endpoint.action', 'GET', 200, 0.01, 3, 0.002)
+        threads = [threading.Thread(target=observe) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        text = REGISTRY.render()
+        self.assertIn('http_requests_total{endpoint="Endpoint.action",method="GET",status="200"} 4000', text)
+        self.assertIn('http_request_queries_bucket{endpoint="Endpoint.action",method="GET",le="5"} 4000', text)
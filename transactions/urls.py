@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import budget_status_summary, transaction_summary
 from .views import CategoryViewSet, TransactionViewSet, BudgetViewSet
 
 router = DefaultRouter()
@@ -8,5 +9,7 @@ router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'budgets', BudgetViewSet, basename='budget')
 
 urlpatterns = [
+    path('api/transactions/summary/async/', transaction_summary, name='transaction-summary-async'),
+    path('api/budgets/status/async/', budget_status_summary, name='budget-status-async'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
@@ -2,157 +2,299 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Q, Count
+from django.db.models import Sum, Q, Count, F, Window
+from django.db.models.functions import RowNumber
+from django.core.files.storage import default_storage
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Category, Transaction, Budget
+from datetime import timedelta
+import codecs
+import csv
+import uuid
+from rest_framework.exceptions import ValidationError
+from financial_tracker.cache import cached_response
+from financial_tracker.conditional import ConditionalGetMixin
+from financial_tracker.fieldsets import SparseFieldsetMixin
+from jobs.registry import enqueue
+from jobs.serializers import JobSerializer
+from .analytics import spending_analytics, user_arrays
+from .exporters import FORMATS as EXPORT_FORMATS, stream_export
+from .filters import TransactionFilterSet, parse_period
+from .fx import MissingExchangeRate, convert_totals, user_currency
+from .importers import StatementImporter, detect_format
+from .ledger import day_start
+from .pagination import TransactionKeysetPagination, wants_keyset_pagination
+from .rollups import empty_totals, period_groups, range_groups
+from .search import search_transactions
+from .models import Category, Transaction, Budget, RecurringSeries
 from .serializers import (
     CategorySerializer, TransactionSerializer, BudgetSerializer, 
-    TransactionSummarySerializer
+    TransactionSummarySerializer, TransactionImportSerializer, RecurringSeriesSerializer
 )
 
-class CategoryViewSet(viewsets.ModelViewSet):
+# Drill-down limits for TransactionViewSet.by_category
+DEFAULT_PER_CATEGORY = 10
+MAX_PER_CATEGORY = 100
+# Period limits for TransactionViewSet.analytics
+DEFAULT_ANALYTICS_DAYS = 90
+MAX_ANALYTICS_DAYS = 366 * 3
+
+def summary_data(totals, currency, start_date, end_date):
+    """Transaction summary fields from converted period totals"""
+    return {
+        'total_income': totals['income_total'],
+        'total_expenses': totals['expense_total'],
+        'net_amount': totals['income_total'] - totals['expense_total'],
+        'transaction_count': totals['income_count'] + totals['expense_count'] + totals['transfer_count'],
+        'currency': currency,
+        'period_start': start_date,
+        'period_end': end_date
+    }
+
+def budget_status(budget):
+    """Return (spent percentage, alert type, message); the alert is None below 80% spent"""
+    spent_percentage = float(budget.spent_amount / budget.amount * 100) if budget.amount > 0 else 0
+    if spent_percentage >= 100:
+        return round(spent_percentage, 2), 'over_budget', f"Budget exceeded for {budget.category.name}"
+    if spent_percentage >= 80:
+        return round(spent_percentage, 2), 'warning', f"80% of budget used for {budget.category.name}"
+    return round(spent_percentage, 2), None, None
+
+class CategoryViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for managing transaction categories"""
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Category.objects.filter(user=self.request.user)
+        return self.optimize_queryset(Category.objects.filter(user=self.request.user))
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cached_response
     def popular(self, request):
         """Get most used categories"""
         categories = self.get_queryset().annotate(
             transaction_count=Count('transactions')
         ).order_by('-transaction_count')[:10]
         
-        return Response(CategorySerializer(categories, many=True).data)
+        return Response(self.get_serializer(categories, many=True).data)
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for managing financial transactions"""
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    fieldset_actions = ('list', 'retrieve', 'search', 'by_category')
     
     def get_queryset(self):
-        queryset = Transaction.objects.filter(user=self.request.user)
-        
-        # Filter by transaction type
-        transaction_type = self.request.query_params.get('type', None)
-        if transaction_type:
-            queryset = queryset.filter(transaction_type=transaction_type)
-        
-        # Filter by account
-        account_id = self.request.query_params.get('account', None)
-        if account_id:
-            queryset = queryset.filter(account_id=account_id)
+        queryset = self.optimize_queryset(Transaction.objects.filter(user=self.request.user))
         
-        # Filter by category
-        category_id = self.request.query_params.get('category', None)
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-        
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        if start_date:
-            queryset = queryset.filter(date__date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(date__date__lte=end_date)
-        
-        return queryset.order_by('-date')
+        return TransactionFilterSet(self.request.query_params, queryset.order_by('-date', '-id')).qs
+    
+    def get_period(self, request):
+        return parse_period(request.query_params)
+    
+    @property
+    def paginator(self):
+        """Use keyset pagination when the client opts in"""
+        # Search results are ordered by relevance, which keysets can't express
+        if (not hasattr(self, '_paginator') and self.request is not None and self.action != 'search'
+                and wants_keyset_pagination(self.request)):
+            self._paginator = TransactionKeysetPagination()
+        return super().paginator
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cached_response
     def summary(self, request):
         """Get transaction summary for a period"""
-        # Default to current month if no dates provided
-        end_date = timezone.now().date()
-        start_date = end_date.replace(day=1)
+        start_date, end_date = self.get_period(request)
+        
+        filters = TransactionFilterSet(request.query_params, None)
+        if filters.is_narrowed(ignore=('start_date', 'end_date', 'ordering')):
+            # Rollups are per user and account only, so narrower filters aggregate directly
+            groups = range_groups(self.get_queryset(), start_date, end_date)
+        else:
+            groups = period_groups(request.user, start_date, end_date)
+        
+        currency = user_currency(request.user)
+        try:
+            totals = convert_totals(groups, currency, empty_totals())
+        except MissingExchangeRate as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(TransactionSummarySerializer(summary_data(totals, currency, start_date, end_date)).data)
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over descriptions, ranked by relevance unless ?ordering= is given"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This query parameter is required.']})
+        
+        transactions = search_transactions(self.get_queryset(), query)
+        ordering = request.query_params.get('ordering')
+        if ordering:
+            # An explicit ordering replaces relevance; already validated by get_queryset
+            ordering_filter = TransactionFilterSet.declared_filters['ordering']
+            transactions = ordering_filter.apply(transactions, ordering_filter.parse(ordering))
+        page = self.paginate_queryset(transactions)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(transactions, many=True).data)
+    
+    @action(detail=False, methods=['get'])
+    @cached_response
+    def by_category(self, request):
+        """Get totals per category, optionally with each category's newest transactions"""
+        start_date, end_date = self.get_period(request)
         
-        # Override with query parameters if provided
-        if request.query_params.get('start_date'):
-            start_date = datetime.strptime(request.query_params.get('start_date'), '%Y-%m-%d').date()
-        if request.query_params.get('end_date'):
-            end_date = datetime.strptime(request.query_params.get('end_date'), '%Y-%m-%d').date()
+        include = {value.strip() for value in request.query_params.get('include', '').split(',')}
+        try:
+            per_category = int(request.query_params.get('per_category', DEFAULT_PER_CATEGORY))
+        except ValueError:
+            raise ValidationError({'per_category': ['Enter a whole number.']})
+        per_category = max(1, min(per_category, MAX_PER_CATEGORY))
         
         transactions = self.get_queryset().filter(
-            date__date__gte=start_date,
-            date__date__lte=end_date
+            date__gte=day_start(start_date),
+            date__lt=day_start(end_date + timedelta(days=1))
+        ).exclude(category__isnull=True)
+        
+        totals = list(
+            transactions.order_by().values('category_id').annotate(
+                total_amount=Sum('amount'),
+                transaction_count=Count('id')
+            ).order_by('-total_amount', 'category_id')
         )
+        categories = Category.objects.in_bulk([row['category_id'] for row in totals])
         
-        income_total = transactions.filter(transaction_type='income').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
+        latest = {}
+        if 'transactions' in include:
+            # Only the newest rows of each category, capped in the database
+            ranked = transactions.annotate(
+                category_rank=Window(
+                    RowNumber(),
+                    partition_by=[F('category_id')],
+                    order_by=[F('date').desc(), F('id').desc()]
+                )
+            ).filter(category_rank__lte=per_category).order_by('-date', '-id')
+            for transaction in ranked:
+                latest.setdefault(transaction.category_id, []).append(transaction)
         
-        expense_total = transactions.filter(transaction_type='expense').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
+        category_data = []
+        for row in totals:
+            entry = {
+                'category': CategorySerializer(categories[row['category_id']]).data,
+                'total_amount': float(row['total_amount']),
+                'transaction_count': row['transaction_count']
+            }
+            if 'transactions' in include:
+                entry['transactions'] = self.get_serializer(
+                    latest.get(row['category_id'], []), many=True
+                ).data
+            category_data.append(entry)
         
-        summary_data = {
-            'total_income': income_total,
-            'total_expenses': expense_total,
-            'net_amount': income_total - expense_total,
-            'transaction_count': transactions.count(),
-            'period_start': start_date,
-            'period_end': end_date
-        }
+        return Response(category_data)
+    
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """Get daily spend trends, category percentiles and month-over-month totals"""
+        start_date, end_date = self.get_period(request)
+        if not request.query_params.get('start_date'):
+            start_date = end_date - timedelta(days=DEFAULT_ANALYTICS_DAYS - 1)
+        if start_date > end_date:
+            raise ValidationError({'date': ['start_date must be before end_date.']})
+        if (end_date - start_date).days >= MAX_ANALYTICS_DAYS:
+            raise ValidationError({'date': [f'Periods are limited to {MAX_ANALYTICS_DAYS} days.']})
         
-        serializer = TransactionSummarySerializer(summary_data)
-        return Response(serializer.data)
+        return Response(spending_analytics(user_arrays(request.user.pk), start_date, end_date))
     
     @action(detail=False, methods=['get'])
-    def by_category(self, request):
-        """Get transactions grouped by category"""
-        # Default to current month
-        end_date = timezone.now().date()
-        start_date = end_date.replace(day=1)
+    def recurring(self, request):
+        """Get detected recurring transactions such as salaries and subscriptions"""
+        series = RecurringSeries.objects.filter(user=request.user, cadence__isnull=False)
+        return Response(RecurringSeriesSerializer(series, many=True).data)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered transaction history as CSV or NDJSON"""
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({'output': [f"Select one of: {', '.join(EXPORT_FORMATS)}."]})
+        transactions = self.get_queryset()
         
-        if request.query_params.get('start_date'):
-            start_date = datetime.strptime(request.query_params.get('start_date'), '%Y-%m-%d').date()
-        if request.query_params.get('end_date'):
-            end_date = datetime.strptime(request.query_params.get('end_date'), '%Y-%m-%d').date()
+        if request.query_params.get('background', '').lower() in ('true', '1', 'yes'):
+            filters = {
+                name: request.query_params.getlist(name)
+                for name in request.query_params if name not in ('output', 'background')
+            }
+            job = enqueue('export_transactions', request.user, {'output': output, 'filters': filters})
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
         
-        transactions = self.get_queryset().filter(
-            date__date__gte=start_date,
-            date__date__lte=end_date
-        ).exclude(category__isnull=True)
+        response = StreamingHttpResponse(
+            stream_export(transactions, output),
+            content_type=EXPORT_FORMATS[output]
+        )
+        filename = f"transactions-{timezone.localdate():%Y%m%d}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """Import transactions in bulk from an uploaded CSV or OFX statement"""
+        serializer = TransactionImportSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        file_format = serializer.validated_data.get('file_format') or detect_format(upload.name)
         
-        category_data = {}
-        for transaction in transactions:
-            category_name = transaction.category.name
-            if category_name not in category_data:
-                category_data[category_name] = {
-                    'category': CategorySerializer(transaction.category).data,
-                    'total_amount': 0,
-                    'transaction_count': 0,
-                    'transactions': []
-                }
-            
-            category_data[category_name]['total_amount'] += float(transaction.amount)
-            category_data[category_name]['transaction_count'] += 1
-            category_data[category_name]['transactions'].append(
-                TransactionSerializer(transaction).data
-            )
+        if serializer.validated_data['background']:
+            # Chunks are committed as they go, so a retry would import rows twice
+            job = enqueue('import_statement', request.user, {
+                'file': default_storage.save(f'jobs/uploads/{uuid.uuid4().hex}-{upload.name}', upload),
+                'file_format': file_format,
+                'account_id': serializer.validated_data['account'].pk,
+                'date_format': serializer.validated_data.get('date_format') or None,
+                'dry_run': serializer.validated_data['dry_run'],
+            }, max_attempts=1)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
         
-        return Response(list(category_data.values()))
+        importer = StatementImporter(
+            request.user,
+            serializer.validated_data['account'],
+            date_format=serializer.validated_data.get('date_format') or None,
+            dry_run=serializer.validated_data['dry_run']
+        )
+        try:
+            report = importer.import_file(codecs.iterdecode(upload, 'utf-8-sig'), file_format)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # Rows are decoded as they are read, so earlier chunks may already be saved
+            error = f'{upload.name} is not a readable UTF-8 {file_format.upper()} file: {exc}'
+            return Response({**importer.report(), 'file': [error]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if report['created'] and not report['dry_run']:
+            return Response(report, status=status.HTTP_201_CREATED)
+        if report['failed'] and not report['created']:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for managing budgets"""
     serializer_class = BudgetSerializer
     permission_classes = [IsAuthenticated]
+    fieldset_actions = ('list', 'retrieve', 'current', 'alerts')
     
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user)
+        return self.optimize_queryset(Budget.objects.filter(user=self.request.user)).with_spent_amount()
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cached_response
     def current(self, request):
         """Get current active budgets"""
         current_date = timezone.now().date()
@@ -162,13 +304,14 @@ class BudgetViewSet(viewsets.ModelViewSet):
             end_date__gte=current_date
         )
         
-        return Response(BudgetSerializer(budgets, many=True).data)
+        return Response(self.get_serializer(budgets, many=True).data)
     
     @action(detail=False, methods=['get'])
+    @cached_response
     def alerts(self, request):
         """Get budget alerts for overspending"""
         current_date = timezone.now().date()
-        budgets = self.get_queryset().filter(
+        budgets = self.get_queryset().select_related('category').filter(
             is_active=True,
             start_date__lte=current_date,
             end_date__gte=current_date
@@ -176,22 +319,15 @@ class BudgetViewSet(viewsets.ModelViewSet):
         
         alerts = []
         for budget in budgets:
-            spent_percentage = (budget.spent_amount / float(budget.amount)) * 100 if budget.amount > 0 else 0
-            
-            if spent_percentage >= 100:
-                alert_type = 'over_budget'
-                message = f"Budget exceeded for {budget.category.name}"
-            elif spent_percentage >= 80:
-                alert_type = 'warning'
-                message = f"80% of budget used for {budget.category.name}"
-            else:
+            spent_percentage, alert_type, message = budget_status(budget)
+            if alert_type is None:
                 continue
             
             alerts.append({
-                'budget': BudgetSerializer(budget).data,
+                'budget': self.get_serializer(budget).data,
                 'alert_type': alert_type,
                 'message': message,
-                'spent_percentage': round(spent_percentage, 2)
+                'spent_percentage': spent_percentage
             })
         
         return Response(alerts)